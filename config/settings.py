@@ -113,6 +113,20 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Varios workers de ingesta escriben a la vez: las transacciones
+            # toman el bloqueo de escritura al empezar y esperan hasta 20 s.
+            # Es global a propósito: una transacción diferida que leyó (p. ej.
+            # el enlace de válvulas antes de crear_valvula) falla con
+            # "database is locked" al pasar a escribir si otra escribe, sin
+            # esperar el timeout, y reintentar sólo el INSERT no sirve porque
+            # hay que repetir la transacción entera. El costo es que todo
+            # atomic(), aunque sólo lea, espera a las demás transacciones;
+            # las consultas fuera de atomic() no. En PostgreSQL
+            # (DATABASE_URL) no aplica.
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
         }
     }
 
@@ -159,6 +173,73 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cola de extracción de documentos (ver servicios/cola.py)
+# Con EXTRACCION_ASINCRONA=True la carga sólo guarda el archivo y un worker
+# (python manage.py procesar_extracciones) realiza la extracción.
+EXTRACCION_ASINCRONA = environ.get('EXTRACCION_ASINCRONA', 'True') == 'True'
+EXTRACCION_MAX_INTENTOS = int(environ.get('EXTRACCION_MAX_INTENTOS', '3'))
+EXTRACCION_BACKOFF_SEGUNDOS = int(environ.get('EXTRACCION_BACKOFF_SEGUNDOS', '30'))
+EXTRACCION_BACKOFF_MAXIMO_SEGUNDOS = int(environ.get('EXTRACCION_BACKOFF_MAXIMO_SEGUNDOS', '3600'))
+# Un trabajo 'procesando' más antiguo que esto se considera abandonado y se reintenta
+EXTRACCION_BLOQUEO_SEGUNDOS = int(environ.get('EXTRACCION_BLOQUEO_SEGUNDOS', '600'))
+
+# Backend de texto de PDF (ver servicios/backends_texto.py): 'pypdfium2' (rápido)
+# o 'pdfplumber' (disposición y tablas). Por tipo, p. ej.
+# EXTRACCION_BACKEND_POR_TIPO=reparacion:pdfplumber,mantenimiento:pdfplumber
+EXTRACCION_BACKEND_TEXTO = environ.get('EXTRACCION_BACKEND_TEXTO', 'pypdfium2')
+EXTRACCION_BACKEND_POR_TIPO = dict(
+    par.split(':', 1) for par in environ.get('EXTRACCION_BACKEND_POR_TIPO', '').split(',') if ':' in par
+)
+# Lectura por páginas: se deja de abrir páginas cuando el extractor ya tiene el
+# valor definitivo de sus campos requeridos (número, serie, modelo, fechas y,
+# en calibraciones, presiones y resultado). El tope acota la latencia de
+# anexos largos (0 = sin tope).
+EXTRACCION_POR_PAGINAS = environ.get('EXTRACCION_POR_PAGINAS', 'True') == 'True'
+EXTRACCION_MAX_PAGINAS = int(environ.get('EXTRACCION_MAX_PAGINAS', '20'))
+# Archivos en memoria más grandes que esto se copian a disco antes de extraer
+# su texto (ver servicios/backends_texto.py: fuente_en_disco)
+EXTRACCION_UMBRAL_SPOOL_BYTES = int(environ.get('EXTRACCION_UMBRAL_SPOOL_BYTES', str(5 * 1024 * 1024)))
+# Extracción aislada en un proceso hijo con tiempo y memoria máximos (ver
+# servicios/aislamiento.py). Al superarlos el documento queda con error y el
+# trabajo pasa a dead-letter sin reintentos. Límites por tipo (segundos:MB,
+# vacío = el general), p. ej. EXTRACCION_LIMITES_POR_TIPO=reparacion:300:2048,calibracion:60:
+EXTRACCION_AISLADA = environ.get('EXTRACCION_AISLADA', 'True') == 'True'
+EXTRACCION_TIMEOUT_SEGUNDOS = int(environ.get('EXTRACCION_TIMEOUT_SEGUNDOS', '120'))
+EXTRACCION_MEMORIA_MB = int(environ.get('EXTRACCION_MEMORIA_MB', '1024'))
+EXTRACCION_LIMITES_POR_TIPO = {
+    partes[0]: tuple(int(valor) if valor else None for valor in (partes + ['', ''])[1:3])
+    for partes in (par.split(':') for par in environ.get('EXTRACCION_LIMITES_POR_TIPO', '').split(','))
+    if len(partes) > 1
+}
+
+# Enlace de documentos con válvulas por número de serie parecido (ver
+# valvulas/similitud.py). Sin coincidencia exacta, el documento se enlaza con
+# la válvula de la empresa de serie más parecida si la similitud (con los
+# caracteres que el OCR confunde unificados) llega a la mínima; si la similitud
+# sin unificar no llega a la automática, el documento queda marcado para
+# revisión (confirmar o rechazar en el admin). Una serie que sólo cambia el
+# número ("PSV-2023-001" frente a "PSV-2023-002") es otra válvula y se crea.
+VALVULAS_SIMILITUD_MINIMA = float(environ.get('VALVULAS_SIMILITUD_MINIMA', '0.5'))
+VALVULAS_SIMILITUD_AUTOMATICA = float(environ.get('VALVULAS_SIMILITUD_AUTOMATICA', '0.95'))
+
+# Los manejadores de carga calculan el SHA-256 mientras se recibe el archivo
+# (deduplicación de documentos, ver servicios/deduplicacion.py)
+FILE_UPLOAD_HANDLERS = [
+    'servicios.uploadhandlers.HashMemoryFileUploadHandler',
+    'servicios.uploadhandlers.HashTemporaryFileUploadHandler',
+]
+# Cargas más grandes que esto van a un archivo temporal en disco, no a memoria
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', str(2621440)))  # 2.5MB
+
+# Carga por lotes: permitir cientos de archivos por petición
+DATA_UPLOAD_MAX_NUMBER_FILES = int(environ.get('DATA_UPLOAD_MAX_NUMBER_FILES', '1000'))
+# Límites de cada ZIP de la carga por lotes (ver servicios/ingesta.py): se
+# revisan en el directorio del ZIP antes de descomprimir nada; un ZIP que los
+# supera se rechaza completo (protege el disco temporal de un "ZIP bomb")
+INGESTA_ZIP_MAX_ARCHIVOS = int(environ.get('INGESTA_ZIP_MAX_ARCHIVOS', '1000'))
+INGESTA_ZIP_MAX_ARCHIVO_MB = int(environ.get('INGESTA_ZIP_MAX_ARCHIVO_MB', '100'))
+INGESTA_ZIP_MAX_TOTAL_MB = int(environ.get('INGESTA_ZIP_MAX_TOTAL_MB', '2048'))
+
 # Login configuration
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -1,5 +1,5 @@
-from django.contrib import admin
-from .models import Servicio, Certificado, Documento, AlertaServicio
+from django.contrib import admin, messages
+from .models import Servicio, Certificado, Documento, AlertaServicio, TrabajoExtraccion, MetricaExtraccion, PruebaPresion
 
 
 class CertificadoInline(admin.TabularInline):
@@ -16,6 +16,30 @@ class DocumentoInline(admin.TabularInline):
     readonly_fields = ('tipo_documento', 'extraido_exitosamente')
 
 
+class PruebaPresionInline(admin.TabularInline):
+    model = PruebaPresion
+    extra = 0
+    fields = ('numero', 'presion_set', 'presion_apertura', 'presion_cierre', 'prueba_fugas', 'unidad_presion',
+              'temperatura', 'presion_apertura_kpa')
+    readonly_fields = ('presion_apertura_kpa',)
+
+
+class MetricaExtraccionInline(admin.TabularInline):
+    model = MetricaExtraccion
+    extra = 0
+    can_delete = False
+    fields = ('fecha', 'origen', 'duracion_ms', 'paginas', 'tamano_bytes', 'backend', 'resumen_etapas')
+    readonly_fields = fields
+    
+    def resumen_etapas(self, obj):
+        etapas = sorted(obj.etapas.items(), key=lambda item: item[1], reverse=True)
+        return ', '.join(f'{nombre}: {milisegundos:.1f} ms' for nombre, milisegundos in etapas)
+    resumen_etapas.short_description = 'Etapas'
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class ServicioAdmin(admin.ModelAdmin):
     list_display = ('id', 'valvula', 'tipo_servicio', 'fecha_servicio', 'estado', 'tecnico')
     list_filter = ('tipo_servicio', 'estado', 'fecha_servicio', 'valvula__empresa')
@@ -73,19 +97,24 @@ class CertificadoAdmin(admin.ModelAdmin):
 
 
 class DocumentoAdmin(admin.ModelAdmin):
-    list_display = ('numero_documento', 'get_tipo_documento', 'servicio', 'fecha_documento', 'extraido_exitosamente')
-    list_filter = ('tipo_documento', 'fecha_documento', 'extraido_exitosamente', 'servicio__valvula__empresa')
-    search_fields = ('numero_documento', 'servicio__valvula__numero_serie', 'laboratorio')
-    readonly_fields = ('fecha_creacion', 'fecha_actualizacion', 'fecha_extraccion_datos', 'esta_vigente', 'dias_para_vencer')
+    list_display = ('numero_documento', 'get_tipo_documento', 'servicio', 'fecha_documento', 'estado_procesamiento', 'extraido_exitosamente')
+    list_filter = ('tipo_documento', 'estado_procesamiento', 'fecha_documento', 'extraido_exitosamente', 'revisar_valvula', 'servicio__valvula__empresa')
+    search_fields = ('numero_documento', 'servicio__valvula__numero_serie', 'laboratorio', 'hash_contenido')
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion', 'fecha_extraccion_datos', 'esta_vigente', 'dias_para_vencer', 'hash_contenido', 'datos_extraidos', 'version_extractor', 'similitud_valvula')
+    raw_id_fields = ('valvula',)
+    actions = ['confirmar_enlace', 'rechazar_enlace']
     fieldsets = (
         ('Información del Documento', {
             'fields': ('servicio', 'tipo_documento', 'numero_documento', 'usuario_comercial')
         }),
+        ('Válvula', {
+            'fields': ('valvula', 'revisar_valvula', 'similitud_valvula')
+        }),
         ('Fechas', {
             'fields': ('fecha_documento', 'fecha_vencimiento', 'esta_vigente', 'dias_para_vencer')
         }),
         ('Archivo', {
-            'fields': ('archivo_pdf', 'nombre_original')
+            'fields': ('archivo_pdf', 'nombre_original', 'hash_contenido')
         }),
         ('Calibración (si aplica)', {
             'fields': ('presion_inicial', 'presion_final', 'temperatura', 'resultado_calibracion', 'laboratorio', 'unidad_presion'),
@@ -96,7 +125,7 @@ class DocumentoAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Extracción de Datos', {
-            'fields': ('tecnico_responsable', 'extraido_exitosamente', 'error_extraccion', 'fecha_extraccion_datos'),
+            'fields': ('tecnico_responsable', 'estado_procesamiento', 'extraido_exitosamente', 'error_extraccion', 'fecha_extraccion_datos', 'version_extractor', 'datos_extraidos'),
             'classes': ('collapse',)
         }),
         ('Auditoría', {
@@ -105,10 +134,61 @@ class DocumentoAdmin(admin.ModelAdmin):
         }),
     )
     date_hierarchy = 'fecha_documento'
+    inlines = [PruebaPresionInline, MetricaExtraccionInline]
     
     def get_tipo_documento(self, obj):
         return obj.get_tipo_documento_display()
     get_tipo_documento.short_description = 'Tipo'
+    
+    def confirmar_enlace(self, request, queryset):
+        documentos = queryset.filter(revisar_valvula=True, valvula__isnull=False).select_related('valvula')
+        confirmados = 0
+        for documento in documentos:
+            documento.confirmar_enlace_valvula()
+            confirmados += 1
+        self.message_user(request, f'{confirmados} enlace(s) con válvula confirmado(s)')
+    confirmar_enlace.short_description = 'Confirmar enlace con la válvula (aplica las fechas a la hoja de vida)'
+    
+    def rechazar_enlace(self, request, queryset):
+        documentos = queryset.filter(revisar_valvula=True).select_related('valvula')
+        rechazados, creadas = 0, 0
+        for documento in documentos:
+            try:
+                _, creada = documento.rechazar_enlace_valvula()
+            except ValueError as e:
+                self.message_user(request, f'Documento {documento.pk}: {str(e)}', level=messages.ERROR)
+                continue
+            rechazados += 1
+            creadas += creada
+        self.message_user(request, f'{rechazados} enlace(s) rechazado(s), {creadas} válvula(s) nueva(s)')
+    rechazar_enlace.short_description = 'Rechazar enlace con la válvula (enlaza o crea la de su número de serie)'
+
+
+class TrabajoExtraccionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'documento', 'estado', 'intentos', 'max_intentos', 'timeouts', 'disponible_desde', 'bloqueado_por')
+    list_filter = ('estado', 'fecha_creacion')
+    search_fields = ('documento__numero_documento', 'documento__nombre_original', 'ultimo_error')
+    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+    actions = ['reencolar']
+    fieldsets = (
+        ('Trabajo', {
+            'fields': ('documento', 'estado', 'intentos', 'max_intentos', 'disponible_desde')
+        }),
+        ('Worker', {
+            'fields': ('bloqueado_por', 'bloqueado_en', 'ultimo_error', 'timeouts', 'ultimo_timeout')
+        }),
+        ('Auditoría', {
+            'fields': ('fecha_creacion', 'fecha_actualizacion'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    def reencolar(self, request, queryset):
+        from servicios.cola import encolar_documento
+        for trabajo in queryset.select_related('documento'):
+            encolar_documento(trabajo.documento)
+        self.message_user(request, f'{queryset.count()} trabajo(s) reencolado(s)')
+    reencolar.short_description = 'Reencolar trabajos seleccionados'
 
 
 class AlertaServicioAdmin(admin.ModelAdmin):
@@ -141,3 +221,4 @@ admin.site.register(Servicio, ServicioAdmin)
 admin.site.register(Certificado, CertificadoAdmin)
 admin.site.register(Documento, DocumentoAdmin)
 admin.site.register(AlertaServicio, AlertaServicioAdmin)
+admin.site.register(TrabajoExtraccion, TrabajoExtraccionAdmin)
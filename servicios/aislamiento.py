@@ -0,0 +1,277 @@
+"""
+Extracción aislada en un proceso hijo con límites de tiempo y memoria
+
+Un PDF malformado o muy pesado puede dejar a pdfplumber ocupado varios
+minutos. La extracción (detección de tipo y campos) se ejecuta en un proceso
+hijo desechable; el proceso que la pide (worker de la cola o petición web)
+sólo espera su resultado con un plazo máximo y, si se vence, termina al hijo.
+
+- Tiempo: plazo de reloj (EXTRACCION_TIMEOUT_SEGUNDOS).
+- Memoria: límite de espacio de direcciones del hijo (``RLIMIT_AS``,
+  EXTRACCION_MEMORIA_MB); una asignación que lo supera falla con MemoryError.
+- Por tipo: EXTRACCION_LIMITES_POR_TIPO. El hijo informa el tipo apenas lo
+  detecta y desde ahí rigen los límites de ese tipo (la detección en sí corre
+  con los límites generales).
+
+Los hijos se crean con ``forkserver`` (con este módulo y los settings
+precargados): no heredan las conexiones a la base de datos ni los hilos del
+servidor web y no pagan de nuevo la importación de pdfplumber y pypdfium2 en
+cada documento (el aislamiento agrega unos 10-15 ms por documento). La
+revisión previa (``servicios.preflight``) se hace antes de crear el hijo: un
+archivo rechazado no paga esos milisegundos.
+"""
+
+from contextlib import contextmanager
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows: sin límite de memoria
+    resource = None
+
+from servicios.backends_texto import TAMANO_BLOQUE_SPOOL, leer_configuracion
+from servicios import patrones
+from servicios.extractors import detect_document_type, patrones_registrados, resultado_extraccion, resultado_fallido
+from servicios.medicion import medicion_extraccion
+from servicios.preflight import DocumentoRechazado, revisar
+
+# Este módulo se precarga en el forkserver: lo que se calcule aquí lo heredan
+# todos los procesos hijos
+patrones.precalcular_equivalencias(patrones_registrados())
+
+TIMEOUT_POR_DEFECTO = 120  # segundos
+MEMORIA_POR_DEFECTO = 1024  # MB
+
+# Tras terminar (SIGTERM) a un hijo, espera antes de matarlo (SIGKILL)
+ESPERA_TERMINACION = 2
+
+
+class ExtraccionExcedida(Exception):
+    """La extracción superó uno de sus límites; reintentarla no sirve"""
+
+
+class TiempoExtraccionAgotado(ExtraccionExcedida):
+    pass
+
+
+class MemoriaExtraccionExcedida(ExtraccionExcedida):
+    pass
+
+
+def aislamiento_activo() -> bool:
+    return leer_configuracion('EXTRACCION_AISLADA', True)
+
+
+def limites_para_tipo(tipo: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Returns:
+        (timeout en segundos, memoria en MB) del tipo de documento, o los
+        generales si el tipo no tiene límites propios (0 = sin límite)
+    """
+    timeout = leer_configuracion('EXTRACCION_TIMEOUT_SEGUNDOS', TIMEOUT_POR_DEFECTO)
+    memoria = leer_configuracion('EXTRACCION_MEMORIA_MB', MEMORIA_POR_DEFECTO)
+    por_tipo = leer_configuracion('EXTRACCION_LIMITES_POR_TIPO', {}) or {}
+    if tipo and tipo in por_tipo:
+        timeout_tipo, memoria_tipo = por_tipo[tipo]
+        timeout = timeout_tipo if timeout_tipo is not None else timeout
+        memoria = memoria_tipo if memoria_tipo is not None else memoria
+    return timeout, memoria
+
+
+def _limitar_memoria(megabytes):
+    if resource is None or not megabytes:
+        return
+    limite = megabytes * 1024 * 1024
+    _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+    if maximo != resource.RLIM_INFINITY:
+        limite = min(limite, maximo)
+    resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+
+
+def _liberar_memoria():
+    """Quita el límite para poder enviar la respuesta al padre"""
+    if resource is not None:
+        _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (maximo, maximo))
+
+
+def _por_memoria(error) -> bool:
+    # Los extractores envuelven los errores de lectura en un Exception genérico
+    while error is not None:
+        if isinstance(error, MemoryError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _extraer_en_hijo(conexion, ruta, memoria_general, memorias_por_tipo, por_paginas=None):
+    """Cuerpo del proceso hijo: envía ('tipo', ...) y luego ('resultado', ...) o el error"""
+    try:
+        _limitar_memoria(memoria_general)
+        with medicion_extraccion() as medicion:
+            medicion.anotar(tamano_bytes=os.path.getsize(ruta))
+            with open(ruta, 'rb') as pdf_file:
+                doc_type, extractor = detect_document_type(pdf_file, por_paginas=por_paginas)
+                conexion.send(('tipo', doc_type))
+                _limitar_memoria(memorias_por_tipo.get(doc_type))
+                datos = extractor.extract()
+        resultado = resultado_extraccion(doc_type, extractor, datos)
+        resultado['metricas'] = medicion.como_dict()
+        conexion.send(('resultado', resultado))
+    except Exception as e:
+        _liberar_memoria()
+        if _por_memoria(e):
+            conexion.send(('memoria', None))
+        else:
+            conexion.send(('resultado', resultado_fallido(e)))
+    finally:
+        conexion.close()
+
+
+_contexto = None
+
+
+def contexto_procesos():
+    """
+    Contexto de multiprocessing de los procesos de extracción: ``forkserver``
+    (con este módulo y los settings precargados) o, si no existe, ``spawn``.
+    Los procesos no cargan Django: sólo ejecutan funciones que no dependen de él.
+    """
+    global _contexto
+    if _contexto is None:
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            _contexto = multiprocessing.get_context('forkserver')
+            # Cada hijo lee los settings (backend, lectura por páginas): se
+            # importan una vez en el forkserver y no en cada documento
+            precarga = [__name__, 'django.conf']
+            if os.environ.get('DJANGO_SETTINGS_MODULE'):
+                precarga.append(os.environ['DJANGO_SETTINGS_MODULE'])
+            _contexto.set_forkserver_preload(precarga)
+        else:
+            _contexto = multiprocessing.get_context('spawn')
+    return _contexto
+
+
+def ignorar_interrupcion():
+    """Inicializador de pools: los procesos ignoran Ctrl+C y el padre decide cuándo detenerse"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _detener(proceso):
+    if proceso.is_alive():
+        proceso.terminate()
+        proceso.join(ESPERA_TERMINACION)
+    if proceso.is_alive():
+        proceso.kill()
+    proceso.join()
+
+
+def extraer_aislado(ruta: str, por_paginas: Optional[bool] = None) -> Dict:
+    """
+    Detecta y extrae un PDF en disco dentro de un proceso hijo con límites
+    (``por_paginas=False`` lee el PDF completo)
+
+    Returns:
+        El mismo diccionario que ``extractors.extraer_ruta`` (con las
+        'metricas' del hijo); los errores normales de extracción y los archivos
+        rechazados en la revisión previa vienen en 'error'
+
+    Raises:
+        TiempoExtraccionAgotado: el hijo no terminó dentro del plazo
+        MemoriaExtraccionExcedida: el hijo superó el límite de memoria
+        ExtraccionExcedida: el hijo terminó sin responder (p. ej. un fallo del
+            código nativo al quedarse sin memoria)
+    """
+    try:
+        revisar(ruta)
+    except DocumentoRechazado as e:
+        return resultado_fallido(e)
+
+    timeout, memoria = limites_para_tipo()
+    por_tipo = leer_configuracion('EXTRACCION_LIMITES_POR_TIPO', {}) or {}
+    memorias_por_tipo = {tipo: limites_para_tipo(tipo)[1] for tipo in por_tipo}
+
+    contexto = contexto_procesos()
+    receptor, emisor = contexto.Pipe(duplex=False)
+    proceso = contexto.Process(
+        target=_extraer_en_hijo,
+        args=(emisor, ruta, memoria, memorias_por_tipo, por_paginas),
+        name=f'extraccion:{os.path.basename(ruta)}',
+        daemon=True,
+    )
+    inicio = time.monotonic()
+    proceso.start()
+    emisor.close()
+
+    tipo = None
+    try:
+        while True:
+            restante = inicio + timeout - time.monotonic() if timeout else None
+            if restante is not None and restante <= 0:
+                raise _tiempo_agotado(timeout, tipo)
+            # Un mensaje a medio escribir bloquearía recv(): el hijo se mata al
+            # vencer el plazo y recv() termina con EOFError
+            vigilante = threading.Timer(restante, proceso.kill) if restante else None
+            try:
+                if not receptor.poll(restante):
+                    continue
+                if vigilante is not None:
+                    vigilante.start()
+                mensaje, valor = receptor.recv()
+            except EOFError:
+                proceso.join()
+                if timeout and time.monotonic() >= inicio + timeout:
+                    raise _tiempo_agotado(timeout, tipo)
+                codigo = proceso.exitcode
+                motivo = f'señal {signal.Signals(-codigo).name}' if codigo < 0 else f'código {codigo}'
+                raise ExtraccionExcedida(f'El proceso de extracción terminó inesperadamente ({motivo})')
+            finally:
+                if vigilante is not None:
+                    vigilante.cancel()
+            if mensaje == 'tipo':
+                tipo = valor
+                timeout = limites_para_tipo(tipo)[0]
+            elif mensaje == 'memoria':
+                raise MemoriaExtraccionExcedida(
+                    f'La extracción superó el límite de memoria de {limites_para_tipo(tipo)[1]} MB'
+                )
+            else:
+                return valor
+    finally:
+        receptor.close()
+        _detener(proceso)
+
+
+def _tiempo_agotado(timeout, tipo):
+    detalle = f' (tipo {tipo})' if tipo else ''
+    return TiempoExtraccionAgotado(f'La extracción superó el tiempo máximo de {timeout}s{detalle}')
+
+
+@contextmanager
+def ruta_local(archivo):
+    """
+    Ruta en disco de un archivo almacenado (FieldFile). Si el almacenamiento
+    no es local, el archivo se copia a un temporal que se borra al salir.
+    """
+    try:
+        ruta = archivo.path
+    except NotImplementedError:
+        ruta = None
+    if ruta and os.path.isfile(ruta):
+        yield ruta
+        return
+
+    fd, temporal = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as destino, archivo.open('rb') as origen:
+            shutil.copyfileobj(origen, destino, TAMANO_BLOQUE_SPOOL)
+        yield temporal
+    finally:
+        os.remove(temporal)
@@ -0,0 +1,375 @@
+"""
+Backends de extracción de texto de PDF
+
+- ``pypdfium2`` (por defecto): lee sólo la capa de texto con PDFium, mucho más
+  rápido que pdfplumber para certificados con texto digital.
+- ``pdfplumber``: analiza la disposición de cada carácter; más lento, pero
+  conserva mejor el orden en tablas y columnas.
+
+El backend por defecto y el de cada tipo de documento se configuran con
+``EXTRACCION_BACKEND_TEXTO`` y ``EXTRACCION_BACKEND_POR_TIPO`` (settings).
+No depende de Django: también se usa en los procesos de la carga por lotes.
+
+Memoria acotada: cada página se cierra en cuanto se toma su texto (pdfplumber
+conserva los objetos de disposición de todas las páginas hasta cerrar el PDF)
+y los archivos grandes se leen desde disco (``fuente_en_disco``): PDFium abre
+la ruta directamente y pdfplumber lee un mapa de memoria (``mmap``) del
+archivo en lugar de un buffer en el heap de Python.
+"""
+
+from contextlib import contextmanager
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from typing import ContextManager, Dict, Iterator, List, Optional, Pattern, Tuple
+
+import pdfplumber
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover - pypdfium2 está en requirements.txt
+    pdfium = None
+
+from servicios.medicion import medir
+
+BACKEND_POR_DEFECTO = 'pypdfium2'
+BACKEND_RESPALDO = 'pdfplumber'
+
+# Archivos en memoria mayores que esto se copian a disco antes de leerlos
+UMBRAL_SPOOL_POR_DEFECTO = 5 * 1024 * 1024  # 5MB
+TAMANO_BLOQUE_SPOOL = 1024 * 1024  # 1MB
+
+
+class LectorPDF:
+    """PDF abierto por un backend: metadatos y texto de cada página bajo demanda"""
+
+    num_paginas = 0
+    metadata: Dict = {}
+
+    def texto_pagina(self, indice: int) -> str:
+        raise NotImplementedError
+
+    def palabras_recuadro(self, indice: int, inicio: Pattern, fin: Pattern) -> List[Dict]:
+        """
+        Palabras del recuadro de la página que va desde debajo de la línea con
+        la primera coincidencia de ``inicio`` hasta la primera de ``fin`` por
+        debajo de ella (o el final de la página). Sólo se extraen las palabras
+        del recuadro. Posiciones en puntos desde la esquina superior izquierda:
+        {'text', 'x0', 'x1', 'top', 'bottom'}; lista vacía sin ``inicio``.
+        """
+        raise NotImplementedError
+
+    def paginas(self, max_paginas: Optional[int] = None) -> Iterator[str]:
+        """Texto página a página; sólo se abre cada página al pedirla"""
+        total = self.num_paginas if not max_paginas else min(self.num_paginas, max_paginas)
+        for indice in range(total):
+            with medir('texto'):
+                texto = self.texto_pagina(indice)
+            yield texto
+
+
+class BackendTexto:
+    """Interfaz de un backend: texto por página y metadatos del PDF"""
+
+    nombre = None
+
+    def disponible(self) -> bool:
+        return True
+
+    def abrir(self, pdf_file) -> ContextManager[LectorPDF]:
+        raise NotImplementedError
+
+    def extraer(self, pdf_file) -> Tuple[List[str], Dict]:
+        """
+        Returns:
+            (paginas, metadata): lista con el texto de cada página y
+            diccionario de metadatos del PDF
+        """
+        with self.abrir(pdf_file) as lector:
+            return list(lector.paginas()), lector.metadata
+
+
+class _LectorPdfplumber(LectorPDF):
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.num_paginas = len(pdf.pages)
+        self.metadata = dict(pdf.metadata or {})
+
+    def texto_pagina(self, indice):
+        page = self.pdf.pages[indice]
+        try:
+            return page.extract_text() or ''
+        finally:
+            # Libera caracteres, objetos de disposición y textmap de la página
+            page.close()
+
+    def palabras_recuadro(self, indice, inicio, fin):
+        page = self.pdf.pages[indice]
+        try:
+            titulo = next(iter(page.search(inicio)), None)
+            if titulo is None:
+                return []
+            arriba = titulo['bottom']
+            abajo = min((match['top'] for match in page.search(fin) if match['top'] >= arriba), default=None)
+            x0, _, x1, fondo = page.bbox
+            recorte = page.crop((x0, arriba, x1, fondo if abajo is None else abajo))
+            return [
+                {clave: palabra[clave] for clave in ('text', 'x0', 'x1', 'top', 'bottom')}
+                for palabra in recorte.extract_words()
+                # El recorte incluye los caracteres que sólo tocan su borde
+                if palabra['top'] >= arriba and (abajo is None or palabra['top'] < abajo)
+            ]
+        finally:
+            page.close()
+
+
+class PdfplumberBackend(BackendTexto):
+    """Texto con análisis de disposición (pdfminer)"""
+
+    nombre = 'pdfplumber'
+
+    @contextmanager
+    def _abrir(self, fuente):
+        with medir('apertura'):
+            pdf = pdfplumber.open(fuente)
+            try:
+                lector = _LectorPdfplumber(pdf)
+            except Exception:
+                pdf.close()
+                raise
+        with pdf:
+            yield lector
+
+    @contextmanager
+    def abrir(self, pdf_file):
+        if not isinstance(pdf_file, str):
+            with self._abrir(pdf_file) as lector:
+                yield lector
+            return
+        # Ruta en disco: mapa de memoria (las páginas del archivo las gestiona el SO)
+        with open(pdf_file, 'rb') as archivo:
+            try:
+                fuente = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                fuente = None  # Archivo vacío o sistema de archivos sin mmap
+            try:
+                with self._abrir(fuente or archivo) as lector:
+                    yield lector
+            finally:
+                if fuente is not None:
+                    fuente.close()
+
+
+_PALABRA = re.compile(r'\S+')
+
+
+def _normalizar_texto_pdfium(texto: str) -> str:
+    # PDFium separa líneas con \r\n y deja espacios al final; se normaliza al
+    # formato de pdfplumber para que los patrones de los extractores no cambien
+    texto = texto.replace('\r\n', '\n').replace('\r', '\n').replace('\x02', '')
+    return '\n'.join(linea.rstrip() for linea in texto.split('\n')).strip('\n')
+
+
+def _buscar_pdfium(textpage, patron: Pattern, ancho: float, alto: float, desde: float) -> Optional[Tuple[float, float]]:
+    """
+    (top, bottom) de la primera coincidencia de ``patron`` que empieza por
+    debajo de ``desde`` (puntos desde arriba). El patrón se busca en el texto
+    de esa parte de la página (``get_text_bounded``) y lo encontrado se ubica
+    con la búsqueda de texto de PDFium.
+    """
+    match = patron.search(textpage.get_text_bounded(0, 0, ancho, alto - desde))
+    if match is None:
+        return None
+    buscador = textpage.search(' '.join(match.group().split()), match_case=False)
+    try:
+        while True:
+            ocurrencia = buscador.get_next()
+            if ocurrencia is None:
+                return None
+            primero, cantidad = ocurrencia
+            # Los caracteres generados (espacios entre palabras) no tienen caja
+            cajas = [caja for caja in map(textpage.get_charbox, range(primero, primero + cantidad)) if caja[1] != caja[3]]
+            if not cajas:
+                continue
+            top, bottom = alto - max(caja[3] for caja in cajas), alto - min(caja[1] for caja in cajas)
+            if top >= desde:
+                return top, bottom
+    finally:
+        buscador.close()
+
+
+class _LectorPdfium(LectorPDF):
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.num_paginas = len(pdf)
+        self.metadata = pdf.get_metadata_dict(skip_empty=True)
+
+    def texto_pagina(self, indice):
+        page = self.pdf[indice]
+        textpage = page.get_textpage()
+        try:
+            return _normalizar_texto_pdfium(textpage.get_text_bounded())
+        finally:
+            textpage.close()
+            page.close()
+
+    def palabras_recuadro(self, indice, inicio, fin):
+        page = self.pdf[indice]
+        textpage = page.get_textpage()
+        try:
+            ancho, alto = page.get_width(), page.get_height()
+            titulo = _buscar_pdfium(textpage, inicio, ancho, alto, 0)
+            if titulo is None:
+                return []
+            desde = titulo[1]
+            final = _buscar_pdfium(textpage, fin, ancho, alto, desde)
+            hasta = final[0] if final is not None else None
+            palabras = []
+            # Segmentos de texto de una misma línea y estilo (PDF: y hacia
+            # arriba); sólo se lee el texto de los que están en el recuadro
+            for segmento in range(textpage.count_rects()):
+                izquierda, abajo, derecha, arriba = textpage.get_rect(segmento)
+                if alto - arriba < desde or (hasta is not None and alto - arriba >= hasta):
+                    continue
+                texto = textpage.get_text_bounded(izquierda, abajo, derecha, arriba).replace('\x02', '')
+                # Un segmento puede tener varias palabras: su posición se interpola
+                ancho = (derecha - izquierda) / max(len(texto), 1)
+                for match in _PALABRA.finditer(texto):
+                    palabras.append({
+                        'text': match.group(),
+                        'x0': izquierda + match.start() * ancho,
+                        'x1': izquierda + match.end() * ancho,
+                        'top': alto - arriba,
+                        'bottom': alto - abajo,
+                    })
+            return palabras
+        finally:
+            textpage.close()
+            page.close()
+
+
+class Pypdfium2Backend(BackendTexto):
+    """Sólo la capa de texto, con PDFium"""
+
+    nombre = 'pypdfium2'
+
+    def disponible(self):
+        return pdfium is not None
+
+    @contextmanager
+    def abrir(self, pdf_file):
+        with medir('apertura'):
+            pdf = pdfium.PdfDocument(pdf_file)
+            try:
+                lector = _LectorPdfium(pdf)
+            except Exception:
+                pdf.close()
+                raise
+        try:
+            yield lector
+        finally:
+            pdf.close()
+
+
+BACKENDS: Dict[str, BackendTexto] = {
+    backend.nombre: backend for backend in (Pypdfium2Backend(), PdfplumberBackend())
+}
+
+
+def leer_configuracion(nombre, default):
+    """Lee un setting de Django si está configurado (los workers no siempre lo tienen)"""
+    try:
+        from django.conf import settings
+        from django.core.exceptions import ImproperlyConfigured
+    except ImportError:
+        return default
+    try:
+        if settings.configured or os.environ.get('DJANGO_SETTINGS_MODULE'):
+            return getattr(settings, nombre, default)
+    except ImproperlyConfigured:
+        pass
+    return default
+
+
+def _ruta_en_disco(pdf_file) -> Optional[str]:
+    """Ruta local del archivo si ya está en disco (ruta, archivo temporal o FieldFile)"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return os.fspath(pdf_file)
+    if hasattr(pdf_file, 'temporary_file_path'):
+        return pdf_file.temporary_file_path()
+    for obtener in (lambda: pdf_file.path, lambda: pdf_file.name):
+        try:
+            ruta = obtener()
+        except (AttributeError, NotImplementedError, ValueError):
+            continue
+        if isinstance(ruta, str) and os.path.isabs(ruta) and os.path.isfile(ruta):
+            return ruta
+    return None
+
+
+def _tamano(pdf_file) -> Optional[int]:
+    tamano = getattr(pdf_file, 'size', None)
+    if tamano is not None:
+        return tamano
+    try:
+        posicion = pdf_file.tell()
+        pdf_file.seek(0, os.SEEK_END)
+        tamano = pdf_file.tell()
+        pdf_file.seek(posicion)
+        return tamano
+    except (AttributeError, OSError):
+        return None
+
+
+@contextmanager
+def fuente_en_disco(pdf_file):
+    """
+    Fuente de lectura con memoria acotada para los backends (``abrir``).
+
+    - Archivo ya en disco: se entrega su ruta.
+    - Archivo en memoria mayor que EXTRACCION_UMBRAL_SPOOL_BYTES: se copia
+      por bloques a un temporal (que se borra al salir) y se entrega su ruta.
+    - Archivos pequeños en memoria se entregan tal cual.
+    """
+    ruta = _ruta_en_disco(pdf_file)
+    if ruta is not None:
+        yield ruta
+        return
+
+    tamano = _tamano(pdf_file)
+    umbral = leer_configuracion('EXTRACCION_UMBRAL_SPOOL_BYTES', UMBRAL_SPOOL_POR_DEFECTO)
+    if tamano is None or tamano <= umbral:
+        yield pdf_file
+        return
+
+    fd, temporal = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            pdf_file.seek(0)
+            shutil.copyfileobj(pdf_file, destino, TAMANO_BLOQUE_SPOOL)
+        pdf_file.seek(0)
+        yield temporal
+    finally:
+        os.remove(temporal)
+
+
+def backend_para_tipo(tipo: Optional[str] = None) -> str:
+    """Nombre del backend configurado para un tipo de documento (o el por defecto)"""
+    por_tipo = leer_configuracion('EXTRACCION_BACKEND_POR_TIPO', {}) or {}
+    if tipo and tipo in por_tipo:
+        return por_tipo[tipo]
+    return leer_configuracion('EXTRACCION_BACKEND_TEXTO', BACKEND_POR_DEFECTO)
+
+
+def obtener_backend(nombre: Optional[str] = None) -> BackendTexto:
+    """
+    Backend por nombre. Si no existe o no está instalado se usa pdfplumber.
+    """
+    backend = BACKENDS.get(nombre or backend_para_tipo())
+    if backend is None or not backend.disponible():
+        return BACKENDS[BACKEND_RESPALDO]
+    return backend
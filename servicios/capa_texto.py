@@ -0,0 +1,55 @@
+"""
+Capa de texto persistente de los documentos
+
+El texto por página que produce la primera lectura del PDF se guarda
+comprimido (``CapaTexto``) junto con la versión de los extractores que lo
+leyó. Al mejorar un patrón basta con volver a ejecutar los extractores sobre
+ese texto (``extractors.extraer_texto``): re-procesar el archivo histórico no
+descarga ni parsea ningún PDF.
+
+Las páginas se serializan como una lista JSON y se comprimen con zlib.
+No depende de Django: la capa se arma en los procesos hijos de extracción y
+viaja al padre dentro del resultado.
+"""
+
+import json
+from typing import Dict, List, Optional
+import zlib
+
+# Compresión zlib: 6 es el equilibrio por defecto entre tamaño y CPU
+NIVEL_COMPRESION = 6
+
+
+def comprimir_paginas(paginas: List[str]) -> bytes:
+    """Texto de las páginas como lista JSON comprimida"""
+    return zlib.compress(json.dumps(paginas, ensure_ascii=False).encode('utf-8'), NIVEL_COMPRESION)
+
+
+def descomprimir_paginas(comprimido) -> List[str]:
+    """Inverso de ``comprimir_paginas`` (acepta bytes o memoryview)"""
+    return json.loads(zlib.decompress(comprimido).decode('utf-8'))
+
+
+def capa_de_parseado(parseado, version: int) -> Optional[Dict]:
+    """
+    Capa de texto serializable de un ``DocumentoParseado``
+
+    Args:
+        parseado: texto leído del PDF (None para los libros .xlsx, que se
+            leen por celdas y no tienen capa de texto)
+        version: ``extractors.VERSION_EXTRACTORES`` que hizo la lectura
+
+    Returns:
+        {'texto_comprimido': bytes, 'paginas': int, 'paginas_totales': int,
+         'backend': str, 'version_extractor': int, 'tamano_texto': int} o None
+    """
+    if parseado is None:
+        return None
+    return {
+        'texto_comprimido': comprimir_paginas(parseado.paginas),
+        'paginas': parseado.num_paginas,
+        'paginas_totales': parseado.paginas_totales,
+        'backend': parseado.backend or '',
+        'version_extractor': version,
+        'tamano_texto': len(parseado.texto),
+    }
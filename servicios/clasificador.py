@@ -0,0 +1,122 @@
+"""
+Clasificación del tipo de documento por palabras clave
+
+Las palabras clave (``palabras_clave``), las de desempate (``palabras_prioridad``)
+y los códigos de formato (``codigos_formato``, p. ej. OYS-FO-43) de todos los
+extractores registrados se reúnen en una sola tabla. Cada palabra distinta se
+busca una única vez sobre el texto en minúsculas, aunque la usen varios tipos,
+y con esos resultados se puntúan todos los tipos a la vez. Todos los códigos
+OYS-FO se resuelven con una sola búsqueda, así que agregar familias de
+formatos no agrega recorridos del texto.
+
+Un autómata Aho-Corasick en Python puro recorre el texto carácter a carácter
+y resultó varias veces más lento que las búsquedas en C de ``str``
+para la cantidad de palabras que usamos.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+# Código de formato impreso en el encabezado de las plantillas (OYS-FO-43, OYS FO 44...)
+PATRON_CODIGO_FORMATO = re.compile(r'oys[\s\-]*fo[\s\-]*(\d+)')
+
+
+def normalizar_codigo(codigo: str) -> str:
+    """'OYS-FO-43' -> '43'"""
+    match = PATRON_CODIGO_FORMATO.search(codigo.lower())
+    return match.group(1).lstrip('0') if match else codigo.lower()
+
+
+class Clasificacion(NamedTuple):
+    """Resultado de la clasificación"""
+    indice: int            # Posición del extractor ganador en la lista (o -1)
+    tipo: str              # Tipo de documento o 'desconocido'
+    confianza: float       # 0.0 - 1.0
+    puntajes: Dict[str, int]
+
+
+class ClasificadorPalabras:
+    """Puntúa todos los tipos de documento con una sola búsqueda por palabra"""
+
+    def __init__(self, extractores):
+        self.extractores = list(extractores)
+        self.palabras: List[str] = []
+        self._indices: Dict[str, int] = {}
+        # Palabras de las que sólo importa si aparecen (no cuántas veces)
+        self._solo_presencia = set()
+        self.reglas = []
+        self.codigos: Dict[str, int] = {}
+
+        for posicion, cls in enumerate(self.extractores):
+            deteccion = [self._indice(p) for p in cls.palabras_clave]
+            prioridad = [self._indice(p) for p in cls.palabras_prioridad]
+            self._solo_presencia.update(deteccion)
+            self.reglas.append((cls.tipo, deteccion, cls.minimo_palabras_clave, prioridad))
+            for codigo in getattr(cls, 'codigos_formato', []):
+                self.codigos[normalizar_codigo(codigo)] = posicion
+
+        # Las de prioridad se cuentan aunque también sean de detección
+        for _, _, _, prioridad in self.reglas:
+            self._solo_presencia.difference_update(prioridad)
+
+    def _indice(self, palabra: str) -> int:
+        palabra = palabra.lower()
+        if palabra not in self._indices:
+            self._indices[palabra] = len(self.palabras)
+            self.palabras.append(palabra)
+        return self._indices[palabra]
+
+    def ocurrencias(self, minusculas: str) -> List[int]:
+        """
+        Ocurrencias de cada palabra en el texto. Son aditivas: las de un texto
+        son la suma de las de sus páginas, porque ninguna palabra contiene el
+        salto de línea que las une (la lectura por páginas las suma).
+        """
+        return [
+            (1 if palabra in minusculas else 0) if i in self._solo_presencia else minusculas.count(palabra)
+            for i, palabra in enumerate(self.palabras)
+        ]
+
+    def por_codigo(self, minusculas: str) -> Optional[Clasificacion]:
+        """Clasificación por el primer código de formato conocido del texto (o None)"""
+        for match in PATRON_CODIGO_FORMATO.finditer(minusculas):
+            posicion = self.codigos.get(match.group(1).lstrip('0'))
+            if posicion is not None:
+                tipo = self.extractores[posicion].tipo
+                return Clasificacion(posicion, tipo, 1.0, {tipo: 1})
+        return None
+
+    def clasificar(self, minusculas: str) -> Clasificacion:
+        """
+        Clasifica un texto ya convertido a minúsculas
+
+        Un código de formato conocido decide el tipo con confianza 1.0. Si no,
+        se aplican las reglas históricas: se requieren ``minimo_palabras_clave``
+        palabras distintas y, si varios tipos cumplen, gana el de más
+        ocurrencias de ``palabras_prioridad`` (en empate, el último registrado).
+        La confianza es la proporción de evidencia (palabras encontradas más
+        ocurrencias de prioridad) del ganador frente a todos los candidatos.
+        """
+        por_codigo = self.por_codigo(minusculas)
+        if por_codigo is not None:
+            return por_codigo
+        return self.por_ocurrencias(self.ocurrencias(minusculas))
+
+    def por_ocurrencias(self, ocurrencias: List[int]) -> Clasificacion:
+        """Clasificación por palabras clave a partir de ``ocurrencias``"""
+        puntajes, evidencia = {}, {}
+        elegido, mejor = -1, -1
+        for posicion, (tipo, deteccion, minimo, prioridad) in enumerate(self.reglas):
+            encontradas = sum(1 for i in deteccion if ocurrencias[i])
+            if encontradas < minimo:
+                continue
+            puntaje = sum(ocurrencias[i] for i in prioridad)
+            puntajes[tipo] = puntaje
+            evidencia[posicion] = encontradas + puntaje
+            if puntaje >= mejor:
+                elegido, mejor = posicion, puntaje
+
+        if elegido < 0:
+            return Clasificacion(-1, 'desconocido', 0.0, puntajes)
+        confianza = evidencia[elegido] / sum(evidencia.values())
+        return Clasificacion(elegido, self.reglas[elegido][0], round(confianza, 3), puntajes)
@@ -0,0 +1,233 @@
+"""
+Cola de extracción respaldada por base de datos
+
+La vista de carga sólo guarda el archivo y encola un ``TrabajoExtraccion``;
+el comando ``manage.py procesar_extracciones`` toma los trabajos pendientes y
+ejecuta el pipeline de ``servicios.procesamiento`` fuera de la petición web.
+Los fallos se reintentan con backoff exponencial y, al agotar los intentos,
+el trabajo queda en estado 'fallido' (dead-letter) para revisión manual. Un
+documento que supera el tiempo o la memoria máximos de la extracción
+(``servicios.aislamiento``) o que la revisión previa rechaza (PDF con
+contraseña, escaneado, otro tipo de archivo; ``servicios.preflight``) va
+directo a dead-letter.
+No requiere ningún broker externo.
+"""
+
+from datetime import timedelta
+import logging
+import os
+import socket
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from servicios.aislamiento import ExtraccionExcedida, TiempoExtraccionAgotado
+from servicios.models import TrabajoExtraccion
+from servicios.preflight import DocumentoRechazado
+from servicios.procesamiento import procesar_documento
+
+logger = logging.getLogger(__name__)
+
+
+def _config(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+def identificador_worker():
+    """Identificador legible del proceso worker (host:pid)"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def calcular_backoff(intentos):
+    """Segundos de espera antes del siguiente intento (exponencial con tope)"""
+    base = _config('EXTRACCION_BACKOFF_SEGUNDOS', 30)
+    maximo = _config('EXTRACCION_BACKOFF_MAXIMO_SEGUNDOS', 3600)
+    return min(base * (2 ** max(intentos - 1, 0)), maximo)
+
+
+def _preparar_trabajo(documento, estado, max_intentos, **campos):
+    """Crea o reinicia el trabajo de extracción del Documento"""
+    valores = {
+        'estado': estado,
+        'intentos': 0,
+        'max_intentos': max_intentos,
+        'disponible_desde': timezone.now(),
+        'bloqueado_por': '',
+        'bloqueado_en': None,
+        'ultimo_error': '',
+    }
+    valores.update(campos)
+    documento.estado_procesamiento = 'pendiente' if estado == 'pendiente' else 'procesando'
+    documento.save(update_fields=['estado_procesamiento', 'fecha_actualizacion'])
+    trabajo, _ = TrabajoExtraccion.objects.update_or_create(documento=documento, defaults=valores)
+    return trabajo
+
+
+def encolar_documento(documento, max_intentos=None):
+    """
+    Marca el Documento como pendiente y crea (o reinicia) su trabajo de extracción
+
+    Args:
+        documento: Documento ya guardado con su archivo
+        max_intentos: intentos permitidos (por defecto EXTRACCION_MAX_INTENTOS)
+    """
+    if max_intentos is None:
+        max_intentos = _config('EXTRACCION_MAX_INTENTOS', 3)
+    return _preparar_trabajo(documento, 'pendiente', max_intentos)
+
+
+def ejecutar_en_linea(documento):
+    """
+    Procesa el Documento dentro de la petición (EXTRACCION_ASINCRONA = False).
+    Un solo intento: si falla, el trabajo queda directamente en dead-letter.
+
+    Returns:
+        True si el documento se procesó correctamente
+    """
+    trabajo = _preparar_trabajo(
+        documento, 'procesando', 1,
+        intentos=1,
+        bloqueado_por=identificador_worker(),
+        bloqueado_en=timezone.now(),
+    )
+    return ejecutar_trabajo(trabajo)
+
+
+def tomar_siguiente_trabajo(worker=None):
+    """
+    Reclama atómicamente el siguiente trabajo disponible.
+    También recupera trabajos 'procesando' cuyo worker murió (bloqueo vencido).
+
+    Returns:
+        TrabajoExtraccion reclamado o None si no hay trabajos disponibles
+    """
+    worker = worker or identificador_worker()
+    ahora = timezone.now()
+    bloqueo_vencido = ahora - timedelta(seconds=_config('EXTRACCION_BLOQUEO_SEGUNDOS', 600))
+
+    disponibles = TrabajoExtraccion.objects.filter(
+        Q(estado='pendiente', disponible_desde__lte=ahora) |
+        Q(estado='procesando', bloqueado_en__lt=bloqueo_vencido)
+    ).order_by('disponible_desde', 'id')
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            disponibles = disponibles.select_for_update(skip_locked=True)
+        trabajo = disponibles.first()
+        if trabajo is None:
+            return None
+
+        # El filtro por estado evita que dos workers reclamen el mismo trabajo
+        # en bases de datos sin SELECT ... FOR UPDATE (SQLite)
+        reclamado = TrabajoExtraccion.objects.filter(
+            pk=trabajo.pk, estado=trabajo.estado, bloqueado_en=trabajo.bloqueado_en
+        ).update(
+            estado='procesando',
+            bloqueado_por=worker,
+            bloqueado_en=ahora,
+            intentos=F('intentos') + 1,
+        )
+    if not reclamado:
+        return None
+
+    trabajo.refresh_from_db()
+    trabajo.documento.estado_procesamiento = 'procesando'
+    trabajo.documento.save(update_fields=['estado_procesamiento', 'fecha_actualizacion'])
+    return trabajo
+
+
+def registrar_fallo(trabajo, error, definitivo=False):
+    """
+    Programa un reintento con backoff o envía el trabajo a dead-letter
+    (siempre, con ``definitivo``)
+    """
+    documento = trabajo.documento
+    trabajo.ultimo_error = str(error)
+    trabajo.bloqueado_por = ''
+    trabajo.bloqueado_en = None
+
+    if definitivo or trabajo.intentos >= trabajo.max_intentos:
+        trabajo.estado = 'fallido'
+        documento.estado_procesamiento = 'error'
+        documento.extraido_exitosamente = False
+        documento.error_extraccion = str(error)
+        logger.error(
+            f'Trabajo de extracción {trabajo.id} fallido tras {trabajo.intentos} intentos: {error}'
+        )
+    else:
+        espera = calcular_backoff(trabajo.intentos)
+        trabajo.estado = 'pendiente'
+        trabajo.disponible_desde = timezone.now() + timedelta(seconds=espera)
+        documento.estado_procesamiento = 'pendiente'
+        documento.error_extraccion = str(error)
+        logger.warning(
+            f'Trabajo de extracción {trabajo.id} falló (intento {trabajo.intentos}), '
+            f'reintento en {espera}s: {error}'
+        )
+
+    trabajo.save()
+    documento.save(update_fields=[
+        'estado_procesamiento', 'extraido_exitosamente', 'error_extraccion', 'fecha_actualizacion'
+    ])
+
+
+def registrar_limite_excedido(trabajo, error):
+    """
+    El documento superó el tiempo o la memoria máximos: reintentarlo daría el
+    mismo resultado, así que el trabajo pasa directamente a dead-letter
+    (se puede reencolar desde el admin)
+    """
+    if isinstance(error, TiempoExtraccionAgotado):
+        trabajo.timeouts += 1
+        trabajo.ultimo_timeout = timezone.now()
+    registrar_fallo(trabajo, error, definitivo=True)
+
+
+def ejecutar_trabajo(trabajo):
+    """
+    Ejecuta el pipeline de extracción de un trabajo ya reclamado
+
+    Returns:
+        True si el documento se procesó correctamente
+    """
+    try:
+        procesar_documento(trabajo.documento)
+    except ExtraccionExcedida as e:
+        logger.error(f'Documento {trabajo.documento_id} superó los límites de extracción: {str(e)}')
+        registrar_limite_excedido(trabajo, e)
+        return False
+    except DocumentoRechazado as e:
+        # Reintentar daría el mismo resultado
+        logger.warning(f'Documento {trabajo.documento_id} rechazado ({e.codigo}): {str(e)}')
+        registrar_fallo(trabajo, e, definitivo=True)
+        return False
+    except Exception as e:
+        logger.error(f'Error procesando documento {trabajo.documento_id}: {str(e)}', exc_info=True)
+        registrar_fallo(trabajo, e)
+        return False
+
+    trabajo.estado = 'completado'
+    trabajo.ultimo_error = ''
+    trabajo.bloqueado_por = ''
+    trabajo.bloqueado_en = None
+    trabajo.save()
+    return True
+
+
+def procesar_pendientes(limite=None, worker=None):
+    """
+    Procesa trabajos disponibles hasta vaciar la cola (o alcanzar ``limite``)
+
+    Returns:
+        Cantidad de trabajos procesados
+    """
+    procesados = 0
+    while limite is None or procesados < limite:
+        trabajo = tomar_siguiente_trabajo(worker)
+        if trabajo is None:
+            break
+        ejecutar_trabajo(trabajo)
+        procesados += 1
+    return procesados
@@ -0,0 +1,324 @@
+"""
+Corpus sintético de certificados e informes para medir la extracción
+
+Genera con reportlab PDFs que imitan las plantillas propias:
+
+- OYS-FO-36: informe de reparación de válvulas de seguridad
+- OYS-FO-37: informe de mantenimiento de válvulas de corte o control
+- OYS-FO-43: certificado de calibración en banco de pruebas
+- OYS-FO-44: certificado de calibración en línea con equipo VST
+
+Cada documento varía el idioma de las etiquetas (es/en), el formato de las
+fechas y la cantidad de páginas (anexos con registros de prueba), y guarda los
+valores con que se generó (``esperado``) para medir la exactitud de cada
+campo. La generación es determinista para una misma semilla, así que dos
+corridas del benchmark miden exactamente los mismos archivos.
+"""
+
+from datetime import date, timedelta
+import io
+import json
+import os
+import random
+from typing import Dict, List, NamedTuple, Optional
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+MESES = {
+    'es': ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+           'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'],
+    'en': ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+           'August', 'September', 'October', 'November', 'December'],
+}
+
+# Formatos de fecha vistos en los certificados (strftime, o 'largo': "5 de marzo de 2026")
+FORMATOS_FECHA = ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d', '%d/%m/%y', 'largo')
+
+# Páginas por documento y su peso: la mayoría tiene 1-3, algunos traen anexos largos
+PAGINAS = ((1, 30), (2, 30), (3, 15), (5, 10), (12, 10), (30, 5))
+
+# Posición x de las columnas de la tabla de resultados de calibración
+COLUMNAS_TABLA = (50, 110, 210, 330, 450)
+
+# Tipo de documento que produce cada plantilla
+TIPOS_FORMATO = {
+    'OYS-FO-36': 'reparacion',
+    'OYS-FO-37': 'mantenimiento',
+    'OYS-FO-43': 'calibracion',
+    'OYS-FO-44': 'calibracion',
+}
+
+TITULOS = {
+    'OYS-FO-36': {
+        'es': 'INFORME REPARACIÓN VÁLVULAS DE SEGURIDAD',
+        'en': 'SAFETY VALVE REPAIR REPORT',
+    },
+    'OYS-FO-37': {
+        'es': 'INFORME DE MANTENIMIENTO VÁLVULA DE CORTE O CONTROL DE PROCESO',
+        'en': 'MAINTENANCE REPORT - ON/OFF OR PROCESS CONTROL VALVE',
+    },
+    'OYS-FO-43': {
+        'es': 'CERTIFICADO DE CALIBRACIÓN DE VÁLVULA DE SEGURIDAD EN BANCO DE PRUEBAS',
+        'en': 'SAFETY VALVE CALIBRATION CERTIFICATE ON TEST BENCH',
+    },
+    'OYS-FO-44': {
+        'es': 'CERTIFICADO DE CALIBRACIÓN DE VÁLVULA DE SEGURIDAD EN LÍNEA CON EQUIPO VST',
+        'en': 'SAFETY VALVE IN-LINE CALIBRATION CERTIFICATE WITH VST EQUIPMENT',
+    },
+}
+
+ETIQUETAS = {
+    'es': {
+        'codigo': 'CÓDIGO', 'version': 'VERSIÓN', 'pagina': 'Página {} de {}',
+        'informe': 'Informe #', 'certificado': 'NÚMERO DE CERTIFICADO:', 'empresa': 'Empresa:',
+        'cliente': 'CLIENTE:', 'marca': 'Marca:', 'modelo': 'Modelo:', 'serie': 'No. Serie:',
+        'tamano': 'Tamaño Ent. x Sal.:', 'presion_set': 'Presión SET:', 'presion_cal': 'PRESIÓN CALIBRACIÓN:',
+        'presion_max': 'PRESIÓN MÁXIMA:', 'fecha': 'Fecha:', 'fecha_calibracion': 'FECHA DE CALIBRACIÓN:',
+        'fecha_emision': 'FECHA DE EMISIÓN:', 'metodo': 'MÉTODO UTILIZADO:', 'fluido': 'FLUIDO DE PRUEBA:',
+        'condiciones': 'CONDICIONES AMBIENTALES', 'temperatura': 'Temperatura:', 'humedad': 'Humedad relativa:',
+        'patrones': 'PATRONES UTILIZADOS', 'resultado': 'Resultado:', 'conforme': 'Conforme',
+        'tecnico': 'Técnico:', 'desmontaje': 'DESMONTAJE / DESARMADO', 'estado_final': 'ESTADO FINAL Y PRUEBAS OPERATIVAS',
+        'actividades': 'ACTIVIDADES DE REPARACIÓN', 'observaciones': 'Observaciones:',
+        'anexo': 'ANEXO {} - REGISTRO DE PRUEBAS', 'lectura': 'Lectura {:02d}: presión {} psi  temperatura {} °C  estado conforme',
+        'resultados': 'SECCIÓN 7: RESULTADOS DE CALIBRACIÓN',
+        'columnas_pruebas': ('Prueba', 'Presión SET', 'Presión de apertura', 'Presión de cierre', 'Unidad'),
+    },
+    'en': {
+        'codigo': 'CODE', 'version': 'VERSION', 'pagina': 'Page {} of {}',
+        'informe': 'Report #', 'certificado': 'CERTIFICATE NUMBER:', 'empresa': 'Company:',
+        'cliente': 'CUSTOMER:', 'marca': 'Brand:', 'modelo': 'Model:', 'serie': 'Serial Number:',
+        'tamano': 'Size In x Out:', 'presion_set': 'SET Pressure:', 'presion_cal': 'CALIBRATION PRESSURE:',
+        'presion_max': 'MAXIMUM PRESSURE:', 'fecha': 'Date:', 'fecha_calibracion': 'CALIBRATION DATE:',
+        'fecha_emision': 'ISSUE DATE:', 'metodo': 'METHOD USED:', 'fluido': 'TEST FLUID:',
+        'condiciones': 'ENVIRONMENTAL CONDITIONS', 'temperatura': 'Temperature:', 'humedad': 'Relative humidity:',
+        'patrones': 'REFERENCE STANDARDS', 'resultado': 'Result:', 'conforme': 'Passed',
+        'tecnico': 'Technician:', 'desmontaje': 'DISASSEMBLY', 'estado_final': 'FINAL CONDITION AND OPERATIONAL TESTS',
+        'actividades': 'REPAIR ACTIVITIES', 'observaciones': 'Remarks:',
+        'anexo': 'ANNEX {} - TEST RECORD', 'lectura': 'Reading {:02d}: pressure {} psi  temperature {} °C  condition ok',
+        'resultados': 'SECTION 7: CALIBRATION RESULTS',
+        'columnas_pruebas': ('Run', 'SET Pressure', 'Popping pressure', 'Reseat pressure', 'Unit'),
+    },
+}
+
+MARCAS = ('Crosby', 'Farris', 'Consolidated', 'Anderson Greenwood', 'Kunkle', 'Leser', 'Taylor', 'Fisher', 'Masoneilan')
+MODELOS = ('JOS-E', '2600', '1900-30', '6010', 'JBS-E', '526', '900', 'ET-EZ', '21000')
+TAMANOS = ('1" x 2"', '1 1/2" x 2 1/2"', '2" x 3"', '3" x 4"', '4" x 6"', '3/4" x 1"')
+EMPRESAS = ('Refinería del Pacífico S.A.', 'Gases Industriales Andinos', 'Petroquímica del Norte',
+            'Termoeléctrica La Sierra', 'Alimentos El Valle Ltda.')
+TECNICOS = ('Carlos Pérez', 'Ana Gómez', 'Luis Martínez', 'Diana Rojas')
+FLUIDOS = ('Aire', 'Nitrógeno', 'Agua')
+
+
+class DocumentoSintetico(NamedTuple):
+    """PDF generado y los valores con que se generó"""
+    nombre: str
+    formato: str           # Código de la plantilla (OYS-FO-43...)
+    tipo: str              # Tipo de documento esperado
+    idioma: str            # 'es' o 'en'
+    formato_fecha: str     # Entrada de FORMATOS_FECHA
+    paginas: int
+    contenido: bytes
+    esperado: Dict[str, str]  # Campo del extractor -> valor impreso
+
+
+def formatear_fecha(fecha: date, formato: str, idioma: str = 'es') -> str:
+    if formato != 'largo':
+        return fecha.strftime(formato)
+    mes = MESES[idioma][fecha.month - 1]
+    if idioma == 'en':
+        return f'{mes} {fecha.day}, {fecha.year}'
+    return f'{fecha.day} de {mes} de {fecha.year}'
+
+
+class _Pagina:
+    """Escribe líneas de arriba hacia abajo sobre el lienzo"""
+
+    def __init__(self, lienzo, y=750):
+        self.lienzo = lienzo
+        self.y = y
+
+    def linea(self, texto, x=50, salto=16, negrita=False):
+        self.lienzo.setFont('Helvetica-Bold' if negrita else 'Helvetica', 10)
+        self.lienzo.drawString(x, self.y, texto)
+        self.y -= salto
+
+    def columnas(self, izquierda, derecha):
+        """Dos campos en la misma fila, como en las celdas de la plantilla"""
+        self.linea(izquierda, salto=0)
+        self.linea(derecha, x=320)
+
+    def fila(self, celdas, negrita=False):
+        """Fila de una tabla con columnas en ``COLUMNAS_TABLA``"""
+        for x, celda in zip(COLUMNAS_TABLA, celdas):
+            self.linea(celda, x=x, salto=0, negrita=negrita)
+        self.y -= 14
+
+
+def _valores(aleatorio: random.Random, formato: str) -> Dict:
+    fecha = date(2024, 1, 1) + timedelta(days=aleatorio.randrange(900))
+    marca = aleatorio.choice(MARCAS)
+    letras = ''.join(aleatorio.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(2))
+    if formato in ('OYS-FO-43', 'OYS-FO-44'):
+        numero = f'CAL-{fecha.year}-{aleatorio.randrange(10000):04d}'
+    elif formato == 'OYS-FO-36':
+        numero = f'GEC{aleatorio.randrange(1, 4)}-{aleatorio.randrange(1000, 9999)}-{aleatorio.randrange(1, 9)}'
+    else:
+        numero = f'MTO-{aleatorio.randrange(100000):05d}'
+    return {
+        'numero_documento': numero,
+        'numero_serie': f'{letras}{aleatorio.randrange(10000, 999999)}',
+        'modelo': aleatorio.choice(MODELOS),
+        'marca': marca,
+        'tamaño': aleatorio.choice(TAMANOS),
+        'fecha': fecha,
+        'presion': f'{aleatorio.randrange(50, 1500)}',
+        'empresa': aleatorio.choice(EMPRESAS),
+        'tecnico': aleatorio.choice(TECNICOS),
+        'fluido': aleatorio.choice(FLUIDOS),
+    }
+
+
+def _encabezado(pagina: _Pagina, formato, idioma, numero_pagina, total):
+    e = ETIQUETAS[idioma]
+    pagina.linea(TITULOS[formato][idioma], negrita=True, salto=18)
+    pagina.linea(f'{e["codigo"]} {formato}   {e["version"]} 04   {e["pagina"].format(numero_pagina, total)}', salto=24)
+
+
+def pruebas_esperadas(valores: Dict) -> List[Dict]:
+    """Filas de la tabla de resultados de un certificado (tres disparos sobre la presión SET)"""
+    presion = float(valores['presion'])
+    return [
+        {
+            'prueba': str(numero),
+            'presion_set': valores['presion'],
+            'presion_apertura': f'{presion * (1 + numero / 100):.1f}',
+            'presion_cierre': f'{presion * 0.93:.1f}',
+            'unidad': 'psi',
+        }
+        for numero in (1, 2, 3)
+    ]
+
+
+def _primera_pagina(pagina: _Pagina, formato, idioma, valores, fecha_texto):
+    e = ETIQUETAS[idioma]
+    if formato in ('OYS-FO-43', 'OYS-FO-44'):
+        metodo = 'Banco de pruebas' if formato == 'OYS-FO-43' else 'En línea con equipo VST'
+        pagina.linea(f'{e["metodo"]} {metodo}')
+        pagina.columnas(f'{e["certificado"]} {valores["numero_documento"]}',
+                        f'{e["fecha_calibracion"]} {fecha_texto}')
+        pagina.linea(f'{e["fecha_emision"]} {fecha_texto}')
+        pagina.linea(f'{e["cliente"]} {valores["empresa"]}', salto=24)
+        pagina.columnas(f'{e["marca"].upper()} {valores["marca"]}', f'{e["tamano"].upper()} {valores["tamaño"]}')
+        pagina.columnas(f'{e["modelo"].upper()} {valores["modelo"]}', f'{e["serie"].upper()} {valores["numero_serie"]}')
+        pagina.linea(f'{e["presion_cal"]} {valores["presion"]} psi')
+        pagina.linea(f'{e["fluido"]} {valores["fluido"]}', salto=24)
+        pagina.linea(e['patrones'], negrita=True)
+        pagina.linea('MANÓMETRO ADDITEL 681   Serie 2109042   Certificado LAB-0912')
+        pagina.linea('TRANSDUCTOR DE PRESIÓN DRUCK PTX 5072   Serie 5120881', salto=24)
+        pagina.linea(e['condiciones'], negrita=True)
+        pagina.columnas(f'{e["temperatura"]} {20 + valores["fecha"].day % 8} °C', f'{e["humedad"]} 55 %')
+        pagina.y -= 8
+        pagina.linea(e['resultados'], negrita=True)
+        pagina.fila(e['columnas_pruebas'], negrita=True)
+        for prueba in pruebas_esperadas(valores):
+            pagina.fila(list(prueba.values()))
+        pagina.y -= 8
+        pagina.linea(f'{e["resultado"]} {e["conforme"]}')
+    else:
+        pagina.columnas(f'{e["informe"]} {valores["numero_documento"]}', f'{e["fecha"]} {fecha_texto}')
+        pagina.linea(f'{e["empresa"]} {valores["empresa"]}', salto=24)
+        pagina.columnas(f'{e["marca"]} {valores["marca"]}', f'{e["modelo"]} {valores["modelo"]}')
+        pagina.columnas(f'{e["serie"]} {valores["numero_serie"]}', f'{e["tamano"]} {valores["tamaño"]}')
+        presion = e['presion_set'] if formato == 'OYS-FO-36' else e['presion_max']
+        pagina.linea(f'{presion} {valores["presion"]} PSI', salto=24)
+        titulo = e['desmontaje'] if formato == 'OYS-FO-36' else e['actividades']
+        pagina.linea(titulo, negrita=True)
+        for paso in ('Desmontaje de bonete y resorte', 'Limpieza de internos', 'Lapeado de disco y boquilla',
+                     'Cambio de empaques', 'Armado y ajuste'):
+            pagina.linea(f'- {paso}')
+    pagina.y -= 8
+    pagina.linea(f'{e["tecnico"]} {valores["tecnico"]}')
+
+
+def _pagina_adicional(pagina: _Pagina, formato, idioma, numero, aleatorio):
+    e = ETIQUETAS[idioma]
+    if numero == 2 and formato == 'OYS-FO-36':
+        pagina.linea(e['estado_final'], negrita=True)
+    else:
+        pagina.linea(e['anexo'].format(numero - 1), negrita=True)
+    for i in range(30):
+        presion = f'{aleatorio.randrange(50, 1500)}.{aleatorio.randrange(10)}'
+        pagina.linea(e['lectura'].format(i + 1, presion, 18 + aleatorio.randrange(10)), salto=14)
+    pagina.linea(f'{e["observaciones"]} Sin novedades')
+
+
+def generar_documento(aleatorio: random.Random, indice: int, formato: Optional[str] = None) -> DocumentoSintetico:
+    """Un documento con plantilla, idioma, formato de fecha y páginas al azar"""
+    formato = formato or aleatorio.choice(sorted(TIPOS_FORMATO))
+    idioma = aleatorio.choice(('es', 'es', 'en'))
+    formato_fecha = aleatorio.choice(FORMATOS_FECHA)
+    paginas = aleatorio.choices([p for p, _ in PAGINAS], weights=[w for _, w in PAGINAS])[0]
+    valores = _valores(aleatorio, formato)
+    fecha_texto = formatear_fecha(valores['fecha'], formato_fecha, idioma)
+
+    buffer = io.BytesIO()
+    lienzo = canvas.Canvas(buffer, pagesize=letter)
+    lienzo.setTitle(f'{formato} {valores["numero_documento"]}')
+    for numero in range(1, paginas + 1):
+        pagina = _Pagina(lienzo)
+        _encabezado(pagina, formato, idioma, numero, paginas)
+        if numero == 1:
+            _primera_pagina(pagina, formato, idioma, valores, fecha_texto)
+        else:
+            _pagina_adicional(pagina, formato, idioma, numero, aleatorio)
+        lienzo.showPage()
+    lienzo.save()
+
+    tipo = TIPOS_FORMATO[formato]
+    campo_fecha = 'fecha_emision' if tipo == 'calibracion' else 'fecha_mantenimiento'
+    esperado = {campo: valores[campo] for campo in ('numero_documento', 'numero_serie', 'modelo', 'marca', 'tamaño')}
+    esperado[campo_fecha] = fecha_texto
+    if tipo == 'calibracion':
+        esperado['pruebas'] = pruebas_esperadas(valores)
+    return DocumentoSintetico(
+        nombre=f'{indice:04d}_{formato}_{idioma}_{paginas}p.pdf',
+        formato=formato,
+        tipo=tipo,
+        idioma=idioma,
+        formato_fecha=formato_fecha,
+        paginas=paginas,
+        contenido=buffer.getvalue(),
+        esperado=esperado,
+    )
+
+
+def generar_corpus(cantidad: int = 60, semilla: int = 42) -> List[DocumentoSintetico]:
+    """
+    Corpus determinista: la misma semilla produce los mismos documentos. Las
+    plantillas se reparten por igual (una de cada cuatro por turno).
+    """
+    aleatorio = random.Random(semilla)
+    formatos = sorted(TIPOS_FORMATO)
+    return [generar_documento(aleatorio, i, formatos[i % len(formatos)]) for i in range(cantidad)]
+
+
+def guardar_corpus(documentos: List[DocumentoSintetico], carpeta: str) -> str:
+    """
+    Escribe los PDFs y un ``manifiesto.json`` con los valores esperados
+
+    Returns:
+        Ruta del manifiesto
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    manifiesto = []
+    for documento in documentos:
+        with open(os.path.join(carpeta, documento.nombre), 'wb') as archivo:
+            archivo.write(documento.contenido)
+        manifiesto.append({
+            campo: valor for campo, valor in documento._asdict().items() if campo != 'contenido'
+        })
+    ruta = os.path.join(carpeta, 'manifiesto.json')
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=2)
+    return ruta
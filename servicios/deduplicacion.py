@@ -0,0 +1,71 @@
+"""
+Deduplicación de documentos por contenido (SHA-256)
+
+Un mismo certificado suele subirse varias veces. Si el hash ya existe se
+reutiliza el archivo almacenado y, si la extracción anterior terminó, también
+los datos extraídos guardados en ``Documento.datos_extraidos``.
+"""
+
+import hashlib
+
+from servicios.models import Documento
+
+TAMANO_BLOQUE_HASH = 1024 * 1024  # 1MB
+
+
+def calcular_sha256(archivo):
+    """
+    SHA-256 de un archivo subido, un File de Django o una ruta en disco.
+    Usa el hash calculado durante la carga si está disponible.
+    """
+    sha256 = getattr(archivo, 'sha256', None)
+    if sha256:
+        return sha256
+
+    digest = hashlib.sha256()
+    if isinstance(archivo, str):
+        with open(archivo, 'rb') as contenido:
+            for bloque in iter(lambda: contenido.read(TAMANO_BLOQUE_HASH), b''):
+                digest.update(bloque)
+        return digest.hexdigest()
+
+    archivo.seek(0)
+    for bloque in archivo.chunks(TAMANO_BLOQUE_HASH):
+        digest.update(bloque)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+def buscar_original(hash_contenido, excluir=None):
+    """
+    Documento previo con el mismo contenido, priorizando el que ya tiene
+    datos extraídos en caché
+
+    Args:
+        hash_contenido: SHA-256 del archivo
+        excluir: Documento a ignorar (el propio documento en proceso)
+
+    Returns:
+        Documento o None
+    """
+    if not hash_contenido:
+        return None
+    candidatos = Documento.objects.filter(hash_contenido=hash_contenido).exclude(archivo_pdf='')
+    if excluir is not None and excluir.pk:
+        candidatos = candidatos.exclude(pk=excluir.pk)
+    return (
+        candidatos.filter(datos_extraidos__isnull=False).order_by('id').first()
+        or candidatos.order_by('id').first()
+    )
+
+
+def payload_en_cache(original):
+    """
+    Resultado de extracción reutilizable de un documento previo
+
+    Returns:
+        (tipo, datos) o None si el original no tiene extracción completa
+    """
+    if original is None or not original.datos_extraidos:
+        return None
+    return original.datos_extraidos.get('tipo'), original.datos_extraidos.get('datos', {})
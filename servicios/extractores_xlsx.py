@@ -0,0 +1,441 @@
+"""
+Extracción de libros Excel (.xlsx) de las plantillas OYS-FO
+
+Los certificados e informes propios se llenan en las plantillas OYS-FO-36,
+-37, -43 y -44 antes de imprimirse a PDF. Del libro se leen directamente las
+celdas de la plantilla: no hay texto que buscar con regex y el valor de cada
+campo está siempre en la misma celda.
+
+El XML de la hoja se lee en streaming desde el zip (``iterparse``) y la
+lectura se detiene en la última fila con celdas de interés; de las cadenas
+compartidas sólo se conservan las que usan esas celdas. Una sola pasada lee el
+encabezado (código de formato) y las celdas de todas las plantillas
+registradas, así que la detección de tipo no vuelve a abrir la hoja.
+
+No depende de Django: se usa desde ``extractors.detect_document_type`` en los
+procesos de la carga por lotes y en la extracción aislada.
+"""
+
+from datetime import date, timedelta
+import re
+from typing import Dict, Iterable, Optional, Set, Tuple
+from xml.etree.ElementTree import iterparse
+import zipfile
+
+from servicios.clasificador import PATRON_CODIGO_FORMATO, normalizar_codigo
+from servicios.medicion import anotar, medir
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PAQUETE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+FIRMA_ZIP = b'PK\x03\x04'
+BACKEND_XLSX = 'xlsx'
+
+# Filas del encabezado de las plantillas (título, CÓDIGO OYS-FO-xx, versión)
+FILAS_ENCABEZADO = 5
+
+# Día cero de las fechas de Excel (sistema 1900, con el 29/02/1900 ficticio)
+EPOCA_EXCEL = date(1899, 12, 30)
+
+_REFERENCIA = re.compile(r'([A-Z]+)(\d+)')
+
+
+def es_libro_xlsx(archivo) -> bool:
+    """True si el archivo (ruta o archivo abierto) es un zip, como los .xlsx; los PDF empiezan con %PDF"""
+    if isinstance(archivo, str):
+        with open(archivo, 'rb') as contenido:
+            return contenido.read(len(FIRMA_ZIP)) == FIRMA_ZIP
+    try:
+        posicion = archivo.tell()
+        firma = archivo.read(len(FIRMA_ZIP))
+        archivo.seek(posicion)
+    except (AttributeError, OSError, ValueError):
+        return False
+    return firma == FIRMA_ZIP
+
+
+def _fila(referencia: str) -> int:
+    match = _REFERENCIA.fullmatch(referencia)
+    return int(match.group(2)) if match else 0
+
+
+def _texto(elemento) -> str:
+    """Texto de una cadena (simple o con formato), sin las guías fonéticas"""
+    partes = []
+    for hijo in elemento:
+        if hijo.tag == NS + 't':
+            partes.append(hijo.text or '')
+        elif hijo.tag == NS + 'r':
+            partes.extend(t.text or '' for t in hijo.iter(NS + 't'))
+    return ''.join(partes)
+
+
+class LibroXlsx:
+    """Libro .xlsx abierto: rutas de las hojas y lectura de celdas en streaming"""
+
+    def __init__(self, archivo):
+        try:
+            self.zip = zipfile.ZipFile(archivo)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f'Archivo xlsx inválido: {str(e)}')
+        nombres = set(self.zip.namelist())
+        if 'xl/workbook.xml' not in nombres:
+            self.zip.close()
+            raise ValueError('El archivo no es un libro de Excel (.xlsx)')
+        self._tiene_cadenas = 'xl/sharedStrings.xml' in nombres
+        self.hojas = self._leer_hojas()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def _leer_hojas(self):
+        """[(nombre, ruta en el zip)] en el orden de las pestañas"""
+        with self.zip.open('xl/_rels/workbook.xml.rels') as rels:
+            destinos = {
+                rel.get('Id'): rel.get('Target')
+                for _, rel in iterparse(rels) if rel.tag == NS_PAQUETE + 'Relationship'
+            }
+        hojas = []
+        with self.zip.open('xl/workbook.xml') as libro:
+            for _, elemento in iterparse(libro):
+                if elemento.tag == NS + 'sheet':
+                    destino = destinos.get(elemento.get(NS_REL + 'id'), '')
+                    ruta = destino.lstrip('/') if destino.startswith('/') else f'xl/{destino}'
+                    hojas.append((elemento.get('name'), ruta))
+        if not hojas:
+            raise ValueError('El libro no tiene hojas')
+        return hojas
+
+    def celdas(self, referencias: Iterable[str] = (), filas_completas: int = 0,
+               hoja: int = 0) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Lee en streaming las celdas pedidas de una hoja
+
+        Args:
+            referencias: celdas a leer ('E11', ...)
+            filas_completas: además, todas las celdas de las primeras N filas
+            hoja: índice de la hoja en el orden de las pestañas
+
+        Returns:
+            {referencia: (tipo, valor)} con el tipo de celda de Excel ('s',
+            'str', 'n', 'b', 'e', 'd'...) y las cadenas compartidas ya resueltas
+        """
+        referencias = set(referencias)
+        ultima_fila = max([_fila(r) for r in referencias] + [filas_completas])
+        crudas = {}
+        fila = 0
+        with self.zip.open(self.hojas[hoja][1]) as xml:
+            for evento, elemento in iterparse(xml, events=('start', 'end')):
+                if evento == 'start':
+                    if elemento.tag == NS + 'row':
+                        fila = int(elemento.get('r') or fila + 1)
+                        if fila > ultima_fila:
+                            break
+                elif elemento.tag == NS + 'c':
+                    referencia = elemento.get('r')
+                    if referencia in referencias or (fila <= filas_completas and referencia):
+                        crudas[referencia] = self._valor_crudo(elemento)
+                elif elemento.tag == NS + 'row':
+                    elemento.clear()
+
+        indices = {int(valor) for tipo, valor in crudas.values() if tipo == 's' and valor is not None}
+        cadenas = self._cadenas(indices)
+        return {
+            referencia: ('str', cadenas.get(int(valor))) if tipo == 's' and valor is not None else (tipo, valor)
+            for referencia, (tipo, valor) in crudas.items()
+        }
+
+    def _valor_crudo(self, celda):
+        tipo = celda.get('t', 'n')
+        if tipo == 'inlineStr':
+            contenido = celda.find(NS + 'is')
+            return 'str', _texto(contenido) if contenido is not None else None
+        valor = celda.find(NS + 'v')
+        return tipo, valor.text if valor is not None else None
+
+    def _cadenas(self, indices: Set[int]) -> Dict[int, str]:
+        """Cadenas compartidas pedidas; la lectura termina en el mayor índice"""
+        if not indices or not self._tiene_cadenas:
+            return {}
+        ultimo = max(indices)
+        cadenas = {}
+        indice = 0
+        with self.zip.open('xl/sharedStrings.xml') as xml:
+            for _, elemento in iterparse(xml):
+                if elemento.tag != NS + 'si':
+                    continue
+                if indice in indices:
+                    cadenas[indice] = _texto(elemento)
+                elemento.clear()
+                if indice >= ultimo:
+                    break
+                indice += 1
+        return cadenas
+
+
+def _numero(texto: str) -> str:
+    numero = float(texto)
+    return str(int(numero)) if numero.is_integer() else str(round(numero, 6))
+
+
+def valor_celda(tipo: str, valor: Optional[str], es_fecha: bool = False) -> Optional[str]:
+    """
+    Texto de una celda como lo entregaría el extractor de PDF. Las fechas
+    numéricas de Excel se convierten a DD/MM/AAAA; los errores (#DIV/0!) y
+    las celdas vacías son None.
+    """
+    if valor is None or tipo == 'e':
+        return None
+    if tipo == 'n':
+        try:
+            if es_fecha:
+                dias = int(float(valor))
+                # 0: fórmula que apunta a una celda vacía
+                return (EPOCA_EXCEL + timedelta(days=dias)).strftime('%d/%m/%Y') if dias > 0 else None
+            return _numero(valor)
+        except (ValueError, OverflowError):
+            return None
+    if tipo == 'b':
+        return 'Sí' if valor == '1' else 'No'
+    if tipo == 'd' and es_fecha:
+        # Fecha ISO 8601 (libros guardados con fechas en formato estricto)
+        try:
+            return date.fromisoformat(valor[:10]).strftime('%d/%m/%Y')
+        except ValueError:
+            pass
+    texto = ' '.join(valor.split())
+    return texto or None
+
+
+# Extractores de plantillas xlsx registrados (ver ``registrar_extractor_xlsx``)
+EXTRACTORES_XLSX = []
+
+
+def registrar_extractor_xlsx(cls):
+    """Registra una plantilla para que participe en la detección de libros xlsx"""
+    EXTRACTORES_XLSX.append(cls)
+    return cls
+
+
+class XlsxExtractor:
+    """Base para extractores de plantillas xlsx (misma interfaz que ``PDFExtractor``)"""
+
+    # Tipo de documento que produce el extractor (ver Documento.TIPO_DOCUMENTO_CHOICES)
+    tipo = None
+    # Códigos de las plantillas (OYS-FO-xx) que lee el extractor
+    codigos_formato = []
+    # Celda de cada campo en la primera hoja del libro: {campo: 'E11'}
+    celdas = {}
+    # Campos con fecha (las celdas numéricas son días desde 1899-12-30)
+    campos_fecha = ()
+    # Texto fijo de la plantilla en la misma celda que el valor: {campo: 'Informe #'}
+    prefijos = {}
+    # Valores de la plantilla sin llenar: {campo: 'CAL-'}
+    vacios = {}
+
+    def __init__(self, celdas: Dict[str, Tuple[str, Optional[str]]], pdf_file=None):
+        self.pdf_file = pdf_file
+        self._celdas = celdas
+        # Los libros no tienen capa de texto
+        self.parseado = None
+        self.confianza = None
+
+    def leer_celdas(self) -> Dict:
+        """Valor de cada campo declarado en ``celdas`` (None si la celda está vacía)"""
+        with medir('campos'):
+            datos = {}
+            for campo, referencia in self.celdas.items():
+                tipo, valor = self._celdas.get(referencia, ('n', None))
+                texto = valor_celda(tipo, valor, campo in self.campos_fecha)
+                prefijo = self.prefijos.get(campo)
+                if texto and prefijo and texto.lower().startswith(prefijo.lower()):
+                    texto = texto[len(prefijo):].strip(' :') or None
+                if texto is not None and texto == self.vacios.get(campo):
+                    texto = None
+                datos[campo] = texto
+        return datos
+
+    def extract(self) -> Dict:
+        datos = {'tipo_documento': self.tipo}
+        datos.update(self.leer_celdas())
+        return datos
+
+
+@registrar_extractor_xlsx
+class ReparacionXlsxExtractor(XlsxExtractor):
+    """OYS-FO-36: informe de reparación de válvulas de seguridad (hoja INICIAL)"""
+
+    tipo = 'reparacion'
+    codigos_formato = ['OYS-FO-36']
+    celdas = {
+        'numero_documento': 'R5',
+        'empresa': 'E7',
+        'tag': 'R7',
+        'localizacion': 'E8',
+        'fecha_mantenimiento': 'T8',
+        'marca': 'E11',
+        'modelo': 'E12',
+        'numero_serie': 'E13',
+        'presion_set': 'E14',
+        'norma': 'E15',
+        'tamaño': 'E16',
+        'tipo_conexion': 'E18',
+        'observaciones': 'C105',
+        'tecnico_responsable': 'O111',
+    }
+    campos_fecha = ('fecha_mantenimiento',)
+    prefijos = {'numero_documento': 'Informe #'}
+
+
+@registrar_extractor_xlsx
+class MantenimientoXlsxExtractor(XlsxExtractor):
+    """OYS-FO-37: informe de mantenimiento de válvulas de corte o control (hoja INFORME)"""
+
+    tipo = 'mantenimiento'
+    codigos_formato = ['OYS-FO-37']
+    celdas = {
+        'empresa': 'D5',
+        'numero_documento': 'X5',
+        'localizacion': 'D6',
+        'fecha_mantenimiento': 'X6',
+        'marca': 'E9',
+        'numero_serie': 'E10',
+        'tipo_valvula': 'E11',
+        'rating': 'E12',
+        'tag': 'E13',
+        'tamaño': 'N14',
+        'presion_maxima': 'N15',
+        'unidad_presion': 'N17',
+        'observaciones': 'A42',
+        'tecnico_responsable': 'F51',
+    }
+    campos_fecha = ('fecha_mantenimiento',)
+    # Guía de la plantilla en el recuadro de observaciones
+    vacios = {'observaciones': '*Diametro vastago *Diametro alojamiento prensa estopa *Angulo asiento'}
+
+
+class _CalibracionXlsxExtractor(XlsxExtractor):
+    """Certificados de calibración OYS-FO-43/44 (misma sección 1 a 3)"""
+
+    tipo = 'calibracion'
+    celdas_comunes = {
+        'metodo': 'E6',
+        'fecha_recepcion': 'L6',
+        'laboratorio': 'E8',
+        'fecha_calibracion': 'L8',
+        'numero_documento': 'E10',
+        'fecha_emision': 'L10',
+        'cliente': 'D14',
+        'localizacion': 'D18',
+        'tag': 'K18',
+        'marca': 'D20',
+        'tamaño': 'G20',
+        'conexion': 'L20',
+        'modelo': 'D22',
+        'numero_serie': 'G22',
+        'presion_calibracion': 'L22',
+        'unidad_presion': 'N22',
+    }
+    campos_fecha = ('fecha_recepcion', 'fecha_calibracion', 'fecha_emision')
+    # Los campos calculados con fórmulas quedan en 0 mientras no se cargan los datos de prueba
+    vacios = {'numero_documento': 'CAL-', 'temperatura': '0', 'presion_final': '0'}
+
+    def extract(self) -> Dict:
+        datos = super().extract()
+        # Declaración de conformidad de la plantilla: CUMPLE / NO CUMPLE
+        conformidad = (datos.pop('conformidad', None) or '').upper()
+        if conformidad == 'CUMPLE':
+            datos['resultado'] = 'APROBADO'
+        elif conformidad == 'NO CUMPLE':
+            datos['resultado'] = 'RECHAZADO'
+        else:
+            datos['resultado'] = None
+        return datos
+
+
+@registrar_extractor_xlsx
+class CalibracionBancoXlsxExtractor(_CalibracionXlsxExtractor):
+    """OYS-FO-43: calibración en banco de pruebas (hoja CALIBRACIÓN PSV)"""
+
+    codigos_formato = ['OYS-FO-43']
+    celdas = {
+        **_CalibracionXlsxExtractor.celdas_comunes,
+        'norma': 'H36',
+        'presion_inicial': 'H38',  # Valor antes de ajuste
+        'fluido': 'N38',
+        'temperatura': 'F43',
+        'presion_final': 'D50',    # Presión de escape (simmer)
+        'conformidad': 'K50',
+        'tecnico_responsable': 'C66',
+    }
+
+
+@registrar_extractor_xlsx
+class CalibracionVstXlsxExtractor(_CalibracionXlsxExtractor):
+    """OYS-FO-44: calibración en línea con equipo VST (hoja CERTIFICADO)"""
+
+    codigos_formato = ['OYS-FO-44']
+    celdas = {
+        **_CalibracionXlsxExtractor.celdas_comunes,
+        'norma': 'H41',
+        'presion_inicial': 'H42',
+        'fluido': 'N42',
+        'temperatura': 'F47',
+        'presion_final': 'D54',
+        'conformidad': 'K54',
+        'tecnico_responsable': 'C71',
+    }
+
+
+def _extractor_por_codigo(celdas) -> Optional[type]:
+    """Extractor de la plantilla cuyo código OYS-FO aparece en el encabezado"""
+    por_codigo = {
+        normalizar_codigo(codigo): cls for cls in EXTRACTORES_XLSX for codigo in cls.codigos_formato
+    }
+    for referencia in sorted(celdas, key=_fila):
+        if _fila(referencia) > FILAS_ENCABEZADO:
+            break
+        tipo, valor = celdas[referencia]
+        if tipo != 'str' or not valor:
+            continue
+        match = PATRON_CODIGO_FORMATO.search(valor.lower())
+        if match and normalizar_codigo(match.group(0)) in por_codigo:
+            return por_codigo[normalizar_codigo(match.group(0))]
+    return None
+
+
+def detectar_xlsx(archivo) -> Tuple[str, XlsxExtractor]:
+    """
+    Detecta la plantilla de un libro por el código OYS-FO de su encabezado
+
+    Returns:
+        Tupla (tipo, extractor_instance)
+
+    Raises:
+        ValueError: el archivo no es un libro o no es una plantilla OYS-FO registrada
+    """
+    referencias = {referencia for cls in EXTRACTORES_XLSX for referencia in cls.celdas.values()}
+    with medir('apertura'):
+        libro = LibroXlsx(archivo)
+    try:
+        with libro, medir('texto'):
+            celdas = libro.celdas(referencias, filas_completas=FILAS_ENCABEZADO)
+    finally:
+        if hasattr(archivo, 'seek'):
+            archivo.seek(0)
+
+    with medir('deteccion'):
+        cls = _extractor_por_codigo(celdas)
+    if cls is None:
+        raise ValueError('El libro no corresponde a una plantilla OYS-FO conocida')
+    extractor = cls(celdas, archivo)
+    extractor.confianza = 1.0
+    anotar(backend=BACKEND_XLSX, tipo_documento=cls.tipo)
+    return cls.tipo, extractor
@@ -1,31 +1,246 @@
 """
 Extractores modulares para diferentes tipos de documentos (PDF)
 Soporta: Certificados de Calibración e Informes de Mantenimiento
+
+El PDF se parsea una sola vez (``parsear_pdf``) y el ``DocumentoParseado`` se
+comparte entre todos los extractores registrados.
 """
 
+import logging
+import os
 import re
-import pdfplumber
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from servicios import patrones
+from servicios.backends_texto import (
+    BACKEND_RESPALDO, BACKENDS, backend_para_tipo, fuente_en_disco, leer_configuracion, obtener_backend,
+)
+from servicios.capa_texto import capa_de_parseado, descomprimir_paginas
+from servicios.clasificador import Clasificacion, ClasificadorPalabras
+from servicios.extractores_xlsx import detectar_xlsx
+from servicios.medicion import anotar, medicion_extraccion, medir
+from servicios.preflight import FORMATO_XLSX, DocumentoRechazado, revisar, revisar_capa_texto
+from servicios.tablas_prueba import extraer_pruebas, leer_pruebas
+
+logger = logging.getLogger(__name__)
+
+# Versión de los patrones y reglas de los extractores: subirla al cambiarlos
+# para poder re-extraer los documentos procesados con una versión anterior
+VERSION_EXTRACTORES = 3
+
+
+class DocumentoParseado:
+    """
+    Resultado de parsear un PDF: texto completo, texto por página y metadatos.
+    Se construye una sola vez por archivo y se pasa a cada extractor.
+    """
+
+    def __init__(self, paginas: List[str], metadata: Optional[Dict] = None, backend: Optional[str] = None,
+                 paginas_totales: Optional[int] = None, pruebas: Optional[List[Dict]] = None):
+        self.paginas = list(paginas)
+        self.metadata = metadata or {}
+        self.backend = backend
+        # Filas de las tablas de resultados, leídas con el PDF abierto (None si
+        # no se leyeron, p. ej. al partir de la capa de texto guardada)
+        self.pruebas = pruebas
+        # Páginas del archivo (puede haber más que las leídas en modo por páginas)
+        self.paginas_totales = len(self.paginas) if paginas_totales is None else paginas_totales
+        self.texto = '\n'.join(self.paginas)
+        self._texto_minusculas = None
+        self._indice_anclas = None
+
+    @property
+    def num_paginas(self) -> int:
+        return len(self.paginas)
+    
+    @property
+    def completo(self) -> bool:
+        """False si la lectura se detuvo antes de la última página"""
+        return self.num_paginas >= self.paginas_totales
+
+    @property
+    def texto_minusculas(self) -> str:
+        """Texto en minúsculas, calculado una sola vez para la detección"""
+        if self._texto_minusculas is None:
+            self._texto_minusculas = self.texto.lower()
+        return self._texto_minusculas
+
+    @property
+    def indice_anclas(self) -> patrones.IndiceAnclas:
+        """Posiciones de las anclas de los patrones, compartidas entre extractores"""
+        if self._indice_anclas is None:
+            self._indice_anclas = patrones.IndiceAnclas(self.texto, self.texto_minusculas)
+        return self._indice_anclas
+
+
+def parsear_pdf(pdf_file, backend: Optional[str] = None) -> DocumentoParseado:
+    """
+    Parsea el PDF completo una sola vez y retorna el resultado en memoria
+    
+    Args:
+        pdf_file: Archivo PDF
+        backend: 'pypdfium2' o 'pdfplumber' (por defecto EXTRACCION_BACKEND_TEXTO).
+            Si el backend rápido no puede abrir el archivo se usa pdfplumber.
+    """
+    elegido = obtener_backend(backend)
+    try:
+        with fuente_en_disco(pdf_file) as fuente:
+            try:
+                parseado = _leer_completo(elegido, fuente)
+            except Exception as e:
+                if elegido.nombre == BACKEND_RESPALDO:
+                    raise
+                logger.warning(f'{elegido.nombre} no pudo leer el PDF ({str(e)}), se usa {BACKEND_RESPALDO}')
+                if not isinstance(fuente, str):
+                    fuente.seek(0)
+                parseado = _leer_completo(BACKENDS[BACKEND_RESPALDO], fuente)
+        # CRÍTICO: Resetear posición del archivo después de leerlo
+        # para que Django pueda guardarlo posteriormente
+        pdf_file.seek(0)
+        return parseado
+    except Exception as e:
+        raise ValueError(f"Error extrayendo texto del PDF: {str(e)}")
+
+
+def _leer_completo(backend, fuente) -> DocumentoParseado:
+    """Texto de todas las páginas y, sin cerrar el PDF, sus tablas de resultados"""
+    with backend.abrir(fuente) as lector:
+        paginas = list(lector.paginas())
+        return DocumentoParseado(paginas, lector.metadata, backend=backend.nombre,
+                                 pruebas=leer_pruebas(lector, paginas))
+
+
+# Extractores registrados, en orden de evaluación (ver ``registrar_extractor``)
+EXTRACTORES = []
+_clasificador = None
+
+
+def registrar_extractor(cls):
+    """Registra una clase de extractor para que participe en la detección de tipo"""
+    global _clasificador
+    EXTRACTORES.append(cls)
+    _clasificador = None  # Se reconstruye con las palabras del nuevo extractor
+    return cls
+
+
+def obtener_clasificador() -> ClasificadorPalabras:
+    """Clasificador con las palabras clave de todos los extractores registrados"""
+    global _clasificador
+    if _clasificador is None:
+        _clasificador = ClasificadorPalabras(EXTRACTORES)
+    return _clasificador
+
+
+def patrones_registrados():
+    """Patrones compilados de todos los extractores registrados"""
+    for cls in EXTRACTORES:
+        for compilados in cls._patrones_campos.values():
+            yield from compilados
+        for patron, _ in cls._patrones_multiples.values():
+            yield patron
+        # Listas propias de cada extractor (p. ej. ``patrones_aprobado``)
+        for valor in vars(cls).values():
+            if isinstance(valor, tuple) and valor and all(isinstance(p, patrones.Patron) for p in valor):
+                yield from valor
 
 
 class PDFExtractor:
     """Base para extractores de PDF"""
+
+    # Tipo de documento que produce el extractor (ver Documento.TIPO_DOCUMENTO_CHOICES)
+    tipo = None
+    # Palabras clave de detección (se requieren al menos ``minimo_palabras_clave``)
+    palabras_clave = []
+    minimo_palabras_clave = 2
+    # Palabras que desempatan cuando varios extractores detectan el documento
+    palabras_prioridad = []
+    # Códigos de las plantillas propias (OYS-FO-xx) que identifican el tipo sin dudas
+    codigos_formato = []
+    # Patrones por campo, en orden de preferencia: {campo: (patron, ...)}
+    campos = {}
+    # Campos con varias ocurrencias: {campo: (patron, limite)}, se unen con espacios
+    campos_multiples = {}
+    # Campos que la lectura por páginas debe tener antes de dejar de abrir
+    # páginas (los que identifican el documento y los que alimentan la hoja
+    # de vida de la válvula); los demás se resuelven con las páginas leídas
+    campos_requeridos = ()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Compilar los patrones de la clase una sola vez (al importarla)
+        cls._patrones_campos = {
+            campo: patrones.compilar_todos(lista) for campo, lista in cls.campos.items()
+        }
+        cls._patrones_multiples = {
+            campo: (patrones.compilar(patron), limite)
+            for campo, (patron, limite) in cls.campos_multiples.items()
+        }
     
-    def __init__(self, pdf_file):
+    def __init__(self, pdf_file=None, parseado: Optional[DocumentoParseado] = None):
+        if parseado is None:
+            parseado = parsear_pdf(pdf_file)
         self.pdf_file = pdf_file
-        self.full_text = self._extract_text()
+        self.parseado = parseado
+        self.full_text = parseado.texto
+        # Confianza de la clasificación (la asigna ``detect_document_type``)
+        self.confianza = None
     
     def _extract_text(self) -> str:
-        """Extrae texto de todo el PDF"""
-        try:
-            with pdfplumber.open(self.pdf_file) as pdf:
-                text = '\n'.join(page.extract_text() or '' for page in pdf.pages)
-            # CRÍTICO: Resetear posición del archivo después de leerlo
-            # para que Django pueda guardarlo posteriormente
-            self.pdf_file.seek(0)
-            return text
-        except Exception as e:
-            raise ValueError(f"Error extrayendo texto del PDF: {str(e)}")
+        """Extrae texto de todo el PDF (reutiliza el resultado ya parseado)"""
+        return self.parseado.texto
+    
+    def detect(self) -> bool:
+        """Detecta si el documento corresponde a este extractor"""
+        text_lower = self.parseado.texto_minusculas
+        encontradas = sum(1 for kw in self.palabras_clave if kw in text_lower)
+        return encontradas >= self.minimo_palabras_clave
+    
+    def puntaje(self) -> int:
+        """Puntaje para desempatar cuando varios extractores detectan el documento"""
+        text_lower = self.parseado.texto_minusculas
+        return sum(text_lower.count(kw) for kw in self.palabras_prioridad)
+    
+    def extract(self) -> Dict:
+        raise NotImplementedError
+    
+    @classmethod
+    def patrones_requeridos(cls) -> Dict[str, Tuple[patrones.Patron, ...]]:
+        """
+        Patrones cuya coincidencia deja resuelto cada campo requerido: los que
+        tienen una etiqueta literal. Las capturas generales sin etiqueta (p. ej.
+        cualquier fecha para ``fecha_vencimiento``) coinciden con otros datos
+        de la primera página y no bastan para dejar de leer.
+        """
+        return {
+            campo: tuple(patron for patron in cls._patrones_campos[campo] if patron.anclas)
+            for campo in cls.campos_requeridos
+        }
+    
+    def resolver_campos(self) -> Dict:
+        """Resuelve todos los campos declarados en ``campos`` y ``campos_multiples``"""
+        with medir('campos'):
+            datos = {campo: self._buscar(compilados) for campo, compilados in self._patrones_campos.items()}
+            for campo, (patron, limite) in self._patrones_multiples.items():
+                datos[campo] = ' '.join(self._buscar_todos(patron, limite))
+        return datos
+    
+    def _buscar(self, compilados) -> Optional[str]:
+        patron, match = patrones.buscar(compilados, self.full_text, self.parseado.indice_anclas)
+        if match is None:
+            return None
+        result = patron.valor(match).strip()
+        return result if result else None
+    
+    def _buscar_todos(self, patron: patrones.Patron, limit: int) -> list:
+        inicio = self.parseado.indice_anclas.inicio(patron)
+        if inicio is None:
+            return []
+        matches = patron.regex.findall(self.full_text, inicio)
+        return [m.strip() for m in matches[:limit] if m.strip()]
+    
+    def _existe(self, compilados) -> bool:
+        _, match = patrones.buscar(compilados, self.full_text, self.parseado.indice_anclas)
+        return match is not None
     
     def find_pattern(self, *patterns: str) -> Optional[str]:
         """
@@ -37,241 +252,445 @@ class PDFExtractor:
         Returns:
             Valor encontrado o None
         """
-        for pattern in patterns:
-            match = re.search(pattern, self.full_text, re.IGNORECASE | re.MULTILINE)
-            if match:
-                result = match.group(1).strip()
-                return result if result else None
-        return None
+        return self._buscar(patrones.compilar_todos(patterns))
     
     def find_all_patterns(self, pattern: str, limit: int = 5) -> list:
         """Busca múltiples ocurrencias de un patrón"""
-        matches = re.findall(pattern, self.full_text, re.IGNORECASE | re.MULTILINE)
-        return [m.strip() for m in matches[:limit] if m.strip()]
+        return self._buscar_todos(patrones.compilar(pattern), limit)
 
 
+@registrar_extractor
 class CertificadoCalibracionExtractor(PDFExtractor):
     """Extractor para certificados de calibración"""
     
-    def detect(self) -> bool:
-        """Detecta si el PDF es un certificado de calibración"""
-        keywords = [
-            'calibración', 'calibracion', 'calibration',
-            'certificado', 'certificate',
-            'presión', 'presion', 'pressure',
-            'calibrado', 'calibrated'
-        ]
-        text_lower = self.full_text.lower()
-        return sum(1 for kw in keywords if kw in text_lower) >= 2
+    tipo = 'calibracion'
+    palabras_clave = [
+        'calibración', 'calibracion', 'calibration',
+        'certificado', 'certificate',
+        'presión', 'presion', 'pressure',
+        'calibrado', 'calibrated'
+    ]
+    palabras_prioridad = ['presión', 'calibr', 'presion']
+    codigos_formato = ['OYS-FO-43', 'OYS-FO-44']
+    campos_requeridos = (
+        'numero_documento', 'numero_serie', 'modelo', 'fecha_emision',
+        'fecha_vencimiento', 'presion_inicial', 'presion_final',
+    )
+    campos = {
+        'numero_documento': (
+            r'(?:CERT|Certificado|Calibración|Certificate)[\s:]*([A-Z0-9\-\/]+)',
+            r'(?:N|Nº|No)\.?[\s:]*([A-Z0-9\-\/]+)',
+            r'Número[\s:]*([A-Z0-9\-\/]+)'
+        ),
+        'numero_serie': (
+            r'(?:Número[\s]de[\s]Serie|Serial[\s]Number|S/N|SN)[\s:]*([A-Z0-9\-]+)',
+            r'(?:Serie)[\s:]*([A-Z0-9\-]+)',
+            r'(?:Válvula)[\s:]*([A-Z0-9\-]+)'
+        ),
+        'modelo': (
+            r'(?:Modelo|Model)[\s:]*([A-Z0-9\-\/]+)',
+            r'(?:M\/N|M\.N\.)[\s:]*([A-Z0-9\-\/]+)',
+            r'(?:Type)[\s:]*([A-Z0-9\-\/]+)'
+        ),
+        'marca': (
+            r'(?:Marca|Brand)[\s:]*([A-Za-z0-9\s\-]+)',
+        ),
+        'tamaño': (
+            r'(?:Tamaño|Size)[\s:]*([A-Za-z0-9\s\-]+)',
+        ),
+        'fecha_emision': (
+            r'(?:Fecha|Emisión|Date|Emitted|FECHA)[\s:]*(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',
+            r'(\d{4}[\s\-\/]\d{1,2}[\s\-\/]\d{1,2})',  # AAAA-MM-DD
+            r'(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',  # Captura general de DD-MM-YYYY
+        ),
+        'fecha_vencimiento': (
+            r'(?:Vencimiento|Válido hasta|Expiration|Valid until|VENCIMIENTO)[\s:]*(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',
+            r'(?:Próxima calibración|Next calibration)[\s:]*(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',
+            r'(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',  # Captura general
+        ),
+        'presion_inicial': (
+            r'(?:Presión|Pressure)[\s]inicial[\s:]*([0-9.]+)',
+            r'Initial[\s]Pressure[\s:]*([0-9.]+)',
+            r'P\.?[\s]inicial[\s:]*([0-9.]+)'
+        ),
+        'presion_final': (
+            r'(?:Presión|Pressure)[\s]final[\s:]*([0-9.]+)',
+            r'Final[\s]Pressure[\s:]*([0-9.]+)',
+            r'P\.?[\s]final[\s:]*([0-9.]+)'
+        ),
+        'temperatura': (
+            r'(?:Temperatura|Temperature)[\s:]*([0-9\.\,]+)',
+            r'T\.?[\s:]*([0-9\.\,]+)[\s]*(?:°?C|°?F)?'
+        ),
+        'laboratorio': (
+            r'(?:Laboratorio|Laboratory|Lab)[\s:]*([^\n]+)',
+            r'Acreditado por[\s:]*([^\n]+)'
+        ),
+        'tecnico_responsable': (
+            r'(?:Técnico|Technician|Responsable|Signed by)[\s:]*(?:de|)?[\s]*([A-Za-záéíóúñ\s]+)',
+            r'Firma[\s:]*([A-Za-záéíóúñ\s]+)'
+        ),
+        'unidad_presion': (
+            r'(?:Presión[\s]inicial)[\s:]*[0-9.]+[\s]*(PSI|bar|atm|kPa)',
+            r'Unidad[\s:]*([A-Z]+)'
+        ),
+    }
+    # Patrones para resultado positivo / negativo (sin MULTILINE, como siempre)
+    patrones_aprobado = patrones.compilar_todos([
+        r'(?:Resultado|Result)[\s:]*(?:Sí|Aprobado|Conforme|Passed|OK|PASS)',
+        r'(?:Cumple|Meets|Within[\s]tolerance)',
+        r'Estado[\s:]*Aceptable'
+    ], re.IGNORECASE)
+    patrones_rechazado = patrones.compilar_todos([
+        r'(?:Resultado|Result)[\s:]*(?:No|Rechazado|No[\s]conforme|Failed|FAIL)',
+        r'(?:No[\s]cumple|Does[\s]not[\s]meet|Out[\s]of[\s]tolerance)',
+        r'Estado[\s:]*Inaceptable'
+    ], re.IGNORECASE)
+    
+    @classmethod
+    def patrones_requeridos(cls) -> Dict[str, Tuple[patrones.Patron, ...]]:
+        """Además de los campos, el resultado: aprobado tiene precedencia, así que decide en cuanto aparece"""
+        return dict(super().patrones_requeridos(), resultado=cls.patrones_aprobado)
     
     def extract(self) -> Dict:
         """Extrae datos de certificado de calibración"""
-        return {
-            'tipo_documento': 'calibracion',
-            'numero_documento': self.find_pattern(
-                r'(?:CERT|Certificado|Calibración|Certificate)[\s:]*([A-Z0-9\-\/]+)',
-                r'(?:N|Nº|No)\.?[\s:]*([A-Z0-9\-\/]+)',
-                r'Número[\s:]*([A-Z0-9\-\/]+)'
-            ),
-            'numero_serie': self.find_pattern(
-                r'(?:Número[\s]de[\s]Serie|Serial[\s]Number|S/N|SN)[\s:]*([A-Z0-9\-]+)',
-                r'(?:Serie)[\s:]*([A-Z0-9\-]+)',
-                r'(?:Válvula)[\s:]*([A-Z0-9\-]+)'
-            ),
-            'modelo': self.find_pattern(
-                r'(?:Modelo|Model)[\s:]*([A-Z0-9\-\/]+)',
-                r'(?:M\/N|M\.N\.)[\s:]*([A-Z0-9\-\/]+)',
-                r'(?:Type)[\s:]*([A-Z0-9\-\/]+)'
-            ),
-            'marca': self.find_pattern(
-                r'(?:Marca|Brand)[\s:]*([A-Za-z0-9\s\-]+)'
-            ),
-            'tamaño': self.find_pattern(
-                r'(?:Tamaño|Size)[\s:]*([A-Za-z0-9\s\-]+)'
-            ),
-            'fecha_emision': self.find_pattern(
-                r'(?:Fecha|Emisión|Date|Emitted|FECHA)[\s:]*(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',
-                r'(\d{4})[\s\-\/](\d{1,2})[\s\-\/](\d{1,2})',
-                r'(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',  # Captura general de DD-MM-YYYY
-            ),
-            'fecha_vencimiento': self.find_pattern(
-                r'(?:Vencimiento|Válido hasta|Expiration|Valid until|VENCIMIENTO)[\s:]*(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',
-                r'(?:Próxima calibración|Next calibration)[\s:]*(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',
-                r'(\d{1,2}[\s\-\/\.]\d{1,2}[\s\-\/\.]\d{4})',  # Captura general
-            ),
-            'presion_inicial': self.find_pattern(
-                r'(?:Presión|Pressure)[\s]inicial[\s:]*([0-9.]+)',
-                r'Initial[\s]Pressure[\s:]*([0-9.]+)',
-                r'P\.?[\s]inicial[\s:]*([0-9.]+)'
-            ),
-            'presion_final': self.find_pattern(
-                r'(?:Presión|Pressure)[\s]final[\s:]*([0-9.]+)',
-                r'Final[\s]Pressure[\s:]*([0-9.]+)',
-                r'P\.?[\s]final[\s:]*([0-9.]+)'
-            ),
-            'temperatura': self.find_pattern(
-                r'(?:Temperatura|Temperature)[\s:]*([0-9\.\,]+)',
-                r'T\.?[\s:]*([0-9\.\,]+)[\s]*(?:°?C|°?F)?'
-            ),
-            'resultado': self._extract_resultado(),
-            'laboratorio': self.find_pattern(
-                r'(?:Laboratorio|Laboratory|Lab)[\s:]*([^\n]+)',
-                r'Acreditado por[\s:]*([^\n]+)'
-            ),
-            'tecnico_responsable': self.find_pattern(
-                r'(?:Técnico|Technician|Responsable|Signed by)[\s:]*(?:de|)?[\s]*([A-Za-záéíóúñ\s]+)',
-                r'Firma[\s:]*([A-Za-záéíóúñ\s]+)'
-            ),
-            'unidad_presion': self.find_pattern(
-                r'(?:Presión[\s]inicial)[\s:]*[0-9.]+[\s]*(PSI|bar|atm|kPa)',
-                r'Unidad[\s:]*([A-Z]+)'
-            ),
-        }
+        datos = {'tipo_documento': 'calibracion'}
+        datos.update(self.resolver_campos())
+        datos['resultado'] = self._extract_resultado()
+        # Las tablas de pruebas se leen de la disposición del PDF, al leer su
+        # texto; sin archivo (re-extracción desde la capa de texto) no se pueden leer
+        if self.parseado.pruebas is not None:
+            datos['pruebas'] = list(self.parseado.pruebas)
+        elif self.pdf_file is not None:
+            datos['pruebas'] = extraer_pruebas(self.pdf_file, self.parseado.paginas, self.parseado.backend)
+        return datos
     
     def _extract_resultado(self) -> Optional[str]:
         """Extrae resultado de calibración con lógica mejorada"""
-        # Patrones para resultado positivo
-        si_patterns = [
-            r'(?:Resultado|Result)[\s:]*(?:Sí|Aprobado|Conforme|Passed|OK|PASS)',
-            r'(?:Cumple|Meets|Within[\s]tolerance)',
-            r'Estado[\s:]*Aceptable'
-        ]
-        
-        for pattern in si_patterns:
-            if re.search(pattern, self.full_text, re.IGNORECASE):
-                return 'APROBADO'
-        
-        # Patrones para resultado negativo
-        no_patterns = [
-            r'(?:Resultado|Result)[\s:]*(?:No|Rechazado|No[\s]conforme|Failed|FAIL)',
-            r'(?:No[\s]cumple|Does[\s]not[\s]meet|Out[\s]of[\s]tolerance)',
-            r'Estado[\s:]*Inaceptable'
-        ]
-        
-        for pattern in no_patterns:
-            if re.search(pattern, self.full_text, re.IGNORECASE):
-                return 'RECHAZADO'
-        
+        if self._existe(self.patrones_aprobado):
+            return 'APROBADO'
+        if self._existe(self.patrones_rechazado):
+            return 'RECHAZADO'
         return None
 
 
+@registrar_extractor
 class InformeMantenimientoExtractor(PDFExtractor):
     """Extractor para informes de mantenimiento"""
     
-    def detect(self) -> bool:
-        """Detecta si el PDF es un informe de mantenimiento"""
-        keywords = [
-            'mantenimiento', 'maintenance',
-            'informe', 'report', 'reporte',
-            'servicio técnico', 'technical service',
-            'revisión', 'inspection'
-        ]
-        text_lower = self.full_text.lower()
-        return sum(1 for kw in keywords if kw in text_lower) >= 2
+    tipo = 'mantenimiento'
+    palabras_clave = [
+        'mantenimiento', 'maintenance',
+        'informe', 'report', 'reporte',
+        'servicio técnico', 'technical service',
+        'revisión', 'inspection'
+    ]
+    palabras_prioridad = ['mantenim', 'servicio', 'revisión']
+    codigos_formato = ['OYS-FO-37']
+    campos_requeridos = ('numero_documento', 'numero_serie', 'modelo', 'fecha_mantenimiento', 'proximo_mantenimiento')
+    campos = {
+        'numero_documento': (
+            r'(?:Informe|Reporte|Report)[\s:]*([A-Z0-9\-\/]+)',
+            r'(?:N|Nº|No)\.?[\s:]*([A-Z0-9\-\/]+)',
+            r'Número[\s:]*([A-Z0-9\-\/]+)'
+        ),
+        'numero_serie': (
+            r'(?:Número[\s]de[\s]Serie|Serial[\s]Number|S/N|SN)[\s:]*([A-Z0-9\-]+)',
+            r'(?:Serie)[\s:]*([A-Z0-9\-]+)',
+            r'(?:Válvula)[\s:]*([A-Z0-9\-]+)'
+        ),
+        'modelo': (
+            r'(?:Modelo|Model)[\s:]*([A-Z0-9\-\/]+)',
+            r'(?:M\/N|M\.N\.)[\s:]*([A-Z0-9\-\/]+)',
+            r'(?:Type)[\s:]*([A-Z0-9\-\/]+)'
+        ),
+        'marca': (
+            r'(?:Marca|Brand)[\s:]*([A-Za-z0-9\s\-]+)',
+        ),
+        'tamaño': (
+            r'(?:Tamaño|Size)[\s:]*([A-Za-z0-9\s\-]+)',
+        ),
+        'fecha_mantenimiento': (
+            r'(?:Fecha|Mantenimiento|Date|Service[\s]Date)[\s:]*(\d{1,2}[\s\-\/]\d{1,2}[\s\-\/]\d{4})',
+            r'(\d{4}\-\d{2}\-\d{2})'
+        ),
+        'tipo_mantenimiento': (
+            r'(?:Tipo|Tipo[\s]de[\s]Mantenimiento)[\s:]*([^\n]+)',
+            r'(?:Preventivo|Correctivo|Inspección|Overhaul)',
+            r'(?:Preventive|Corrective|Maintenance[\s]Type)[\s:]*([^\n]+)'
+        ),
+        'descripcion_trabajos': (
+            r'(?:Trabajos|Descripción|Work[\s]Done|Activities)[\s:]*([^\n]+)',
+            r'(?:Se realizaron|Performed)[\s:]*([^\n]+)'
+        ),
+        'estado_valvula': (
+            r'(?:Estado|Condition)[\s:]*([^\n]+)',
+            r'(?:Bueno|Defectuoso|Deteriorado|Good|Bad|Deteriorated)'
+        ),
+        'observaciones': (
+            r'(?:Observaciones|Notas|Notes|Remarks)[\s:]*([^\n]+)',
+            r'(?:Comentarios)[\s:]*([^\n]+)'
+        ),
+        'proximo_mantenimiento': (
+            r'(?:Próximo|Próxima|Next)[\s](?:Mantenimiento|Maintenance)[\s:]*(\d{1,2}[\s\-\/]\d{1,2}[\s\-\/]\d{4})',
+            r'(?:Programado para)[\s:]*(\d{1,2}[\s\-\/]\d{1,2}[\s\-\/]\d{4})'
+        ),
+        'tecnico_responsable': (
+            r'(?:Técnico|Responsable|Technician|Executed by)[\s:]*([A-Za-záéíóúñ\s]+)',
+            r'Realizado por[\s:]*([A-Za-záéíóúñ\s]+)',
+            r'Firma[\s:]*([A-Za-záéíóúñ\s]+)'
+        ),
+        'duracion': (
+            r'(?:Duración|Duration|Tiempo)[\s:]*([0-9.]+[\s](?:horas|hours))',
+            r'(?:Duración)[\s:]*([^\n]+)'
+        ),
+    }
+    campos_multiples = {
+        'materiales_utilizados': (r'(?:Material|Componente)[\s:]*([^\n]+)', 5),
+    }
     
     def extract(self) -> Dict:
         """Extrae datos de informe de mantenimiento"""
-        return {
-            'tipo_documento': 'mantenimiento',
-            'numero_documento': self.find_pattern(
-                r'(?:Informe|Reporte|Report)[\s:]*([A-Z0-9\-\/]+)',
-                r'(?:N|Nº|No)\.?[\s:]*([A-Z0-9\-\/]+)',
-                r'Número[\s:]*([A-Z0-9\-\/]+)'
-            ),
-            'numero_serie': self.find_pattern(
-                r'(?:Número[\s]de[\s]Serie|Serial[\s]Number|S/N|SN)[\s:]*([A-Z0-9\-]+)',
-                r'(?:Serie)[\s:]*([A-Z0-9\-]+)',
-                r'(?:Válvula)[\s:]*([A-Z0-9\-]+)'
-            ),
-            'modelo': self.find_pattern(
-                r'(?:Modelo|Model)[\s:]*([A-Z0-9\-\/]+)',
-                r'(?:M\/N|M\.N\.)[\s:]*([A-Z0-9\-\/]+)',
-                r'(?:Type)[\s:]*([A-Z0-9\-\/]+)'
-            ),
-            'marca': self.find_pattern(
-                r'(?:Marca|Brand)[\s:]*([A-Za-z0-9\s\-]+)'
-            ),
-            'tamaño': self.find_pattern(
-                r'(?:Tamaño|Size)[\s:]*([A-Za-z0-9\s\-]+)'
-            ),
-            'fecha_mantenimiento': self.find_pattern(
-                r'(?:Fecha|Mantenimiento|Date|Service[\s]Date)[\s:]*(\d{1,2}[\s\-\/]\d{1,2}[\s\-\/]\d{4})',
-                r'(\d{4})\-(\d{2})\-(\d{2})'
-            ),
-            'tipo_mantenimiento': self.find_pattern(
-                r'(?:Tipo|Tipo[\s]de[\s]Mantenimiento)[\s:]*([^\n]+)',
-                r'(?:Preventivo|Correctivo|Inspección|Overhaul)',
-                r'(?:Preventive|Corrective|Maintenance[\s]Type)[\s:]*([^\n]+)'
-            ),
-            'descripcion_trabajos': self.find_pattern(
-                r'(?:Trabajos|Descripción|Work[\s]Done|Activities)[\s:]*([^\n]+)',
-                r'(?:Se realizaron|Performed)[\s:]*([^\n]+)'
-            ),
-            'estado_valvula': self.find_pattern(
-                r'(?:Estado|Condition)[\s:]*([^\n]+)',
-                r'(?:Bueno|Defectuoso|Deteriorado|Good|Bad|Deteriorated)'
-            ),
-            'observaciones': self.find_pattern(
-                r'(?:Observaciones|Notas|Notes|Remarks)[\s:]*([^\n]+)',
-                r'(?:Comentarios)[\s:]*([^\n]+)'
-            ),
-            'proximo_mantenimiento': self.find_pattern(
-                r'(?:Próximo|Próxima|Next)[\s](?:Mantenimiento|Maintenance)[\s:]*(\d{1,2}[\s\-\/]\d{1,2}[\s\-\/]\d{4})',
-                r'(?:Programado para)[\s:]*(\d{1,2}[\s\-\/]\d{1,2}[\s\-\/]\d{4})'
-            ),
-            'tecnico_responsable': self.find_pattern(
-                r'(?:Técnico|Responsable|Technician|Executed by)[\s:]*([A-Za-záéíóúñ\s]+)',
-                r'Realizado por[\s:]*([A-Za-záéíóúñ\s]+)',
-                r'Firma[\s:]*([A-Za-záéíóúñ\s]+)'
-            ),
-            'materiales_utilizados': ' '.join(self.find_all_patterns(
-                r'(?:Material|Componente)[\s:]*([^\n]+)',
-                limit=5
-            )),
-            'duracion': self.find_pattern(
-                r'(?:Duración|Duration|Tiempo)[\s:]*([0-9.]+[\s](?:horas|hours))',
-                r'(?:Duración)[\s:]*([^\n]+)'
-            ),
-        }
+        datos = {'tipo_documento': self.tipo}
+        datos.update(self.resolver_campos())
+        return datos
+
+
+@registrar_extractor
+class InformeReparacionExtractor(InformeMantenimientoExtractor):
+    """Extractor para informes de reparación (mismos campos que mantenimiento)"""
+    
+    tipo = 'reparacion'
+    palabras_clave = [
+        'reparación', 'reparacion', 'repair',
+        'desarmado', 'desmontaje',
+    ]
+    palabras_prioridad = ['reparac', 'repair']
+    codigos_formato = ['OYS-FO-36']
 
 
-def detect_document_type(pdf_file) -> Tuple[str, PDFExtractor]:
+def clasificar_documento(parseado: DocumentoParseado) -> Clasificacion:
+    """Tipo de documento y confianza de la clasificación, sin instanciar extractores"""
+    with medir('deteccion'):
+        return obtener_clasificador().clasificar(parseado.texto_minusculas)
+
+
+def _instanciar(clasificacion: Clasificacion, pdf_file, parseado: DocumentoParseado) -> PDFExtractor:
+    indice = clasificacion.indice if clasificacion.indice >= 0 else 0  # Uno por defecto
+    extractor = EXTRACTORES[indice](pdf_file, parseado)
+    extractor.confianza = clasificacion.confianza
+    anotar(paginas=parseado.paginas_totales, backend=parseado.backend, tipo_documento=clasificacion.tipo)
+    return extractor
+
+
+class _LecturaPorPaginas:
+    """
+    Clasificación y campos requeridos de la lectura por páginas, actualizados
+    sólo con el texto de cada página nueva: leer n páginas cuesta O(n) y no
+    O(n²) como reclasificar y re-extraer el texto acumulado en cada página.
+    
+    Las ocurrencias de las palabras clave se suman página a página. Un código
+    de formato decide el tipo en cuanto aparece y desde ahí no se clasifica
+    más. Un campo requerido queda resuelto cuando coincide el patrón de
+    ``patrones_requeridos``; si cambia el tipo, los campos del nuevo se buscan
+    una vez en todo lo leído. Códigos y campos se buscan en la página nueva
+    unida a la anterior, por si la coincidencia cruza el salto de página.
+    """
+    
+    def __init__(self):
+        self.paginas: List[str] = []
+        self.clasificacion: Optional[Clasificacion] = None
+        self._clasificador = obtener_clasificador()
+        self._ocurrencias = [0] * len(self._clasificador.palabras)
+        self._por_codigo: Optional[Clasificacion] = None
+        self._minusculas_anterior = ''
+        self._pendientes: Dict[str, Tuple[patrones.Patron, ...]] = {}
+    
+    def agregar(self, texto: str) -> bool:
+        """Agrega la página siguiente; True si ya no hace falta leer más páginas"""
+        anterior = self.paginas[-1] if self.paginas else ''
+        self.paginas.append(texto)
+        with medir('deteccion'):
+            minusculas = texto.lower()
+            clasificacion = self._clasificar(minusculas)
+            self._minusculas_anterior = minusculas
+        if clasificacion.indice < 0:
+            self.clasificacion = clasificacion
+            return False
+        with medir('campos'):
+            if self.clasificacion is None or clasificacion.indice != self.clasificacion.indice:
+                self._pendientes = EXTRACTORES[clasificacion.indice].patrones_requeridos()
+                ventana = '\n'.join(self.paginas)
+            else:
+                ventana = f'{anterior}\n{texto}'
+            self.clasificacion = clasificacion
+            self._pendientes = {
+                campo: compilados for campo, compilados in self._pendientes.items()
+                if patrones.buscar(compilados, ventana)[1] is None
+            }
+        return not self._pendientes
+    
+    def _clasificar(self, minusculas: str) -> Clasificacion:
+        if self._por_codigo is None:
+            self._por_codigo = self._clasificador.por_codigo(f'{self._minusculas_anterior}\n{minusculas}')
+        if self._por_codigo is not None:
+            return self._por_codigo
+        ocurrencias = self._clasificador.ocurrencias(minusculas)
+        self._ocurrencias = [total + nuevas for total, nuevas in zip(self._ocurrencias, ocurrencias)]
+        return self._clasificador.por_ocurrencias(self._ocurrencias)
+
+
+def detectar_por_paginas(pdf_file, max_paginas: Optional[int] = None,
+                         backend: Optional[str] = None) -> Tuple[str, PDFExtractor]:
     """
-    Detecta el tipo de documento y retorna el extractor apropiado
+    Lee el PDF página a página y deja de abrir páginas en cuanto el tipo
+    detectado tiene el valor definitivo de todos sus ``campos_requeridos``
+    (ver ``PDFExtractor.patrones_requeridos``) o se alcanza ``max_paginas``.
+    El extractor se crea una sola vez, con las páginas leídas.
+    
+    Los campos se resuelven sobre las páginas leídas: si un patrón preferido
+    sólo aparece en una página posterior, gana el alternativo que ya apareció.
+    Si las primeras páginas no tienen texto (PDF escaneado) se rechaza sin
+    leer el resto (ver ``preflight.revisar_capa_texto``).
     
     Args:
-        pdf_file: Archivo PDF
+        backend: backend de texto (por defecto EXTRACCION_BACKEND_TEXTO)
+    
+    Returns:
+        Tupla (tipo, extractor_instance); ``extractor.parseado.completo`` indica
+        si se leyó el archivo entero
+    """
+    backend = obtener_backend(backend)
+    try:
+        with fuente_en_disco(pdf_file) as fuente, backend.abrir(fuente) as lector:
+            lectura = _LecturaPorPaginas()
+            for texto in lector.paginas(max_paginas):
+                terminada = lectura.agregar(texto)
+                revisar_capa_texto(lectura.paginas, lector.num_paginas, _nombre_archivo(pdf_file))
+                if terminada:
+                    break
+            parseado = DocumentoParseado(lectura.paginas, lector.metadata, backend=backend.nombre,
+                                         paginas_totales=lector.num_paginas,
+                                         pruebas=leer_pruebas(lector, lectura.paginas))
+    except DocumentoRechazado:
+        pdf_file.seek(0)
+        raise
+    except Exception as e:
+        if backend.nombre == BACKEND_RESPALDO:
+            raise ValueError(f"Error extrayendo texto del PDF: {str(e)}")
+        # Archivo que el backend rápido no abre: lectura completa con respaldo
+        logger.warning(f'{backend.nombre} no pudo leer el PDF ({str(e)}), se usa {BACKEND_RESPALDO}')
+        pdf_file.seek(0)
+        return detect_document_type(pdf_file, parseado=parsear_pdf(pdf_file, backend=BACKEND_RESPALDO),
+                                    por_paginas=False)
+    pdf_file.seek(0)
+    
+    clasificacion = lectura.clasificacion or clasificar_documento(parseado)
+    extractor = _instanciar(clasificacion, pdf_file, parseado)
+    if not parseado.completo:
+        logger.info(f'Lectura por páginas: {parseado.num_paginas} de {parseado.paginas_totales} páginas')
+    return clasificacion.tipo, extractor
+
+
+def _nombre_archivo(pdf_file) -> Optional[str]:
+    nombre = getattr(pdf_file, 'name', None)
+    return os.path.basename(nombre) if isinstance(nombre, str) else None
+
+
+def tipo_por_nombre(pdf_file, metadata: Dict) -> Optional[str]:
+    """
+    Tipo que sugiere el código de formato del nombre del archivo o del título
+    y asunto del PDF ("OYS-FO-43 Certificado.pdf"), antes de leer el texto.
+    Sólo decide con qué backend se lee: el tipo lo da siempre el texto.
+    """
+    textos = (_nombre_archivo(pdf_file), metadata.get('Title'), metadata.get('Subject'))
+    clasificacion = obtener_clasificador().por_codigo(' '.join(t for t in textos if t).lower())
+    return clasificacion.tipo if clasificacion is not None else None
+
+
+def tipo_por_primera_pagina(pdf_file) -> Optional[str]:
+    """Tipo según el texto de la primera página leída con el backend por defecto (None si no se sabe)"""
+    backend = obtener_backend()
+    try:
+        with fuente_en_disco(pdf_file) as fuente, backend.abrir(fuente) as lector:
+            primera = next(lector.paginas(1), '')
+    except Exception:
+        return None
+    finally:
+        pdf_file.seek(0)
+    clasificacion = clasificar_documento(DocumentoParseado([primera], backend=backend.nombre))
+    return clasificacion.tipo if clasificacion.indice >= 0 else None
+
+
+def detect_document_type(pdf_file, parseado: Optional[DocumentoParseado] = None,
+                         por_paginas: Optional[bool] = None) -> Tuple[str, PDFExtractor]:
+    """
+    Detecta el tipo de documento y retorna el extractor apropiado.
+    El PDF se parsea una sola vez y la clasificación puntúa todos los
+    tipos registrados sobre el mismo texto (ver ``servicios.clasificador``).
+    La confianza queda en ``extractor.confianza``.
+    
+    Sin ``parseado`` la detección va de lo más barato a lo más caro:
+    
+    1. Revisión previa (``servicios.preflight``): firma, cifrado y páginas.
+       Los archivos que no se pueden extraer se rechazan aquí. Un libro .xlsx
+       se detecta por el código OYS-FO de su encabezado y se lee por celdas
+       (ver ``servicios.extractores_xlsx``).
+    2. Si hay backends por tipo (EXTRACCION_BACKEND_POR_TIPO), el backend se
+       elige por el código de formato del nombre o los metadatos del PDF y,
+       sin él, por la clasificación de la primera página; así el PDF se lee
+       completo una sola vez, con el backend de su tipo.
+    3. Lectura del texto (por páginas hasta tener los campos requeridos, o
+       completa) y clasificación. Si el tipo detectado tiene otro backend, el
+       PDF se vuelve a leer con ese backend.
+    
+    Args:
+        pdf_file: Archivo PDF o libro .xlsx
+        parseado: Resultado de ``parsear_pdf`` si ya se tiene (opcional)
+        por_paginas: Leer página a página hasta tener los campos requeridos
+            (por defecto EXTRACCION_POR_PAGINAS, con tope EXTRACCION_MAX_PAGINAS)
         
     Returns:
         Tupla (tipo, extractor_instance)
+    
+    Raises:
+        DocumentoRechazado: el archivo no se puede extraer (ver ``servicios.preflight``)
+        ValueError: error leyendo el archivo
     """
     try:
-        # Intentar ambos extractores
-        calib_extractor = CertificadoCalibracionExtractor(pdf_file)
-        mtto_extractor = InformeMantenimientoExtractor(pdf_file)
-        
-        calib_detected = calib_extractor.detect()
-        mtto_detected = mtto_extractor.detect()
-        
-        # Si ambos detectan, priorizar basado en palabras clave
-        if calib_detected and mtto_detected:
-            # Contar keywords especícficos
-            text = calib_extractor.full_text.lower()
-            calib_score = sum(text.count(kw) for kw in ['presión', 'calibr', 'presion'])
-            mtto_score = sum(text.count(kw) for kw in ['mantenim', 'servicio', 'revisión'])
-            
-            if calib_score > mtto_score:
-                return 'calibracion', calib_extractor
+        if parseado is None:
+            por_tipo = bool(leer_configuracion('EXTRACCION_BACKEND_POR_TIPO', {}))
+            revision = revisar(pdf_file, metadatos=por_tipo)
+            if revision.formato == FORMATO_XLSX:
+                return detectar_xlsx(pdf_file)
+            backend = None
+            if por_tipo:
+                tipo = tipo_por_nombre(pdf_file, revision.metadata) or tipo_por_primera_pagina(pdf_file)
+                backend = backend_para_tipo(tipo) if tipo else None
+            if por_paginas is None:
+                por_paginas = leer_configuracion('EXTRACCION_POR_PAGINAS', False)
+            if por_paginas:
+                tipo, extractor = detectar_por_paginas(
+                    pdf_file, max_paginas=leer_configuracion('EXTRACCION_MAX_PAGINAS', None), backend=backend
+                )
+                backend_tipo = obtener_backend(backend_para_tipo(tipo)).nombre
+                if backend_tipo == extractor.parseado.backend:
+                    return tipo, extractor
+                # Un tipo con backend propio (p. ej. pdfplumber para tablas) se lee completo
+                parseado = parsear_pdf(pdf_file, backend=backend_tipo)
             else:
-                return 'mantenimiento', mtto_extractor
+                parseado = parsear_pdf(pdf_file, backend=backend)
+                revisar_capa_texto(parseado.paginas, parseado.paginas_totales, _nombre_archivo(pdf_file))
+        clasificacion = clasificar_documento(parseado)
+        
+        backend_tipo = obtener_backend(backend_para_tipo(clasificacion.tipo)).nombre
+        if pdf_file is not None and parseado.backend and backend_tipo != parseado.backend:
+            parseado = parsear_pdf(pdf_file, backend=backend_tipo)
         
-        elif calib_detected:
-            return 'calibracion', calib_extractor
-        elif mtto_detected:
-            return 'mantenimiento', mtto_extractor
-        else:
-            return 'desconocido', calib_extractor  # Retorna uno por defecto
+        return clasificacion.tipo, _instanciar(clasificacion, pdf_file, parseado)
     
+    except DocumentoRechazado:
+        raise
     except Exception as e:
         raise ValueError(f"Error detectando tipo de documento: {str(e)}")
 
@@ -296,3 +715,81 @@ def extract_data(pdf_file) -> Dict:
             'tipo_documento': 'error',
             'error': str(e)
         }
+
+
+def extraer_ruta(ruta: str, por_paginas: Optional[bool] = None) -> Dict:
+    """
+    Detecta y extrae un PDF almacenado en disco.
+    Pensado para ejecutarse en procesos hijos (ProcessPoolExecutor): no depende
+    de Django y retorna sólo datos serializables.
+    ``por_paginas=False`` lee el PDF completo (ver ``detect_document_type``).
+    
+    Returns:
+        {'tipo': str|None, 'confianza': float|None, 'datos': dict, 'error': str|None,
+         'version': int, 'capa_texto': dict|None, 'metricas': dict}
+        (ver ``servicios.capa_texto`` y ``servicios.medicion``); si falla, ver
+        ``resultado_fallido``
+    """
+    with medicion_extraccion() as medicion:
+        try:
+            medicion.anotar(tamano_bytes=os.path.getsize(ruta))
+            with open(ruta, 'rb') as pdf_file:
+                doc_type, extractor = detect_document_type(pdf_file, por_paginas=por_paginas)
+                datos = extractor.extract()
+            resultado = resultado_extraccion(doc_type, extractor, datos)
+        except Exception as e:
+            resultado = resultado_fallido(e)
+    resultado['metricas'] = medicion.como_dict()
+    return resultado
+
+
+def resultado_fallido(error: Exception) -> Dict:
+    """
+    Resultado serializable de una extracción fallida. 'rechazo' trae el
+    ``codigo`` de ``DocumentoRechazado`` (None en otros errores) para que el
+    proceso padre sepa que reintentar no sirve.
+    """
+    return {'tipo': None, 'confianza': None, 'datos': {}, 'error': str(error), 'capa_texto': None,
+            'rechazo': getattr(error, 'codigo', None) if isinstance(error, DocumentoRechazado) else None}
+
+
+def resultado_extraccion(doc_type: str, extractor, datos: Dict) -> Dict:
+    """Resultado serializable de una extracción, con la capa de texto leída"""
+    return {
+        'tipo': doc_type,
+        'confianza': extractor.confianza,
+        'datos': datos,
+        'error': None,
+        'version': VERSION_EXTRACTORES,
+        'capa_texto': capa_de_parseado(extractor.parseado, VERSION_EXTRACTORES),
+    }
+
+
+def extraer_texto(paginas: List[str], paginas_totales: Optional[int] = None,
+                  backend: Optional[str] = None) -> Dict:
+    """
+    Vuelve a detectar y extraer un documento desde su texto guardado
+    (``CapaTexto``) sin abrir el PDF: sólo clasificación y patrones.
+    
+    Returns:
+        El mismo diccionario que ``extraer_ruta`` (sin 'capa_texto': el texto no cambia)
+    """
+    with medicion_extraccion() as medicion:
+        try:
+            parseado = DocumentoParseado(paginas, backend=backend, paginas_totales=paginas_totales)
+            doc_type, extractor = detect_document_type(None, parseado=parseado)
+            datos = extractor.extract()
+            resultado = resultado_extraccion(doc_type, extractor, datos)
+            resultado['capa_texto'] = None
+        except Exception as e:
+            resultado = {'tipo': None, 'confianza': None, 'datos': {}, 'error': str(e), 'capa_texto': None}
+    resultado['metricas'] = medicion.como_dict()
+    return resultado
+
+
+def extraer_capa(comprimido: bytes, paginas_totales: Optional[int] = None, backend: Optional[str] = None) -> Dict:
+    """
+    ``extraer_texto`` sobre el texto comprimido de una ``CapaTexto``. Pensado
+    para procesos hijos (ProcessPoolExecutor): no depende de Django.
+    """
+    return extraer_texto(descomprimir_paginas(comprimido), paginas_totales, backend)
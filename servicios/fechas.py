@@ -0,0 +1,165 @@
+"""
+Normalización de fechas extraídas de los documentos
+
+Una sola regex compilada reconoce el formato ("03/06/2025", "03-06-25",
+"2025-06-03", "5 de marzo de 2026", "March 5, 2026") y la fecha se arma
+directamente con sus grupos, sin probar formatos con ``strptime``.
+
+Una fecha numérica con día y mes menores o iguales a 12 es ambigua (DD/MM o
+MM/DD). Cada laboratorio escribe siempre en el mismo orden, así que el orden
+se aprende de sus fechas no ambiguas ("13/06/2025" es DD/MM) y se aplica a
+las ambiguas del mismo laboratorio; sin información se asume DD/MM, el orden
+de los certificados nacionales.
+
+No depende de Django.
+"""
+
+from collections import Counter
+from datetime import date
+import logging
+import re
+import threading
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DIA_MES = 'dmy'
+MES_DIA = 'mdy'
+
+# Laboratorios recordados por proceso (el nombre es texto libre del documento)
+MAXIMO_LABORATORIOS = 1000
+
+MESES = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7,
+    'agosto': 8, 'septiembre': 9, 'setiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12,
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6, 'july': 7,
+    'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+}
+_NOMBRE_MES = '|'.join(sorted(MESES, key=len, reverse=True))
+
+_FECHA = re.compile(
+    r'(?<!\d)(?P<iso_a>\d{4})[\s\-/.](?P<iso_m>\d{1,2})[\s\-/.](?P<iso_d>\d{1,2})(?!\d)'
+    r'|(?<!\d)(?P<p1>\d{1,2})[\s\-/.](?P<p2>\d{1,2})[\s\-/.](?P<a>\d{4}|\d{2})(?!\d)'
+    rf'|(?<!\d)(?P<es_d>\d{{1,2}})\s+de\s+(?P<es_m>{_NOMBRE_MES})\s+(?:de\s+|del\s+)?(?P<es_a>\d{{4}})'
+    rf'|(?P<en_m>{_NOMBRE_MES})\s+(?P<en_d>\d{{1,2}}),?\s+(?P<en_a>\d{{4}})',
+    re.IGNORECASE,
+)
+
+
+def _anio(texto: str) -> int:
+    """Año de 2 o 4 dígitos; con 2 dígitos, 69-99 son del siglo XX (como ``%y``)"""
+    anio = int(texto)
+    if len(texto) == 2:
+        anio += 1900 if anio >= 69 else 2000
+    return anio
+
+
+def _orden_evidente(match) -> Optional[str]:
+    """Orden de una fecha numérica que no es ambigua (None si lo es o no es numérica)"""
+    if match is None or match.group('p1') is None:
+        return None
+    primero, segundo = int(match.group('p1')), int(match.group('p2'))
+    if primero > 12 >= segundo:
+        return DIA_MES
+    if segundo > 12 >= primero:
+        return MES_DIA
+    return None
+
+
+def _clave(laboratorio: Optional[str]) -> str:
+    return ' '.join((laboratorio or '').lower().split())[:100]
+
+
+class NormalizadorFechas:
+    """
+    Convierte textos de fecha a ``date`` recordando el orden día/mes de cada
+    laboratorio. Seguro entre hilos; cada proceso tiene su propia memoria.
+    """
+
+    def __init__(self, orden_por_defecto: str = DIA_MES):
+        self.orden_por_defecto = orden_por_defecto
+        # {laboratorio: Counter({'dmy': n, 'mdy': m})} de fechas no ambiguas vistas
+        self._ordenes = {}
+        self._lock = threading.Lock()
+
+    def orden(self, laboratorio: Optional[str] = None) -> str:
+        """Orden día/mes que usa el laboratorio (el por defecto si no se conoce)"""
+        conteo = self._ordenes.get(_clave(laboratorio))
+        if not conteo:
+            return self.orden_por_defecto
+        return MES_DIA if conteo[MES_DIA] > conteo[DIA_MES] else DIA_MES
+
+    def aprender(self, texto, laboratorio: Optional[str] = None) -> Optional[str]:
+        """Registra el orden de una fecha no ambigua del laboratorio; retorna el orden o None"""
+        if not texto or not isinstance(texto, str):
+            return None
+        orden = _orden_evidente(_FECHA.search(texto))
+        if orden is None:
+            return None
+        clave = _clave(laboratorio)
+        with self._lock:
+            conteo = self._ordenes.get(clave)
+            if conteo is None:
+                if len(self._ordenes) >= MAXIMO_LABORATORIOS:
+                    self._ordenes.pop(next(iter(self._ordenes)))
+                conteo = self._ordenes[clave] = Counter()
+            conteo[orden] += 1
+        return orden
+
+    def normalizar(self, texto, laboratorio: Optional[str] = None) -> Optional[date]:
+        """
+        Fecha del texto
+
+        Args:
+            texto: fecha escrita ("03/06/2025", "2025-06-03", "5 de marzo de 2026")
+            laboratorio: quien emitió el documento, para resolver DD/MM o MM/DD
+
+        Returns:
+            ``date`` o None si el texto no trae una fecha válida
+        """
+        if not texto or not isinstance(texto, str):
+            return None
+        match = _FECHA.search(texto)
+        if match is None:
+            logger.warning(f'No se pudo parsear fecha: "{texto}". Se ignorará.')
+            return None
+        grupos = match.groupdict()
+        try:
+            if grupos['iso_a']:
+                return date(int(grupos['iso_a']), int(grupos['iso_m']), int(grupos['iso_d']))
+            if grupos['p1']:
+                primero, segundo = int(grupos['p1']), int(grupos['p2'])
+                orden = _orden_evidente(match) or self.orden(laboratorio)
+                if orden == DIA_MES:
+                    return date(_anio(grupos['a']), segundo, primero)
+                return date(_anio(grupos['a']), primero, segundo)
+            if grupos['es_a']:
+                return date(int(grupos['es_a']), MESES[grupos['es_m'].lower()], int(grupos['es_d']))
+            return date(int(grupos['en_a']), MESES[grupos['en_m'].lower()], int(grupos['en_d']))
+        except ValueError:
+            logger.warning(f'Fecha inválida: "{texto}". Se ignorará.')
+            return None
+
+    def normalizar_varias(self, textos: Iterable, laboratorio: Optional[str] = None) -> List[Optional[date]]:
+        """
+        Fechas de un mismo documento: primero aprende de las que no son
+        ambiguas (p. ej. el vencimiento "13/06/2026") y después resuelve todas
+        """
+        textos = list(textos)
+        for texto in textos:
+            self.aprender(texto, laboratorio)
+        return [self.normalizar(texto, laboratorio) for texto in textos]
+
+
+# Normalizador del proceso (lo usa el pipeline de procesamiento)
+normalizador = NormalizadorFechas()
+
+
+def normalizar_fecha(texto, laboratorio: Optional[str] = None) -> Optional[date]:
+    """``NormalizadorFechas.normalizar`` con la memoria de laboratorios del proceso"""
+    return normalizador.normalizar(texto, laboratorio)
+
+
+def normalizar_fechas(textos: Iterable, laboratorio: Optional[str] = None) -> List[Optional[date]]:
+    """``NormalizadorFechas.normalizar_varias`` con la memoria de laboratorios del proceso"""
+    return normalizador.normalizar_varias(textos, laboratorio)
@@ -110,7 +110,7 @@ class DocumentoForm(forms.ModelForm):
         widgets = {
             'archivo_pdf': forms.FileInput(attrs={
                 'class': 'form-control',
-                'accept': '.pdf',
+                'accept': '.pdf,.xlsx',
                 'required': True
             }),
             'servicio': forms.Select(attrs={
@@ -127,7 +127,7 @@ class DocumentoForm(forms.ModelForm):
         }
 
     def clean_archivo_pdf(self):
-        """Valida que el archivo sea PDF y no exceda 10MB"""
+        """Valida que el archivo sea PDF o XLSX (plantillas OYS-FO) y no exceda 10MB"""
         archivo = self.cleaned_data.get('archivo_pdf')
         if archivo:
             # Verificar tamaño
@@ -135,8 +135,8 @@ class DocumentoForm(forms.ModelForm):
                 raise forms.ValidationError('El archivo no puede exceder 10MB')
             
             # Verificar extensión
-            if not archivo.name.lower().endswith('.pdf'):
-                raise forms.ValidationError('Solo se aceptan archivos PDF')
+            if not archivo.name.lower().endswith(('.pdf', '.xlsx')):
+                raise forms.ValidationError('Solo se aceptan archivos PDF o XLSX')
         
         return archivo
 
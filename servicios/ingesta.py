@@ -0,0 +1,421 @@
+"""
+Ingesta por lotes de documentos (varios PDF, libros .xlsx de las plantillas
+OYS-FO o archivos ZIP con ellos)
+
+Los archivos se desempaquetan en streaming a un directorio temporal, la
+extracción se reparte en un ``ProcessPoolExecutor`` (un proceso por núcleo)
+y los documentos se guardan en transacciones por lotes. Con
+EXTRACCION_AISLADA cada archivo se extrae en su propio proceso hijo con tiempo
+y memoria máximos (``servicios.aislamiento``), lanzado desde un pool de hilos,
+para que un PDF que no termina no bloquee el lote. Las válvulas de los
+números de serie de cada lote se traen en una consulta y las creadas se
+recuerdan durante la carga (``valvulas.identidad.MapaIdentidad``). Lo usan la
+vista ``upload_lote`` y el comando ``manage.py ingest_folder``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from servicios.aislamiento import ExtraccionExcedida, TiempoExtraccionAgotado, aislamiento_activo, extraer_aislado
+from servicios.cola import encolar_documento
+from servicios.deduplicacion import calcular_sha256, payload_en_cache
+from servicios.extractors import extraer_ruta
+from servicios.medicion import medicion_extraccion, medir
+from servicios.models import Documento, TrabajoExtraccion
+from servicios.preflight import DocumentoRechazado, revisar
+from servicios.procesamiento import (
+    aplicar_datos_extraidos, guardar_capa_texto, guardar_metricas, guardar_pruebas,
+    numero_serie_extraido, resolver_valvula,
+)
+from valvulas.identidad import MapaIdentidad
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE_COPIA = 1024 * 1024  # 1MB
+
+
+# Documentos que se extraen: PDF y libros de las plantillas OYS-FO
+EXTENSIONES_DOCUMENTO = ('.pdf', '.xlsx')
+
+
+def _es_documento(nombre):
+    return nombre.lower().endswith(EXTENSIONES_DOCUMENTO)
+
+
+def _es_zip(nombre):
+    return nombre.lower().endswith('.zip')
+
+
+def _copiar_a_temporal(origen, nombre, directorio):
+    """Copia un flujo a un archivo temporal por bloques (sin cargarlo entero en memoria)"""
+    fd, ruta = tempfile.mkstemp(suffix=os.path.splitext(nombre)[1].lower(), dir=directorio)
+    with os.fdopen(fd, 'wb') as destino:
+        shutil.copyfileobj(origen, destino, TAMANO_BLOQUE_COPIA)
+    return nombre, ruta
+
+
+class ZipExcedido(ValueError):
+    """El ZIP supera los límites de la carga por lotes (INGESTA_ZIP_*)"""
+
+
+def _revisar_zip(nombre_zip, miembros, total_entradas):
+    """
+    Límites del ZIP según su directorio central, antes de descomprimir nada.
+    ``zipfile`` no entrega más bytes de un miembro que su ``file_size``
+    declarado (si el contenido real es mayor falla el CRC), así que basta con
+    revisar los tamaños declarados.
+    """
+    maximo_archivos = getattr(settings, 'INGESTA_ZIP_MAX_ARCHIVOS', 1000)
+    maximo_archivo = getattr(settings, 'INGESTA_ZIP_MAX_ARCHIVO_MB', 100) * 1024 * 1024
+    maximo_total = getattr(settings, 'INGESTA_ZIP_MAX_TOTAL_MB', 2048) * 1024 * 1024
+    if total_entradas > maximo_archivos:
+        raise ZipExcedido(f'El ZIP {nombre_zip} tiene {total_entradas} archivos (máximo {maximo_archivos})')
+    for info in miembros:
+        if info.file_size > maximo_archivo:
+            raise ZipExcedido(
+                f'El archivo {os.path.basename(info.filename)} del ZIP {nombre_zip} ocupa '
+                f'{info.file_size // (1024 * 1024)} MB descomprimido (máximo {maximo_archivo // (1024 * 1024)} MB)'
+            )
+    total = sum(info.file_size for info in miembros)
+    if total > maximo_total:
+        raise ZipExcedido(
+            f'El ZIP {nombre_zip} ocupa {total // (1024 * 1024)} MB descomprimido '
+            f'(máximo {maximo_total // (1024 * 1024)} MB)'
+        )
+
+
+def _desempaquetar_zip(archivo_zip, nombre_zip, directorio):
+    """
+    Extrae en streaming los documentos (PDF o xlsx) de un ZIP. ``zipfile`` sólo lee el directorio
+    central y descomprime cada miembro por bloques al copiarlo.
+
+    Raises:
+        ZipExcedido: el ZIP supera los límites (no se copia ningún miembro)
+        zipfile.BadZipFile: el archivo no es un ZIP válido
+    """
+    with zipfile.ZipFile(archivo_zip) as zf:
+        entradas = [info for info in zf.infolist() if not info.is_dir()]
+        miembros = []
+        for info in entradas:
+            # Sólo el nombre base: evita rutas relativas maliciosas (zip-slip)
+            nombre = os.path.basename(info.filename)
+            if _es_documento(nombre) and not nombre.startswith('._'):
+                miembros.append((nombre, info))
+        _revisar_zip(nombre_zip, [info for _, info in miembros], len(entradas))
+        for nombre, info in miembros:
+            with zf.open(info) as miembro:
+                yield _copiar_a_temporal(miembro, nombre, directorio) + (None,)
+
+
+def expandir_fuentes(fuentes, directorio):
+    """
+    Normaliza las fuentes a documentos (PDF o xlsx) en disco.
+
+    Args:
+        fuentes: archivos subidos (UploadedFile) o rutas en disco (PDF, xlsx o ZIP)
+        directorio: directorio temporal donde copiar los documentos
+
+    Yields:
+        (nombre_original, ruta_en_disco, None), o (nombre, None, error) si la
+        fuente no es válida o es un ZIP que supera los límites
+    """
+    for fuente in fuentes:
+        es_ruta = isinstance(fuente, (str, os.PathLike))
+        nombre = os.path.basename(os.fspath(fuente) if es_ruta else fuente.name)
+        if _es_zip(nombre):
+            try:
+                yield from _desempaquetar_zip(os.fspath(fuente) if es_ruta else fuente, nombre, directorio)
+            except ZipExcedido as e:
+                logger.warning(f'ZIP rechazado en la carga por lotes: {str(e)}')
+                yield nombre, None, str(e)
+            except zipfile.BadZipFile as e:
+                yield nombre, None, f'El archivo {nombre} no es un ZIP válido: {str(e)}'
+        elif not _es_documento(nombre):
+            yield nombre, None, 'Formato no soportado (sólo PDF, XLSX o ZIP)'
+        elif es_ruta:
+            yield nombre, os.fspath(fuente), None
+        elif hasattr(fuente, 'temporary_file_path'):
+            yield nombre, fuente.temporary_file_path(), None
+        else:
+            fuente.seek(0)
+            yield _copiar_a_temporal(fuente, nombre, directorio) + (None,)
+
+
+def _extraer_con_limites(ruta):
+    """``extraer_aislado`` con el mismo formato de resultado que ``extraer_ruta``"""
+    with medicion_extraccion() as medicion:
+        try:
+            with medir('aislamiento'):
+                resultado = extraer_aislado(ruta)
+                medicion.agregar(resultado.get('metricas'))
+        except ExtraccionExcedida as e:
+            resultado = {
+                'tipo': None, 'confianza': None, 'datos': {}, 'error': str(e),
+                'limite_excedido': True, 'timeout': isinstance(e, TiempoExtraccionAgotado),
+            }
+    resultado['metricas'] = medicion.como_dict()
+    return resultado
+
+
+def _resumen(nombre, **campos):
+    resumen = {
+        'archivo': nombre,
+        'documento_id': None,
+        'tipo': None,
+        'numero_documento': None,
+        'valvula': None,
+        'valvula_creada': False,
+        'duplicado': False,
+        'en_cola': False,
+        'error': None,
+        'rechazo': None,
+    }
+    resumen.update(campos)
+    return resumen
+
+
+def _guardar_documento(nombre, ruta, hash_contenido, resultado, usuario, servicio, archivo_existente=None,
+                       mapa=None):
+    """Crea el Documento de un archivo ya extraído y enlaza su válvula"""
+    with medicion_extraccion('lote', al_terminar=guardar_metricas) as medicion:
+        # Los repetidos dentro del lote comparten el resultado: la extracción
+        # se cuenta sólo en el primero
+        medicion.agregar(resultado.pop('metricas', None))
+        documento, resumen = _crear_documento(
+            nombre, ruta, hash_contenido, resultado, usuario, servicio, archivo_existente, mapa
+        )
+        medicion.documento = documento
+    return documento, resumen
+
+
+def _crear_documento(nombre, ruta, hash_contenido, resultado, usuario, servicio, archivo_existente, mapa):
+    resumen = _resumen(nombre, tipo=resultado['tipo'], error=resultado['error'], rechazo=resultado.get('rechazo'))
+    documento = Documento(
+        servicio=servicio,
+        usuario_comercial=usuario,
+        tipo_documento='otro',
+        nombre_original=nombre,
+        hash_contenido=hash_contenido,
+    )
+
+    if resultado['error']:
+        documento.estado_procesamiento = 'error'
+        documento.extraido_exitosamente = False
+        documento.error_extraccion = resultado['error']
+        documento.fecha_extraccion_datos = timezone.now()
+    else:
+        aplicar_datos_extraidos(documento, resultado['tipo'], resultado['datos'], resultado.get('version'))
+        documento.datos_extraidos = {
+            'tipo': resultado['tipo'],
+            'confianza': resultado.get('confianza'),
+            'datos': resultado['datos'],
+        }
+        documento.estado_procesamiento = 'completado'
+        # La válvula se resuelve antes de guardar: el Documento se escribe
+        # una sola vez, ya con su válvula
+        valvula, creada = resolver_valvula(documento, resultado['datos'], mapa=mapa)
+        if valvula is not None:
+            resumen['valvula'] = valvula.numero_serie
+            resumen['valvula_creada'] = creada
+
+    with medir('guardado'):
+        if archivo_existente:
+            documento.archivo_pdf.name = archivo_existente
+        else:
+            with open(ruta, 'rb') as contenido:
+                documento.archivo_pdf.save(nombre, File(contenido), save=False)
+        documento.save()
+        documento.actualizar_fechas_hoja_vida()
+    guardar_capa_texto(documento, resultado.get('capa_texto'))
+    if resultado.get('limite_excedido'):
+        # Queda en dead-letter para poder reencolarlo desde el admin
+        ahora = timezone.now()
+        TrabajoExtraccion.objects.create(
+            documento=documento,
+            estado='fallido',
+            intentos=1,
+            ultimo_error=resultado['error'],
+            timeouts=1 if resultado.get('timeout') else 0,
+            ultimo_timeout=ahora if resultado.get('timeout') else None,
+        )
+    resumen['documento_id'] = documento.id
+    resumen['numero_documento'] = documento.numero_documento
+    resumen['duplicado'] = bool(archivo_existente)
+
+    if not resultado['error']:
+        guardar_pruebas(documento, resultado['datos'])
+    return documento, resumen
+
+
+def _documentos_existentes(hashes):
+    """
+    Archivos almacenados y extracciones en caché para los hashes dados,
+    en una sola consulta
+
+    Returns:
+        (archivos: {hash: nombre_archivo}, payloads: {hash: resultado})
+    """
+    archivos, payloads = {}, {}
+    existentes = Documento.objects.filter(hash_contenido__in=hashes).exclude(archivo_pdf='').order_by('id')
+    for documento in existentes.only('hash_contenido', 'archivo_pdf', 'datos_extraidos', 'version_extractor'):
+        archivos.setdefault(documento.hash_contenido, documento.archivo_pdf.name)
+        cache = payload_en_cache(documento)
+        if cache is not None:
+            tipo, datos = cache
+            payloads.setdefault(documento.hash_contenido, {
+                'tipo': tipo,
+                'confianza': documento.datos_extraidos.get('confianza'),
+                'datos': datos,
+                'error': None,
+                'version': documento.version_extractor,
+            })
+    return archivos, payloads
+
+
+def ingestar_lote(fuentes, usuario=None, servicio=None, tamano_lote=50, max_workers=None):
+    """
+    Ingesta varios PDF o xlsx (o ZIP con ellos) con extracción en paralelo.
+    Los archivos cuyo SHA-256 ya existe reutilizan el archivo almacenado y la
+    extracción en caché; los repetidos dentro del lote se extraen una sola vez.
+
+    Args:
+        fuentes: archivos subidos o rutas en disco
+        usuario: comercial que sube los documentos
+        servicio: servicio al que se asocian (opcional)
+        tamano_lote: documentos guardados por transacción
+        max_workers: extracciones simultáneas (por defecto, núcleos)
+
+    Returns:
+        Lista con un resumen por archivo: tipo detectado, válvula enlazada o
+        creada y error (si lo hubo)
+    """
+    resumenes = []
+    max_workers = max_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix='ingesta_') as directorio:
+        validos = []
+        for nombre, ruta, error in expandir_fuentes(fuentes, directorio):
+            if ruta:
+                validos.append((nombre, ruta, calcular_sha256(ruta)))
+            else:
+                resumenes.append(_resumen(nombre, error=error))
+        if not validos:
+            return resumenes
+
+        archivos, payloads = _documentos_existentes({hash_contenido for _, _, hash_contenido in validos})
+        mapa = MapaIdentidad()
+
+        # Sólo se extrae la primera aparición de cada contenido sin caché
+        por_extraer = {}
+        for _, ruta, hash_contenido in validos:
+            if hash_contenido not in payloads:
+                por_extraer.setdefault(hash_contenido, ruta)
+
+        if aislamiento_activo():
+            pool, extraer = ThreadPoolExecutor, _extraer_con_limites
+        else:
+            pool, extraer = ProcessPoolExecutor, extraer_ruta
+        with pool(max_workers=max(1, min(max_workers, len(por_extraer)))) as executor:
+            # map() envía todos los archivos al pool de una vez; los resultados
+            # se consumen en orden mientras los lotes anteriores se guardan
+            extraidos = zip(por_extraer, executor.map(extraer, por_extraer.values()))
+            for inicio in range(0, len(validos), tamano_lote):
+                bloque = validos[inicio:inicio + tamano_lote]
+                for nombre, ruta, hash_contenido in bloque:
+                    if hash_contenido not in payloads:
+                        # Los resultados llegan en el orden de primera aparición
+                        hash_extraido, resultado = next(extraidos)
+                        payloads[hash_extraido] = resultado
+                # Las válvulas del lote en una consulta
+                mapa.precargar(numero_serie_extraido(payloads[hash_contenido]['datos']) for _, _, hash_contenido in bloque)
+                # Una transacción por lote; cada documento en su propio savepoint
+                with transaction.atomic():
+                    for nombre, ruta, hash_contenido in bloque:
+                        resultado = payloads[hash_contenido]
+                        try:
+                            with transaction.atomic():
+                                documento, resumen = _guardar_documento(
+                                    nombre, ruta, hash_contenido, resultado, usuario, servicio,
+                                    archivo_existente=archivos.get(hash_contenido), mapa=mapa,
+                                )
+                            archivos.setdefault(hash_contenido, documento.archivo_pdf.name)
+                            resumenes.append(resumen)
+                        except Exception as e:
+                            logger.error(f'Error guardando "{nombre}" en la carga por lotes: {str(e)}', exc_info=True)
+                            resumenes.append(_resumen(nombre, tipo=resultado['tipo'], error=str(e)))
+                            # El savepoint pudo revertir válvulas ya registradas en el mapa
+                            mapa.limpiar()
+                logger.info(f'Carga por lotes: {inicio + len(bloque)}/{len(validos)} archivos procesados')
+
+    return resumenes
+
+
+def encolar_lote(fuentes, usuario=None, servicio=None):
+    """
+    Guarda los documentos de varios PDF o xlsx (o ZIP con ellos) y deja cada
+    uno en la cola de extracción: la petición sólo copia archivos y un worker
+    extrae (``manage.py procesar_extracciones``). La revisión previa descarta
+    sin guardarlos los archivos que no se pueden extraer; los archivos cuyo
+    SHA-256 ya existe reutilizan el archivo almacenado (y el worker, la
+    extracción en caché).
+
+    Args:
+        fuentes: archivos subidos o rutas en disco
+        usuario: comercial que sube los documentos
+        servicio: servicio al que se asocian (opcional)
+
+    Returns:
+        Lista con un resumen por archivo: id del documento encolado (para
+        consultar su estado) o error
+    """
+    resumenes = []
+    with tempfile.TemporaryDirectory(prefix='ingesta_') as directorio:
+        validos = []
+        for nombre, ruta, error in expandir_fuentes(fuentes, directorio):
+            if not ruta:
+                resumenes.append(_resumen(nombre, error=error))
+                continue
+            try:
+                revisar(ruta, nombre)
+            except DocumentoRechazado as e:
+                resumenes.append(_resumen(nombre, error=str(e), rechazo=e.codigo))
+                continue
+            validos.append((nombre, ruta, calcular_sha256(ruta)))
+
+        archivos = dict(
+            Documento.objects.filter(hash_contenido__in={hash_contenido for _, _, hash_contenido in validos})
+            .exclude(archivo_pdf='').order_by('-id').values_list('hash_contenido', 'archivo_pdf')
+        )
+        with transaction.atomic():
+            for nombre, ruta, hash_contenido in validos:
+                try:
+                    with transaction.atomic():
+                        documento = Documento(
+                            servicio=servicio,
+                            usuario_comercial=usuario,
+                            tipo_documento='otro',
+                            nombre_original=nombre,
+                            hash_contenido=hash_contenido,
+                        )
+                        duplicado = hash_contenido in archivos
+                        if duplicado:
+                            documento.archivo_pdf.name = archivos[hash_contenido]
+                        else:
+                            with open(ruta, 'rb') as contenido:
+                                documento.archivo_pdf.save(nombre, File(contenido), save=False)
+                        documento.save()
+                        encolar_documento(documento)
+                    archivos.setdefault(hash_contenido, documento.archivo_pdf.name)
+                    resumenes.append(_resumen(nombre, documento_id=documento.id, duplicado=duplicado, en_cola=True))
+                except Exception as e:
+                    logger.error(f'Error guardando "{nombre}" en la carga por lotes: {str(e)}', exc_info=True)
+                    resumenes.append(_resumen(nombre, error=str(e)))
+    return resumenes
@@ -0,0 +1,169 @@
+"""
+Compara los backends de texto de PDF (velocidad y coincidencia de campos)
+
+Uso:
+    python manage.py benchmark_backends                  # PDFs ya cargados (Documento)
+    python manage.py benchmark_backends /ruta/corpus --repeticiones 3
+    python manage.py benchmark_backends --limite 500 --json
+
+La coincidencia se mide campo a campo contra pdfplumber (referencia histórica):
+mismo tipo detectado y mismo valor extraído.
+"""
+from collections import defaultdict
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from servicios.backends_texto import BACKEND_RESPALDO, BACKENDS
+from servicios.extractors import DocumentoParseado, detect_document_type
+from servicios.models import Documento
+
+
+class Command(BaseCommand):
+    help = 'Compara throughput y coincidencia de campos de los backends de texto de PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('carpeta', nargs='?', help='Carpeta con PDFs (default: archivos de Documento)')
+        parser.add_argument('--limite', type=int, default=200, help='Máximo de PDFs a medir (default: 200)')
+        parser.add_argument('--repeticiones', type=int, default=1, help='Lecturas por archivo y backend')
+        parser.add_argument('--detalle', action='store_true', help='Muestra cada campo que no coincide')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado en formato JSON')
+
+    def _rutas(self, carpeta, limite):
+        if carpeta:
+            if not os.path.isdir(carpeta):
+                raise CommandError(f'La carpeta "{carpeta}" no existe')
+            rutas = []
+            for raiz, subcarpetas, archivos in os.walk(carpeta):
+                rutas.extend(os.path.join(raiz, n) for n in sorted(archivos) if n.lower().endswith('.pdf'))
+            return rutas[:limite]
+
+        rutas = []
+        documentos = Documento.objects.exclude(archivo_pdf='').order_by('-id')
+        for nombre in documentos.values_list('archivo_pdf', flat=True).distinct()[:limite]:
+            try:
+                ruta = Documento._meta.get_field('archivo_pdf').storage.path(nombre)
+            except NotImplementedError:
+                raise CommandError('El almacenamiento de archivos no es local: indique una carpeta')
+            if os.path.exists(ruta):
+                rutas.append(ruta)
+        return rutas
+
+    def _medir(self, backend, ruta, repeticiones):
+        """Lee el PDF con el backend y extrae los campos; retorna tiempos y datos"""
+        lectura = float('inf')
+        for _ in range(repeticiones):
+            with open(ruta, 'rb') as pdf_file:
+                inicio = time.perf_counter()
+                paginas, metadata = backend.extraer(pdf_file)
+                lectura = min(lectura, time.perf_counter() - inicio)
+
+        parseado = DocumentoParseado(paginas, metadata, backend=backend.nombre)
+        inicio = time.perf_counter()
+        tipo, extractor = detect_document_type(None, parseado)
+        datos = extractor.extract()
+        campos = time.perf_counter() - inicio
+        return {
+            'lectura': lectura,
+            'campos': campos,
+            'paginas': parseado.num_paginas,
+            'caracteres': len(parseado.texto),
+            'tipo': tipo,
+            'datos': datos,
+        }
+
+    def handle(self, *args, **options):
+        rutas = self._rutas(options['carpeta'], options['limite'])
+        if not rutas:
+            self.stdout.write(self.style.WARNING('No se encontraron PDFs para medir'))
+            return
+
+        backends = [b for b in BACKENDS.values() if b.disponible()]
+        totales = {b.nombre: defaultdict(float) for b in backends}
+        coincidencias = {b.nombre: defaultdict(lambda: [0, 0]) for b in backends}
+        diferencias = []
+
+        for ruta in rutas:
+            resultados = {}
+            for backend in backends:
+                try:
+                    resultados[backend.nombre] = self._medir(backend, ruta, max(1, options['repeticiones']))
+                except Exception as e:
+                    totales[backend.nombre]['errores'] += 1
+                    diferencias.append((os.path.basename(ruta), backend.nombre, 'error', str(e), None))
+
+            referencia = resultados.get(BACKEND_RESPALDO)
+            for nombre, resultado in resultados.items():
+                total = totales[nombre]
+                total['documentos'] += 1
+                total['paginas'] += resultado['paginas']
+                total['caracteres'] += resultado['caracteres']
+                total['lectura'] += resultado['lectura']
+                total['campos'] += resultado['campos']
+
+                if referencia is None or nombre == BACKEND_RESPALDO:
+                    continue
+                conteo = coincidencias[nombre]
+                conteo['tipo'][0] += resultado['tipo'] == referencia['tipo']
+                conteo['tipo'][1] += 1
+                if resultado['tipo'] != referencia['tipo']:
+                    diferencias.append((os.path.basename(ruta), nombre, 'tipo', resultado['tipo'], referencia['tipo']))
+                    continue
+                for campo, valor_referencia in referencia['datos'].items():
+                    valor = resultado['datos'].get(campo)
+                    conteo[campo][0] += valor == valor_referencia
+                    conteo[campo][1] += 1
+                    if valor != valor_referencia:
+                        diferencias.append((os.path.basename(ruta), nombre, campo, valor, valor_referencia))
+
+        reporte = {
+            'archivos': len(rutas),
+            'backends': {
+                nombre: {
+                    'documentos': int(total['documentos']),
+                    'errores': int(total['errores']),
+                    'paginas': int(total['paginas']),
+                    'segundos_lectura': round(total['lectura'], 4),
+                    'segundos_campos': round(total['campos'], 4),
+                    'docs_por_segundo': round(total['documentos'] / total['lectura'], 2) if total['lectura'] else None,
+                    'paginas_por_segundo': round(total['paginas'] / total['lectura'], 2) if total['lectura'] else None,
+                    'coincidencia': {
+                        campo: round(iguales / comparados, 4)
+                        for campo, (iguales, comparados) in coincidencias[nombre].items() if comparados
+                    },
+                }
+                for nombre, total in totales.items()
+            },
+        }
+
+        if options['json']:
+            if options['detalle']:
+                reporte['diferencias'] = [
+                    {'archivo': a, 'backend': b, 'campo': c, 'valor': v, 'referencia': r}
+                    for a, b, c, v, r in diferencias
+                ]
+            self.stdout.write(json.dumps(reporte, ensure_ascii=False, indent=2, default=str))
+            return
+
+        self.stdout.write(f'{len(rutas)} PDFs medidos\n')
+        self.stdout.write(f'{"Backend":<12} {"Docs":>6} {"Páginas":>8} {"Lectura (s)":>12} {"Docs/s":>8} {"Págs/s":>8} {"Errores":>8}')
+        for nombre, datos in reporte['backends'].items():
+            self.stdout.write(
+                f'{nombre:<12} {datos["documentos"]:>6} {datos["paginas"]:>8} {datos["segundos_lectura"]:>12.3f} '
+                f'{datos["docs_por_segundo"] or 0:>8.1f} {datos["paginas_por_segundo"] or 0:>8.1f} {datos["errores"]:>8}'
+            )
+
+        for nombre, datos in reporte['backends'].items():
+            if not datos['coincidencia']:
+                continue
+            self.stdout.write(f'\nCoincidencia de {nombre} con {BACKEND_RESPALDO}:')
+            for campo, proporcion in sorted(datos['coincidencia'].items(), key=lambda item: item[1]):
+                estilo = self.style.SUCCESS if proporcion == 1 else self.style.WARNING
+                self.stdout.write(estilo(f'  {campo:<24} {proporcion * 100:6.1f}%'))
+
+        if options['detalle'] and diferencias:
+            self.stdout.write('\nDiferencias:')
+            for archivo, backend, campo, valor, referencia in diferencias:
+                self.stdout.write(f'  {archivo} [{backend}] {campo}: {valor!r} (referencia: {referencia!r})')
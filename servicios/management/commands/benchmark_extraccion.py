@@ -0,0 +1,282 @@
+"""
+Benchmark de detección y extracción sobre un corpus sintético
+
+Uso:
+    python manage.py benchmark_extraccion                           # 60 documentos, semilla 42
+    python manage.py benchmark_extraccion --documentos 200 --repeticiones 5
+    python manage.py benchmark_extraccion --guardar-corpus /tmp/corpus    # para inspeccionar los PDFs
+    python manage.py benchmark_extraccion --guardar-base            # actualiza la línea base
+    python manage.py benchmark_extraccion --comparar-base           # CI: falla si hay regresión
+
+El corpus (``servicios.corpus_sintetico``) imita las plantillas OYS-FO-36/37/43/44
+con distintos idiomas, formatos de fecha y cantidades de páginas. Se mide
+``detect_document_type`` + ``extract()`` con la configuración actual (backend,
+lectura por páginas):
+
+- documentos y páginas por segundo (la mejor de --repeticiones pasadas)
+- latencia de cada campo (p50/p95 en µs, resolviendo el campo por separado)
+- pico de memoria de Python por documento (tracemalloc, en una pasada aparte
+  porque tracemalloc enlentece la extracción)
+- exactitud del tipo y de cada campo frente a los valores impresos
+
+--comparar-base termina con error si los docs/s caen o el pico de memoria
+crece más que --tolerancia, o si baja la exactitud de algún campo. Los docs/s
+dependen de la máquina: la línea base se genera en el mismo runner de CI.
+"""
+from collections import defaultdict
+from datetime import datetime
+import io
+import json
+import logging
+import os
+import platform
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from servicios.backends_texto import backend_para_tipo, leer_configuracion, obtener_backend
+from servicios.corpus_sintetico import generar_corpus, guardar_corpus
+from servicios.extractors import DocumentoParseado, detect_document_type
+from servicios.management.commands.metricas_etapas import percentil
+from servicios.tablas_prueba import leer_pruebas
+
+BASE_POR_DEFECTO = os.path.join(settings.BASE_DIR, 'benchmarks', 'extraccion_base.json')
+
+# Una caída de exactitud menor que esto se considera ruido de redondeo
+MARGEN_EXACTITUD = 0.001
+# Los picos de pocos cientos de KB varían entre versiones de Python: holgura fija
+MARGEN_MEMORIA_MB = 1.0
+
+
+def _normalizar(valor):
+    return ' '.join(str(valor).split()).casefold() if valor is not None else None
+
+
+class Command(BaseCommand):
+    help = 'Mide docs/s, latencia por campo y memoria de la extracción sobre un corpus sintético'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=60, help='Tamaño del corpus (default: 60)')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla del corpus (default: 42)')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Pasadas de throughput; se toma la mejor')
+        parser.add_argument('--guardar-corpus', metavar='CARPETA', help='Escribe los PDFs y su manifiesto')
+        parser.add_argument('--base', default=BASE_POR_DEFECTO, help='Archivo JSON de la línea base')
+        parser.add_argument('--guardar-base', action='store_true', help='Guarda el resultado como línea base')
+        parser.add_argument('--comparar-base', action='store_true', help='Falla si hay regresión frente a la base')
+        parser.add_argument('--tolerancia', type=float, default=0.2,
+                            help='Caída de docs/s o aumento de memoria admitido (default: 0.2 = 20%%)')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado en formato JSON')
+
+    def _extraer(self, documento):
+        tipo, extractor = detect_document_type(io.BytesIO(documento.contenido))
+        return tipo, extractor, extractor.extract()
+
+    def _latencias_campos(self, documento, extractor, latencias):
+        """Resuelve cada campo por separado sobre un texto recién parseado (µs)"""
+        anterior = extractor.parseado
+        parseado = DocumentoParseado(anterior.paginas, anterior.metadata, backend=anterior.backend,
+                                     paginas_totales=anterior.paginas_totales)
+        instancia = type(extractor)(None, parseado)
+        for campo, compilados in instancia._patrones_campos.items():
+            inicio = time.perf_counter()
+            instancia._buscar(compilados)
+            latencias[campo].append((time.perf_counter() - inicio) * 1e6)
+        for campo, (patron, limite) in instancia._patrones_multiples.items():
+            inicio = time.perf_counter()
+            instancia._buscar_todos(patron, limite)
+            latencias[campo].append((time.perf_counter() - inicio) * 1e6)
+        if 'pruebas' in documento.esperado:
+            # La tabla se lee (recorte de la región de resultados) con el PDF
+            # que ya está abierto para leer el texto: la apertura no se mide
+            with obtener_backend(parseado.backend).abrir(io.BytesIO(documento.contenido)) as lector:
+                inicio = time.perf_counter()
+                leer_pruebas(lector, parseado.paginas)
+                latencias['pruebas'].append((time.perf_counter() - inicio) * 1e6)
+
+    def _throughput(self, corpus, repeticiones):
+        mejor = float('inf')
+        duraciones = []
+        latencias = defaultdict(list)
+        resultados = []
+        for repeticion in range(repeticiones):
+            ultima = repeticion == repeticiones - 1
+            total = 0.0
+            for documento in corpus:
+                inicio = time.perf_counter()
+                try:
+                    tipo, extractor, datos = self._extraer(documento)
+                except ValueError as e:
+                    tipo, extractor, datos = None, None, {'error': str(e)}
+                transcurrido = time.perf_counter() - inicio
+                total += transcurrido
+                if ultima:
+                    duraciones.append(transcurrido * 1000)
+                    resultados.append((tipo, datos))
+                    if extractor is not None:
+                        self._latencias_campos(documento, extractor, latencias)
+            mejor = min(mejor, total)
+        return mejor, sorted(duraciones), latencias, resultados
+
+    def _memoria(self, corpus):
+        """Pico de memoria de Python (MB) de cada extracción"""
+        picos = []
+        tracemalloc.start()
+        try:
+            for documento in corpus:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+                try:
+                    self._extraer(documento)
+                except ValueError:
+                    pass
+                _, pico = tracemalloc.get_traced_memory()
+                picos.append((pico - base) / (1024 * 1024))
+        finally:
+            tracemalloc.stop()
+        return sorted(picos)
+
+    def _exactitud(self, corpus, resultados):
+        tipos = 0
+        conteo = defaultdict(lambda: [0, 0])
+        for documento, (tipo, datos) in zip(corpus, resultados):
+            tipos += tipo == documento.tipo
+            for campo, esperado in documento.esperado.items():
+                conteo[campo][0] += _normalizar(datos.get(campo)) == _normalizar(esperado)
+                conteo[campo][1] += 1
+        exactitud = {campo: round(iguales / total, 4) for campo, (iguales, total) in conteo.items()}
+        return round(tipos / len(corpus), 4), exactitud
+
+    def _resumen(self, valores, decimales=2):
+        return {
+            'p50': round(percentil(valores, 50), decimales),
+            'p95': round(percentil(valores, 95), decimales),
+            'max': round(valores[-1], decimales),
+        }
+
+    def handle(self, *args, **options):
+        if options['documentos'] < 1:
+            raise CommandError('--documentos debe ser al menos 1')
+        corpus = generar_corpus(options['documentos'], options['semilla'])
+        if options['guardar_corpus']:
+            ruta = guardar_corpus(corpus, options['guardar_corpus'])
+            self.stderr.write(f'Corpus guardado en {options["guardar_corpus"]} ({ruta})')
+
+        # Los avisos de lectura por páginas de cada documento no son parte del resultado
+        logging.disable(logging.INFO)
+        try:
+            self._extraer(corpus[0])  # Calentamiento: importaciones y cachés de patrones
+            segundos, duraciones, latencias, resultados = self._throughput(corpus, max(1, options['repeticiones']))
+            picos = self._memoria(corpus)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        paginas = sum(d.paginas for d in corpus)
+        exactitud_tipo, exactitud = self._exactitud(corpus, resultados)
+        reporte = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'entorno': {
+                'python': platform.python_version(),
+                'plataforma': platform.platform(),
+                'backend': backend_para_tipo(),
+                'por_paginas': bool(leer_configuracion('EXTRACCION_POR_PAGINAS', False)),
+            },
+            'corpus': {'documentos': len(corpus), 'semilla': options['semilla'], 'paginas': paginas},
+            'docs_por_segundo': round(len(corpus) / segundos, 2),
+            'paginas_por_segundo': round(paginas / segundos, 2),
+            'latencia_documento_ms': self._resumen(duraciones),
+            'memoria_mb': self._resumen(picos),
+            'errores': sum(1 for tipo, _ in resultados if tipo is None),
+            'exactitud_tipo': exactitud_tipo,
+            'campos': {
+                campo: {
+                    'latencia_us': self._resumen(sorted(valores), 1),
+                    'exactitud': exactitud.get(campo),
+                }
+                for campo, valores in sorted(latencias.items())
+            },
+        }
+
+        regresiones = []
+        if options['comparar_base']:
+            regresiones = self._comparar(reporte, self._leer_base(options['base']), options['tolerancia'])
+        if options['guardar_base']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['base'])), exist_ok=True)
+            with open(options['base'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+                archivo.write('\n')
+
+        if options['json']:
+            if options['comparar_base']:
+                reporte['regresiones'] = regresiones
+            self.stdout.write(json.dumps(reporte, ensure_ascii=False, indent=2))
+        else:
+            self._imprimir(reporte)
+            if options['guardar_base']:
+                self.stdout.write(self.style.SUCCESS(f'\nLínea base guardada en {options["base"]}'))
+
+        if regresiones:
+            for regresion in regresiones:
+                self.stderr.write(self.style.ERROR(f'Regresión: {regresion}'))
+            raise CommandError(f'{len(regresiones)} regresiones frente a la línea base')
+        if options['comparar_base'] and not options['json']:
+            self.stdout.write(self.style.SUCCESS('\nSin regresiones frente a la línea base'))
+
+    def _leer_base(self, ruta):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            raise CommandError(f'No existe la línea base "{ruta}": genérela con --guardar-base')
+
+    def _comparar(self, reporte, base, tolerancia):
+        if reporte['corpus'] != base['corpus']:
+            raise CommandError(
+                f'La línea base se midió con otro corpus ({base["corpus"]}); '
+                'use los mismos --documentos y --semilla o vuelva a generarla'
+            )
+        regresiones = []
+        minimo = base['docs_por_segundo'] * (1 - tolerancia)
+        if reporte['docs_por_segundo'] < minimo:
+            regresiones.append(
+                f'docs/s {reporte["docs_por_segundo"]} < {minimo:.2f} (base {base["docs_por_segundo"]})'
+            )
+        maximo = base['memoria_mb']['max'] * (1 + tolerancia) + MARGEN_MEMORIA_MB
+        if reporte['memoria_mb']['max'] > maximo:
+            regresiones.append(
+                f'pico de memoria {reporte["memoria_mb"]["max"]} MB > {maximo:.2f} MB '
+                f'(base {base["memoria_mb"]["max"]} MB)'
+            )
+        if reporte['exactitud_tipo'] < base['exactitud_tipo'] - MARGEN_EXACTITUD:
+            regresiones.append(f'exactitud del tipo {reporte["exactitud_tipo"]} (base {base["exactitud_tipo"]})')
+        for campo, datos in base['campos'].items():
+            if datos['exactitud'] is None:
+                continue
+            actual = reporte['campos'].get(campo, {}).get('exactitud') or 0
+            if actual < datos['exactitud'] - MARGEN_EXACTITUD:
+                regresiones.append(f'exactitud de {campo} {actual} (base {datos["exactitud"]})')
+        return regresiones
+
+    def _imprimir(self, reporte):
+        corpus = reporte['corpus']
+        self.stdout.write(
+            f'{corpus["documentos"]} documentos, {corpus["paginas"]} páginas (semilla {corpus["semilla"]}), '
+            f'backend {reporte["entorno"]["backend"]}'
+            f'{" por páginas" if reporte["entorno"]["por_paginas"] else ""}\n'
+        )
+        latencia, memoria = reporte['latencia_documento_ms'], reporte['memoria_mb']
+        self.stdout.write(f'Docs/s:            {reporte["docs_por_segundo"]:>10.1f}')
+        self.stdout.write(f'Páginas/s:         {reporte["paginas_por_segundo"]:>10.1f}')
+        self.stdout.write(f'Latencia (ms):     p50 {latencia["p50"]:.1f}  p95 {latencia["p95"]:.1f}  máx {latencia["max"]:.1f}')
+        self.stdout.write(f'Memoria pico (MB): p50 {memoria["p50"]:.2f}  p95 {memoria["p95"]:.2f}  máx {memoria["max"]:.2f}')
+        self.stdout.write(f'Errores:           {reporte["errores"]:>10}')
+        self.stdout.write(f'Exactitud de tipo: {reporte["exactitud_tipo"] * 100:>9.1f}%')
+
+        self.stdout.write(f'\n{"Campo":<24} {"p50 (µs)":>10} {"p95 (µs)":>10} {"Exactitud":>10}')
+        campos = sorted(reporte['campos'].items(), key=lambda item: item[1]['latencia_us']['p95'], reverse=True)
+        for campo, datos in campos:
+            exactitud = f'{datos["exactitud"] * 100:.1f}%' if datos['exactitud'] is not None else '-'
+            self.stdout.write(
+                f'{campo:<24} {datos["latencia_us"]["p50"]:>10.1f} {datos["latencia_us"]["p95"]:>10.1f} {exactitud:>10}'
+            )
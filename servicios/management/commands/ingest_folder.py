@@ -0,0 +1,96 @@
+"""
+Ingesta masiva de documentos desde una carpeta (PDF, XLSX y ZIP)
+
+Uso:
+    python manage.py ingest_folder /ruta/parada_planta --usuario comercial1
+    python manage.py ingest_folder /ruta --recursivo --workers 8 --lote 100
+"""
+import json
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from servicios.ingesta import EXTENSIONES_DOCUMENTO, ingestar_lote
+from servicios.models import Servicio
+
+
+class Command(BaseCommand):
+    help = 'Ingesta todos los PDF y XLSX (y ZIP con ellos) de una carpeta con extracción en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('carpeta', help='Carpeta con los archivos PDF, XLSX o ZIP')
+        parser.add_argument('--usuario', help='Username del comercial al que se asignan los documentos')
+        parser.add_argument('--servicio', type=int, help='ID del servicio al que se asocian (opcional)')
+        parser.add_argument('--recursivo', action='store_true', help='Incluye subcarpetas')
+        parser.add_argument('--workers', type=int, default=None, help='Procesos de extracción (default: núcleos)')
+        parser.add_argument('--lote', type=int, default=50, help='Documentos por transacción (default: 50)')
+        parser.add_argument('--json', action='store_true', help='Imprime el resumen en formato JSON')
+
+    def handle(self, *args, **options):
+        carpeta = options['carpeta']
+        if not os.path.isdir(carpeta):
+            raise CommandError(f'La carpeta "{carpeta}" no existe')
+
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuario "{options["usuario"]}" no encontrado')
+
+        servicio = None
+        if options['servicio']:
+            try:
+                servicio = Servicio.objects.get(pk=options['servicio'])
+            except Servicio.DoesNotExist:
+                raise CommandError(f'Servicio {options["servicio"]} no encontrado')
+
+        rutas = []
+        for raiz, subcarpetas, archivos in os.walk(carpeta):
+            for nombre in sorted(archivos):
+                if nombre.lower().endswith(EXTENSIONES_DOCUMENTO + ('.zip',)):
+                    rutas.append(os.path.join(raiz, nombre))
+            if not options['recursivo']:
+                break
+
+        if not rutas:
+            self.stdout.write(self.style.WARNING('No se encontraron archivos PDF, XLSX o ZIP'))
+            return
+
+        inicio = time.monotonic()
+        resumenes = ingestar_lote(
+            rutas,
+            usuario=usuario,
+            servicio=servicio,
+            tamano_lote=options['lote'],
+            max_workers=options['workers'],
+        )
+        duracion = time.monotonic() - inicio
+
+        if options['json']:
+            self.stdout.write(json.dumps(resumenes, ensure_ascii=False, indent=2))
+            return
+
+        for resumen in resumenes:
+            if resumen['error']:
+                self.stdout.write(self.style.ERROR(f'✗ {resumen["archivo"]}: {resumen["error"]}'))
+                continue
+            if resumen['valvula']:
+                accion = 'creada' if resumen['valvula_creada'] else 'enlazada'
+                valvula = f'válvula {resumen["valvula"]} ({accion})'
+            else:
+                valvula = 'sin válvula'
+            self.stdout.write(
+                f'✓ {resumen["archivo"]}: {resumen["tipo"]} '
+                f'#{resumen["numero_documento"] or "(sin número)"} - {valvula}'
+            )
+
+        errores = sum(1 for r in resumenes if r['error'])
+        rechazados = sum(1 for r in resumenes if r.get('rechazo'))
+        detalle = f' ({rechazados} rechazados en la revisión previa)' if rechazados else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{len(resumenes)} archivos en {duracion:.1f}s '
+            f'({len(resumenes) / duracion if duracion else 0:.1f} docs/s), {errores} con error{detalle}'
+        ))
@@ -0,0 +1,141 @@
+"""
+Percentiles (p50/p95) de la duración de cada etapa de la extracción
+
+Uso:
+    python manage.py metricas_etapas                       # últimos 7 días
+    python manage.py metricas_etapas --dias 30 --tipo calibracion
+    python manage.py metricas_etapas --desde 2026-05-01 --hasta 2026-05-15 --comparar
+    python manage.py metricas_etapas --origen cola --json
+
+Con --comparar se muestra además el periodo anterior de la misma duración y
+la variación del p50/p95 de cada etapa (p. ej. antes y después de cambiar un
+extractor). Las mediciones se guardan en ``MetricaExtraccion``.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+import json
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from servicios.models import MetricaExtraccion
+
+PERCENTILES = (50, 95)
+
+
+def percentil(valores, p):
+    """Percentil con interpolación lineal sobre valores ya ordenados"""
+    if not valores:
+        return None
+    posicion = (len(valores) - 1) * p / 100
+    inferior, superior = math.floor(posicion), math.ceil(posicion)
+    if inferior == superior:
+        return valores[inferior]
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicion - inferior)
+
+
+class Command(BaseCommand):
+    help = 'Muestra p50/p95 por etapa de la extracción de documentos en un periodo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (AAAA-MM-DD, default: hace --dias días)')
+        parser.add_argument('--hasta', help='Fecha final, incluida (AAAA-MM-DD, default: hoy)')
+        parser.add_argument('--dias', type=int, default=7, help='Días hacia atrás si no se da --desde (default: 7)')
+        parser.add_argument('--tipo', help='Sólo un tipo de documento (calibracion, mantenimiento...)')
+        parser.add_argument('--origen', choices=[o for o, _ in MetricaExtraccion.ORIGEN_CHOICES])
+        parser.add_argument('--comparar', action='store_true', help='Compara con el periodo anterior de igual duración')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado en formato JSON')
+
+    def _fecha(self, texto, opcion):
+        try:
+            return datetime.strptime(texto, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{opcion} debe tener el formato AAAA-MM-DD: "{texto}"')
+
+    def _periodo(self, options):
+        hasta = self._fecha(options['hasta'], '--hasta') if options['hasta'] else timezone.localdate()
+        if options['desde']:
+            desde = self._fecha(options['desde'], '--desde')
+        else:
+            desde = hasta - timedelta(days=max(options['dias'], 1) - 1)
+        if desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+        return inicio, fin
+
+    def _resumen(self, inicio, fin, options):
+        metricas = MetricaExtraccion.objects.filter(fecha__gte=inicio, fecha__lt=fin)
+        if options['tipo']:
+            metricas = metricas.filter(tipo_documento=options['tipo'])
+        if options['origen']:
+            metricas = metricas.filter(origen=options['origen'])
+
+        duraciones = defaultdict(list)
+        mediciones = 0
+        for etapas, total in metricas.values_list('etapas', 'duracion_ms').iterator(chunk_size=2000):
+            mediciones += 1
+            duraciones['total'].append(total)
+            for nombre, milisegundos in (etapas or {}).items():
+                duraciones[nombre].append(milisegundos)
+
+        resumen = {}
+        for nombre, valores in duraciones.items():
+            valores.sort()
+            resumen[nombre] = {'n': len(valores), 'max': round(valores[-1], 2)}
+            for p in PERCENTILES:
+                resumen[nombre][f'p{p}'] = round(percentil(valores, p), 2)
+        return {
+            'desde': inicio.isoformat(),
+            'hasta': fin.isoformat(),
+            'mediciones': mediciones,
+            'etapas': resumen,
+        }
+
+    def handle(self, *args, **options):
+        inicio, fin = self._periodo(options)
+        reporte = self._resumen(inicio, fin, options)
+        anterior = self._resumen(inicio - (fin - inicio), inicio, options) if options['comparar'] else None
+
+        if options['json']:
+            if anterior is not None:
+                reporte['anterior'] = anterior
+            self.stdout.write(json.dumps(reporte, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(
+            f'{reporte["mediciones"]} mediciones entre {inicio:%Y-%m-%d} y {fin - timedelta(days=1):%Y-%m-%d}'
+        )
+        if anterior is not None:
+            self.stdout.write(f'Periodo anterior: {anterior["mediciones"]} mediciones')
+        if not reporte['mediciones']:
+            return
+
+        encabezado = f'\n{"Etapa":<14} {"N":>6} {"p50 (ms)":>10} {"p95 (ms)":>10} {"máx (ms)":>10}'
+        if anterior is not None:
+            encabezado += f' {"Δ p50":>8} {"Δ p95":>8}'
+        self.stdout.write(encabezado)
+
+        # La etapa más lenta primero; el total al final
+        etapas = sorted(
+            (n for n in reporte['etapas'] if n != 'total'),
+            key=lambda n: reporte['etapas'][n]['p95'], reverse=True,
+        ) + ['total']
+        for nombre in etapas:
+            datos = reporte['etapas'][nombre]
+            linea = f'{nombre:<14} {datos["n"]:>6} {datos["p50"]:>10.1f} {datos["p95"]:>10.1f} {datos["max"]:>10.1f}'
+            if anterior is not None:
+                previo = anterior['etapas'].get(nombre)
+                variaciones = [self._variacion(datos, previo, f'p{p}') for p in PERCENTILES]
+                linea += ''.join(f' {v:>8}' for v, _ in variaciones)
+                if any(empeora for _, empeora in variaciones):
+                    linea = self.style.WARNING(linea)
+            self.stdout.write(linea)
+
+    def _variacion(self, datos, previo, clave):
+        """Variación porcentual frente al periodo anterior y si es una regresión (>10%)"""
+        if not previo or not previo[clave]:
+            return '-', False
+        cambio = (datos[clave] - previo[clave]) / previo[clave] * 100
+        return f'{cambio:+.0f}%', cambio > 10
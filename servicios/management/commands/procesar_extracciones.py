@@ -0,0 +1,64 @@
+"""
+Worker de la cola de extracción de documentos
+
+Uso:
+    python manage.py procesar_extracciones            # se queda escuchando la cola
+    python manage.py procesar_extracciones --una-vez  # vacía la cola y termina
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from servicios.cola import identificador_worker, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos pendientes de la cola de extracción de documentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los trabajos disponibles y termina (útil para cron)',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5.0,
+            help='Segundos de espera entre consultas cuando la cola está vacía (default: 5)',
+        )
+        parser.add_argument(
+            '--max-trabajos',
+            type=int,
+            default=None,
+            help='Termina después de procesar esta cantidad de trabajos',
+        )
+
+    def handle(self, *args, **options):
+        worker = identificador_worker()
+        limite = options['max_trabajos']
+        self._detener = False
+
+        def detener(signum, frame):
+            self.stdout.write(self.style.WARNING('Señal recibida, terminando después del trabajo actual...'))
+            self._detener = True
+
+        signal.signal(signal.SIGTERM, detener)
+        signal.signal(signal.SIGINT, detener)
+
+        self.stdout.write(f'Worker de extracción iniciado ({worker})')
+        total = 0
+        while not self._detener:
+            # Un trabajo por vuelta para revisar la señal de parada entre trabajos
+            procesados = procesar_pendientes(limite=1, worker=worker)
+            total += procesados
+
+            if limite is not None and total >= limite:
+                break
+            if procesados == 0:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(f'Worker detenido. Trabajos procesados: {total}'))
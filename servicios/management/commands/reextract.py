@@ -0,0 +1,162 @@
+"""
+Re-extracción masiva de documentos con los extractores actuales
+
+Uso:
+    python manage.py reextract --solo-fallidos
+    python manage.py reextract --desactualizados --tipo calibracion --workers 8
+    python manage.py reextract --campos-vacios --empresa 3 --desde 2025-01-01 --hasta 2025-12-31
+    python manage.py reextract --desactualizados --contar
+
+Los documentos se procesan por id en lotes (``servicios.reextraccion``). Tras
+cada lote guardado se escribe un punto de control: si la ejecución se
+interrumpe, la siguiente con los mismos filtros continúa desde el último lote
+guardado (--reiniciar empieza de cero). El punto de control se borra al terminar.
+"""
+from datetime import datetime
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from servicios.extractors import VERSION_EXTRACTORES
+from servicios.models import Documento
+from servicios.reextraccion import (
+    guardar_punto_control, leer_punto_control, reextraer_documentos, seleccionar_documentos,
+)
+
+
+class Command(BaseCommand):
+    help = 'Vuelve a extraer documentos ya procesados (por lotes, en paralelo y reanudable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=[t for t, _ in Documento.TIPO_DOCUMENTO_CHOICES])
+        parser.add_argument('--desde', help='Fecha de carga inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Fecha de carga final, incluida (AAAA-MM-DD)')
+        parser.add_argument('--empresa', type=int, help='ID de la empresa de la válvula')
+        parser.add_argument('--version-menor-que', type=int,
+                            help='Sólo documentos extraídos con una versión anterior (o sin versión)')
+        parser.add_argument('--desactualizados', action='store_true',
+                            help=f'Equivale a --version-menor-que {VERSION_EXTRACTORES} (versión actual)')
+        parser.add_argument('--solo-fallidos', action='store_true', help='Sólo documentos con extracción fallida')
+        parser.add_argument('--campos-vacios', action='store_true',
+                            help='Sólo documentos sin número de documento o sin válvula')
+        parser.add_argument('--releer-incompletas', action='store_true',
+                            help='Vuelve a leer el archivo si la capa de texto se cortó en la lectura por páginas')
+        parser.add_argument('--releer-archivos', action='store_true',
+                            help='Vuelve a leer los archivos aunque tengan capa de texto (p. ej. tablas de pruebas)')
+        parser.add_argument('--workers', type=int, default=None, help='Procesos de extracción (default: núcleos)')
+        parser.add_argument('--lote', type=int, default=200, help='Documentos por lote y punto de control (default: 200)')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'logs', 'reextract_checkpoint.json'),
+                            help='Archivo del punto de control (default: logs/reextract_checkpoint.json)')
+        parser.add_argument('--reiniciar', action='store_true', help='Ignora el punto de control y empieza de cero')
+        parser.add_argument('--contar', action='store_true', help='Sólo muestra cuántos documentos se procesarían')
+
+    def _fecha(self, texto, opcion):
+        try:
+            return datetime.strptime(texto, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{opcion} debe tener el formato AAAA-MM-DD: "{texto}"')
+
+    def _filtros(self, options):
+        version = options['version_menor_que']
+        if options['desactualizados']:
+            version = VERSION_EXTRACTORES
+        return {
+            'tipo': options['tipo'],
+            'desde': options['desde'],
+            'hasta': options['hasta'],
+            'empresa': options['empresa'],
+            'version_menor_que': version,
+            'solo_fallidos': options['solo_fallidos'],
+            'campos_vacios': options['campos_vacios'],
+            'releer_incompletas': options['releer_incompletas'],
+            'releer_archivos': options['releer_archivos'],
+        }
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+        filtros = self._filtros(options)
+        desde = self._fecha(filtros['desde'], '--desde') if filtros['desde'] else None
+        hasta = self._fecha(filtros['hasta'], '--hasta') if filtros['hasta'] else None
+        documentos = seleccionar_documentos(
+            tipo=filtros['tipo'], desde=desde, hasta=hasta, empresa=filtros['empresa'],
+            version_menor_que=filtros['version_menor_que'], solo_fallidos=filtros['solo_fallidos'],
+            campos_vacios=filtros['campos_vacios'],
+        )
+
+        ruta_control = options['checkpoint']
+        control = None if options['reiniciar'] else leer_punto_control(ruta_control)
+        if control is not None and control.get('filtros') != filtros:
+            raise CommandError(
+                f'El punto de control {ruta_control} es de una ejecución con otros filtros '
+                f'({control.get("filtros")}); use --reiniciar para descartarlo'
+            )
+        if control is None:
+            control = {'filtros': filtros, 'ultimo_id': 0, 'procesados': 0, 'actualizados': 0,
+                       'cambiados': 0, 'errores': 0}
+        elif not options['contar']:
+            self.stdout.write(self.style.WARNING(
+                f'Reanudando desde el documento {control["ultimo_id"]} '
+                f'({control["procesados"]} procesados en ejecuciones anteriores)'
+            ))
+
+        total = documentos.filter(pk__gt=control['ultimo_id']).count()
+        if options['contar']:
+            self.stdout.write(f'{total} documentos por re-extraer (versión de extractores {VERSION_EXTRACTORES})')
+            return
+        if not total:
+            self.stdout.write(self.style.SUCCESS('No hay documentos por re-extraer'))
+            if os.path.exists(ruta_control):
+                os.remove(ruta_control)
+            return
+
+        self._detener = False
+
+        def detener(signum, frame):
+            self.stdout.write(self.style.WARNING('Señal recibida, terminando después del lote actual...'))
+            self._detener = True
+
+        signal.signal(signal.SIGTERM, detener)
+        signal.signal(signal.SIGINT, detener)
+
+        self.stdout.write(f'Re-extrayendo {total} documentos con la versión {VERSION_EXTRACTORES} de los extractores')
+        procesados = 0
+        for resumen in reextraer_documentos(
+            documentos,
+            desde_id=control['ultimo_id'],
+            tamano_lote=options['lote'],
+            max_workers=options['workers'],
+            releer_incompletas=filtros['releer_incompletas'],
+            releer_archivos=filtros['releer_archivos'],
+        ):
+            procesados += resumen['procesados']
+            control['ultimo_id'] = resumen['ultimo_id']
+            for campo in ('procesados', 'actualizados', 'cambiados'):
+                control[campo] += resumen[campo]
+            control['errores'] += len(resumen['errores'])
+            control['fecha'] = timezone.now().isoformat()
+            guardar_punto_control(ruta_control, control)
+
+            for error in resumen['errores']:
+                self.stdout.write(self.style.ERROR(f'✗ documento {error["documento_id"]}: {error["error"]}'))
+            velocidad = procesados / resumen['duracion'] if resumen['duracion'] else 0
+            restante = (total - procesados) / velocidad if velocidad else 0
+            self.stdout.write(
+                f'{procesados}/{total} documentos ({velocidad:.1f} docs/s, faltan ~{restante:.0f}s) - '
+                f'{resumen["actualizados"]} actualizados, {resumen["cambiados"]} con cambios, '
+                f'{len(resumen["errores"])} con error'
+            )
+            if self._detener:
+                self.stdout.write(self.style.WARNING(
+                    f'Detenido en el documento {control["ultimo_id"]}; vuelva a ejecutar el comando para continuar'
+                ))
+                return
+
+        os.remove(ruta_control)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{control["procesados"]} documentos procesados: {control["actualizados"]} actualizados, '
+            f'{control["cambiados"]} con cambios, {control["errores"]} con error'
+        ))
@@ -0,0 +1,146 @@
+"""
+Medición por etapas de la extracción de documentos
+
+Una ``Medicion`` acumula la duración de cada etapa (apertura del PDF, texto,
+detección, campos, fechas, válvula, guardado...), las páginas y los bytes del
+archivo. La medición activa vive en una ``ContextVar``: el código instrumentado
+sólo llama a ``medir('etapa')`` y no recibe la medición como argumento; sin
+una medición activa ``medir`` no hace nada.
+
+Las etapas son exclusivas: el tiempo de una etapa anidada (p. ej. el guardado
+dentro del enlace de la válvula) se descuenta de la etapa que la contiene, así
+que la suma de las etapas es el tiempo medido.
+
+No depende de Django: los procesos hijos (carga por lotes, extracción aislada)
+miden con su propia medición y la envían al padre con ``como_dict``.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Callable, Dict, Optional
+
+_medicion_actual: ContextVar[Optional['Medicion']] = ContextVar('medicion_extraccion', default=None)
+
+
+class Medicion:
+    """Duración por etapa (segundos) y datos del archivo de una extracción"""
+
+    def __init__(self, origen: Optional[str] = None):
+        self.origen = origen
+        self.etapas: Dict[str, float] = defaultdict(float)
+        self.paginas: Optional[int] = None
+        self.tamano_bytes: Optional[int] = None
+        self.tipo_documento: Optional[str] = None
+        self.backend: Optional[str] = None
+        # Documento al que se asocia la medición al guardarla
+        self.documento = None
+        self.inicio = time.perf_counter()
+        self.fin: Optional[float] = None
+        # Tiempo medido en otros procesos fuera de las etapas abiertas (``agregar``)
+        self._externo = 0.0
+        # Tiempo de las etapas anidadas dentro de cada etapa abierta
+        self._pila = []
+
+    @property
+    def duracion(self) -> float:
+        return (self.fin or time.perf_counter()) - self.inicio + self._externo
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        inicio = time.perf_counter()
+        self._pila.append(0.0)
+        try:
+            yield
+        finally:
+            anidado = self._pila.pop()
+            transcurrido = time.perf_counter() - inicio
+            self.etapas[nombre] += transcurrido - anidado
+            if self._pila:
+                self._pila[-1] += transcurrido
+
+    def anotar(self, **valores):
+        """Registra páginas, bytes, tipo o backend (se ignoran los valores None)"""
+        for nombre, valor in valores.items():
+            if valor is not None:
+                setattr(self, nombre, valor)
+
+    def agregar(self, datos: Optional[Dict]):
+        """
+        Suma una medición hecha en otro proceso (``como_dict``). Dentro de una
+        etapa abierta su tiempo se descuenta de esa etapa, que queda con el
+        costo propio (p. ej. lanzar el proceso hijo); fuera de una etapa (la
+        extracción ya se hizo antes, como en la carga por lotes) se suma a la
+        duración total.
+        """
+        if not datos:
+            return
+        for nombre, milisegundos in datos.get('etapas', {}).items():
+            segundos = milisegundos / 1000
+            self.etapas[nombre] += segundos
+            if self._pila:
+                self._pila[-1] += segundos
+            else:
+                self._externo += segundos
+        self.anotar(**{campo: datos.get(campo) for campo in ('paginas', 'tamano_bytes', 'tipo_documento', 'backend')})
+
+    def como_dict(self) -> Dict:
+        """Etapas en milisegundos y datos del archivo (serializable)"""
+        return {
+            'etapas': {nombre: round(segundos * 1000, 3) for nombre, segundos in self.etapas.items()},
+            'duracion_ms': round(self.duracion * 1000, 3),
+            'paginas': self.paginas,
+            'tamano_bytes': self.tamano_bytes,
+            'tipo_documento': self.tipo_documento,
+            'backend': self.backend,
+        }
+
+
+def medicion_actual() -> Optional[Medicion]:
+    return _medicion_actual.get()
+
+
+@contextmanager
+def medir(nombre: str):
+    """Mide una etapa en la medición activa (si la hay)"""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        yield
+        return
+    with medicion.etapa(nombre):
+        yield
+
+
+def anotar(**valores):
+    """``Medicion.anotar`` sobre la medición activa (si la hay)"""
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.anotar(**valores)
+
+
+@contextmanager
+def medicion_extraccion(origen: Optional[str] = None, al_terminar: Optional[Callable[[Medicion], None]] = None):
+    """
+    Activa una medición mientras dura el bloque. Si ya hay una activa (p. ej.
+    la carga que ejecuta la extracción en línea) se reutiliza y ``al_terminar``
+    queda a cargo de quien la abrió.
+
+    Args:
+        origen: 'carga', 'cola' o 'lote'
+        al_terminar: función que recibe la medición al cerrarla (p. ej. para guardarla)
+    """
+    actual = _medicion_actual.get()
+    if actual is not None:
+        yield actual
+        return
+
+    medicion = Medicion(origen)
+    token = _medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _medicion_actual.reset(token)
+        medicion.fin = time.perf_counter()
+        if al_terminar is not None:
+            al_terminar(medicion)
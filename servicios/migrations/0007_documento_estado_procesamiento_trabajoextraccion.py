@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0006_alter_documento_servicio'),
+    ]
+
+    operations = [
+        # Los documentos existentes ya fueron procesados de forma síncrona
+        migrations.AddField(
+            model_name='documento',
+            name='estado_procesamiento',
+            field=models.CharField(choices=[('pendiente', 'En cola'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], db_index=True, default='completado', help_text='Estado de la extracción asíncrona del documento', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='documento',
+            name='estado_procesamiento',
+            field=models.CharField(choices=[('pendiente', 'En cola'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], db_index=True, default='pendiente', help_text='Estado de la extracción asíncrona del documento', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TrabajoExtraccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido (dead-letter)')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('max_intentos', models.PositiveIntegerField(default=3)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now, help_text='No se procesa antes de esta fecha (backoff)')),
+                ('bloqueado_por', models.CharField(blank=True, help_text='Worker que está procesando el trabajo', max_length=255)),
+                ('bloqueado_en', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('documento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trabajo_extraccion', to='servicios.documento')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Extracción',
+                'verbose_name_plural': 'Trabajos de Extracción',
+                'ordering': ['disponible_desde', 'id'],
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='servicios_t_estado_11210d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0007_documento_estado_procesamiento_trabajoextraccion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='datos_extraidos',
+            field=models.JSONField(blank=True, help_text='Resultado de la extracción (se reutiliza para archivos duplicados)', null=True),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='hash_contenido',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 del archivo (deduplicación)', max_length=64, null=True),
+        ),
+    ]
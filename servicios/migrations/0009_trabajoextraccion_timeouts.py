@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0008_documento_hash_contenido_datos_extraidos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoextraccion',
+            name='timeouts',
+            field=models.PositiveIntegerField(default=0, help_text='Veces que la extracción superó el tiempo máximo'),
+        ),
+        migrations.AddField(
+            model_name='trabajoextraccion',
+            name='ultimo_timeout',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0009_trabajoextraccion_timeouts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaExtraccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origen', models.CharField(choices=[('carga', 'Carga individual'), ('cola', 'Cola de extracción'), ('lote', 'Carga por lotes')], max_length=20)),
+                ('etapas', models.JSONField(default=dict, help_text='Milisegundos por etapa')),
+                ('duracion_ms', models.FloatField(help_text='Duración total medida (ms)')),
+                ('paginas', models.PositiveIntegerField(blank=True, null=True)),
+                ('tamano_bytes', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('tipo_documento', models.CharField(blank=True, max_length=20)),
+                ('backend', models.CharField(blank=True, help_text='Backend de texto del PDF', max_length=20)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metricas_extraccion', to='servicios.documento')),
+            ],
+            options={
+                'verbose_name': 'Métrica de Extracción',
+                'verbose_name_plural': 'Métricas de Extracción',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0010_metricaextraccion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='version_extractor',
+            field=models.PositiveIntegerField(blank=True, db_index=True, help_text='Versión de los extractores que produjo los datos', null=True),
+        ),
+        migrations.CreateModel(
+            name='CapaTexto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('texto_comprimido', models.BinaryField(help_text='Páginas en JSON comprimido con zlib')),
+                ('paginas', models.PositiveIntegerField(help_text='Páginas leídas')),
+                ('paginas_totales', models.PositiveIntegerField(help_text='Páginas del archivo')),
+                ('backend', models.CharField(blank=True, help_text='Backend de texto del PDF', max_length=20)),
+                ('version_extractor', models.PositiveIntegerField(help_text='Versión de los extractores que leyó el texto')),
+                ('tamano_texto', models.PositiveIntegerField(default=0, help_text='Caracteres sin comprimir')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('documento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='capa_texto', to='servicios.documento')),
+            ],
+            options={
+                'verbose_name': 'Capa de Texto',
+                'verbose_name_plural': 'Capas de Texto',
+            },
+        ),
+    ]
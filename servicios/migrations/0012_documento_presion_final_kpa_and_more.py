@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0011_documento_version_extractor_capatexto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='presion_final_kpa',
+            field=models.FloatField(blank=True, db_index=True, help_text='Presión final en kPa', null=True),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='presion_inicial_kpa',
+            field=models.FloatField(blank=True, db_index=True, help_text='Presión inicial en kPa', null=True),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='temperatura_c',
+            field=models.FloatField(blank=True, db_index=True, help_text='Temperatura en °C', null=True),
+        ),
+    ]
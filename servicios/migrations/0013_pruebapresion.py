@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0012_documento_presion_final_kpa_and_more'),
+        ('valvulas', '0003_valvula_presion_nominal_kpa_valvula_presion_set_kpa_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PruebaPresion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(blank=True, help_text='Fecha del documento', null=True)),
+                ('numero', models.PositiveSmallIntegerField(help_text='Número de la prueba en la tabla')),
+                ('presion_set', models.CharField(blank=True, max_length=50, null=True)),
+                ('presion_apertura', models.CharField(blank=True, help_text='Apertura / disparo (pop)', max_length=50, null=True)),
+                ('presion_cierre', models.CharField(blank=True, help_text='Cierre / reasiento (reseat)', max_length=50, null=True)),
+                ('prueba_fugas', models.CharField(blank=True, help_text='Resultado de la prueba de fugas', max_length=100, null=True)),
+                ('unidad_presion', models.CharField(blank=True, max_length=20, null=True)),
+                ('temperatura', models.CharField(blank=True, max_length=50, null=True)),
+                ('presion_set_kpa', models.FloatField(blank=True, null=True)),
+                ('presion_apertura_kpa', models.FloatField(blank=True, null=True)),
+                ('presion_cierre_kpa', models.FloatField(blank=True, null=True)),
+                ('temperatura_c', models.FloatField(blank=True, null=True)),
+                ('documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pruebas_presion', to='servicios.documento')),
+                ('valvula', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pruebas_presion', to='valvulas.valvula')),
+            ],
+            options={
+                'verbose_name': 'Prueba de Presión',
+                'verbose_name_plural': 'Pruebas de Presión',
+                'ordering': ['documento', 'numero'],
+                'indexes': [models.Index(fields=['valvula', 'fecha'], name='servicios_p_valvula_6f894a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0013_pruebapresion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='revisar_valvula',
+            field=models.BooleanField(db_index=True, default=False, help_text='El enlace con la válvula es aproximado y debe confirmarse'),
+        ),
+        migrations.AddField(
+            model_name='documento',
+            name='similitud_valvula',
+            field=models.FloatField(blank=True, help_text='Similitud del número de serie con el de la válvula enlazada (vacío si coincide)', null=True),
+        ),
+    ]
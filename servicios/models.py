@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Count, Max, Min, Q, StdDev
 from django.contrib.auth.models import User
+from django.utils import timezone
+from valvulas.identidad import buscar_valvula, crear_valvula, normalizar_serie
+from valvulas.similitud import es_otro_numero, requiere_revision, similitud, valvulas_similares
 from valvulas.models import Valvula
+from valvulas.unidades import presion_a_kpa, temperatura_a_celsius
 from usuarios.models import PerfilUsuario
+from servicios.capa_texto import descomprimir_paginas
 
 
 class Servicio(models.Model):
@@ -47,6 +53,40 @@ class Servicio(models.Model):
         return f"{self.get_tipo_servicio_display()} - {self.valvula.numero_serie} ({self.fecha_servicio})"
 
 
+def con_normalizados(modelo, campos):
+    """
+    Campos a escribir más las columnas en kPa y °C que dependen de ellos
+    (``CAMPOS_NORMALIZADOS`` del modelo), para ``update_fields`` y
+    ``bulk_update``
+    """
+    campos = list(campos)
+    for campo in list(campos):
+        for normalizado in modelo.CAMPOS_NORMALIZADOS.get(campo, ()):
+            if normalizado not in campos:
+                campos.append(normalizado)
+    return campos
+
+
+class NormalizadosQuerySet(models.QuerySet):
+    """
+    ``bulk_create`` y ``bulk_update`` no llaman a ``save``: llenan aquí las
+    columnas en kPa y °C (``normalizar_unidades`` del modelo) antes de escribir
+    y ``bulk_update`` también escribe las de los campos que actualiza
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.normalizar_unidades()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.normalizar_unidades()
+        return super().bulk_update(objs, con_normalizados(self.model, fields), *args, **kwargs)
+
+
 class Documento(models.Model):
     """
     Modelo genérico para almacenar cualquier tipo de documento (Certificado, Informe, etc)
@@ -59,12 +99,20 @@ class Documento(models.Model):
         ('otro', 'Otro'),
     ]
     
+    ESTADO_PROCESAMIENTO_CHOICES = [
+        ('pendiente', 'En cola'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    
     servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='documentos', null=True, blank=True, help_text="Servicio asociado (opcional si se vincula directamente a válvula)")
     valvula = models.ForeignKey(Valvula, on_delete=models.CASCADE, related_name='documentos', null=True, blank=True, help_text="Referencia directa a la válvula para hoja de vida")
     usuario_comercial = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='documentos_subidos')
     tipo_documento = models.CharField(max_length=50, choices=TIPO_DOCUMENTO_CHOICES)
     archivo_pdf = models.FileField(upload_to='documentos/%Y/%m/%d/')
     nombre_original = models.CharField(max_length=255, blank=True, help_text="Nombre original del archivo")
+    hash_contenido = models.CharField(max_length=64, blank=True, null=True, db_index=True, help_text="SHA-256 del archivo (deduplicación)")
     
     # Datos genéricos extraídos
     numero_documento = models.CharField(max_length=100, blank=True, null=True, db_index=True)
@@ -77,6 +125,10 @@ class Documento(models.Model):
     presion_final = models.CharField(max_length=50, blank=True, null=True)
     temperatura = models.CharField(max_length=50, blank=True, null=True)
     unidad_presion = models.CharField(max_length=20, blank=True, null=True)  # PSI, bar, atm, kPa
+    # Los mismos valores en unidades canónicas para filtrar por rango (ver valvulas.unidades)
+    presion_inicial_kpa = models.FloatField(null=True, blank=True, db_index=True, help_text="Presión inicial en kPa")
+    presion_final_kpa = models.FloatField(null=True, blank=True, db_index=True, help_text="Presión final en kPa")
+    temperatura_c = models.FloatField(null=True, blank=True, db_index=True, help_text="Temperatura en °C")
     resultado_calibracion = models.CharField(max_length=50, blank=True, null=True)  # APROBADO/RECHAZADO
     laboratorio = models.CharField(max_length=255, blank=True, null=True)
     
@@ -89,14 +141,29 @@ class Documento(models.Model):
     proximo_mantenimiento = models.DateField(null=True, blank=True)
     
     # Estado de extracción
+    estado_procesamiento = models.CharField(
+        max_length=20,
+        choices=ESTADO_PROCESAMIENTO_CHOICES,
+        default='pendiente',
+        db_index=True,
+        help_text="Estado de la extracción asíncrona del documento"
+    )
     extraido_exitosamente = models.BooleanField(default=False)
     error_extraccion = models.TextField(blank=True, null=True, help_text="Descripción del error si falló la extracción")
     fecha_extraccion_datos = models.DateTimeField(null=True, blank=True)
+    datos_extraidos = models.JSONField(null=True, blank=True, help_text="Resultado de la extracción (se reutiliza para archivos duplicados)")
+    version_extractor = models.PositiveIntegerField(null=True, blank=True, db_index=True, help_text="Versión de los extractores que produjo los datos")
+    
+    # Enlace por número de serie parecido (ver valvulas.similitud)
+    similitud_valvula = models.FloatField(null=True, blank=True, help_text="Similitud del número de serie con el de la válvula enlazada (vacío si coincide)")
+    revisar_valvula = models.BooleanField(default=False, db_index=True, help_text="El enlace con la válvula es aproximado y debe confirmarse")
     
     # Auditoría
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
+    objects = NormalizadosQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Documento"
         verbose_name_plural = "Documentos"
@@ -109,6 +176,28 @@ class Documento(models.Model):
     def __str__(self):
         return f"{self.get_tipo_documento_display()} {self.numero_documento or 'Sin #'} - {self.servicio.valvula.numero_serie}"
     
+    # Columnas que se calculan en save() a partir de cada campo
+    CAMPOS_NORMALIZADOS = {
+        'presion_inicial': ('presion_inicial_kpa',),
+        'presion_final': ('presion_final_kpa',),
+        'unidad_presion': ('presion_inicial_kpa', 'presion_final_kpa'),
+        'temperatura': ('temperatura_c',),
+    }
+    
+    def save(self, *args, **kwargs):
+        self.normalizar_unidades()
+        if kwargs.get('update_fields') is not None:
+            # Con update_fields también se escriben las columnas en kPa y °C
+            # de los campos guardados
+            kwargs['update_fields'] = con_normalizados(self, kwargs['update_fields'])
+        super().save(*args, **kwargs)
+    
+    def normalizar_unidades(self):
+        """Llena las columnas en kPa y °C desde los valores de texto extraídos"""
+        self.presion_inicial_kpa = presion_a_kpa(self.presion_inicial, self.unidad_presion)
+        self.presion_final_kpa = presion_a_kpa(self.presion_final, self.unidad_presion)
+        self.temperatura_c = temperatura_a_celsius(self.temperatura)
+    
     @property
     def esta_vigente(self):
         """Verifica si el documento está vigente"""
@@ -126,22 +215,30 @@ class Documento(models.Model):
         delta = self.fecha_vencimiento - timezone.now().date()
         return delta.days
     
-    def enlazar_valvula_por_numero_serie(self, numero_serie=None, modelo=None):
+    def enlazar_valvula_por_numero_serie(self, numero_serie=None, modelo=None, mapa=None):
         """
         Identifica la válvula correspondiente al documento usando el número de serie
         o, en caso de que este falte, el modelo.
 
-        Se intenta primero encontrar un registro con el número de serie proporcionado.
-        Si no se encuentra (o no se pasó), se consulta por modelo (tomando la primera
-        válvula que coincida). Cualquier búsqueda ignora mayúsculas/minúsculas.
+        La búsqueda exacta es una sola consulta indexada sobre el número de serie y el
+        modelo normalizados (mayúsculas, sin separadores ni prefijo "S/N"; ver
+        ``valvulas.identidad``): gana la válvula del mismo número de serie (la
+        de la empresa del documento primero). Sin ella, la de la empresa con
+        el número de serie más parecido (``valvulas.similitud``; por debajo de
+        la similitud automática el documento queda con ``revisar_valvula``)
+        y, por último, la del mismo modelo en la empresa. En empate, la más
+        antigua.
 
         Si no existe ninguna válvula que coincida, se crea una nueva usando la
         información disponible (serie o modelo se transforma en número de serie
-        si sólo se conoce el modelo).
+        si sólo se conoce el modelo) en la empresa del documento; sin empresa
+        no se crea. Si otro proceso crea la misma válvula a la vez, el
+        documento se enlaza con la de ese proceso (``crear_valvula``).
 
         Args:
             numero_serie (str|None): número de serie extraído del documento
             modelo (str|None): modelo extraído del documento
+            mapa (MapaIdentidad|None): válvulas ya resueltas en la carga por lotes
 
         Returns:
             tuple(valvula, creada:bool)
@@ -150,57 +247,336 @@ class Documento(models.Model):
         if not numero_serie and not modelo:
             return None, False
 
-        # Helper para recuperar empresa de contexto
-        empresa = None
+        empresa_id = self.empresa_contexto_id()
+        self.similitud_valvula, self.revisar_valvula = None, False
+
+        # 1. por número de serie exacto (normalizado)
+        if mapa is not None:
+            valvula = mapa.buscar(numero_serie, modelo, empresa_id)
+        else:
+            valvula = buscar_valvula(numero_serie, modelo, empresa_id)
+        serie = normalizar_serie(numero_serie)
+        if valvula is not None and (not serie or valvula.numero_serie_normalizado == serie):
+            self.valvula = valvula
+            return valvula, False
+
+        # 2. por número de serie parecido en la empresa (la más parecida que no
+        # sea otro número); si la similitud sin plegar no llega a la
+        # automática, el enlace queda para revisión
+        candidatas = [
+            valvula for valvula, _ in (valvulas_similares(numero_serie, empresa_id) if serie else [])
+            if not es_otro_numero(valvula.numero_serie_normalizado, serie)
+        ]
+        if candidatas:
+            parecida = candidatas[0]
+            self.similitud_valvula = similitud(serie, parecida.numero_serie_normalizado)
+            self.revisar_valvula = requiere_revision(self.similitud_valvula)
+            self.valvula = parecida
+            return parecida, False
+
+        # 3. por modelo
+        if valvula is not None:
+            self.valvula = valvula
+            return valvula, False
+
+        # 4. no existe, crear nueva válvula (toda válvula pertenece a una empresa)
+        if empresa_id is None:
+            return None, False
+        valvula, creada = self._crear_valvula(numero_serie or modelo or '', modelo, empresa_id)
+        if mapa is not None:
+            mapa.registrar(valvula)
+        self.valvula = valvula
+        return valvula, creada
+    
+    def empresa_contexto_id(self):
+        """Empresa del documento: la de la válvula del servicio o la del comercial (sólo el id)"""
         if self.servicio and self.servicio.valvula:
-            empresa = self.servicio.valvula.empresa
-        elif self.usuario_comercial and hasattr(self.usuario_comercial, 'perfil'):
-            empresa = self.usuario_comercial.perfil.empresa
-
-        # 1. intentar por número de serie si se proporciona
-        if numero_serie:
-            try:
-                valvula = Valvula.objects.get(numero_serie=numero_serie)
-                self.valvula = valvula
-                return valvula, False
-            except Valvula.DoesNotExist:
-                pass  # continuamos a intentar por modelo
-
-        # 2. intentar por modelo si se proporcionó y no encontramos por serie
-        if modelo:
-            valvula = Valvula.objects.filter(modelo__iexact=modelo).first()
-            if valvula:
-                self.valvula = valvula
-                return valvula, False
-
-        # 3. no existe, crear nueva válvula
-        identificador = numero_serie or modelo or ''
-        valvula = Valvula(
+            return self.servicio.valvula.empresa_id
+        if self.usuario_comercial and hasattr(self.usuario_comercial, 'perfil'):
+            return self.usuario_comercial.perfil.empresa_id
+        return None
+    
+    def _crear_valvula(self, identificador, modelo, empresa_id):
+        """Válvula nueva con los datos extraídos del documento (``crear_valvula``)"""
+        return crear_valvula(Valvula(
             numero_serie=identificador,
-            marca=getattr(self, '_marca_extraida', ''),
-            modelo=modelo or getattr(self, '_modelo_extraido', ''),
-            tamaño=getattr(self, '_tamaño_extraido', ''),
-            empresa=empresa,
+            marca=getattr(self, '_marca_extraida', None) or '',
+            modelo=modelo or getattr(self, '_modelo_extraido', None) or '',
+            tamaño=getattr(self, '_tamaño_extraido', None) or '',
+            empresa_id=empresa_id,
             tipo='alivio' if self.tipo_documento == 'calibracion' else 'control',
-        )
-        valvula.save()
-        self.valvula = valvula
-        return valvula, True
+        ))
+    
+    def confirmar_enlace_valvula(self):
+        """
+        Confirma un enlace aproximado pendiente de revisión: quita la marca y
+        aplica las fechas del documento a la hoja de vida de la válvula, en
+        una transacción
+        """
+        with transaction.atomic():
+            self.revisar_valvula = False
+            self.save(update_fields=['revisar_valvula', 'fecha_actualizacion'])
+            self.actualizar_fechas_hoja_vida()
+    
+    def rechazar_enlace_valvula(self):
+        """
+        Rechaza un enlace aproximado pendiente de revisión: el documento pasa
+        a la válvula de su propio número de serie en la empresa (se crea con
+        ``crear_valvula`` si no existe) junto con sus pruebas de presión, y se
+        aplican sus fechas a la hoja de vida de esa válvula.
+
+        Returns:
+            tuple(valvula, creada:bool)
+
+        Raises:
+            ValueError: el documento no tiene número de serie extraído ni empresa
+        """
+        datos = (self.datos_extraidos or {}).get('datos') or {}
+        numero_serie = datos.get('numero_serie') or datos.get('serial_number')
+        empresa_id = self.valvula.empresa_id if self.valvula_id else self.empresa_contexto_id()
+        if not normalizar_serie(numero_serie) or empresa_id is None:
+            raise ValueError('El documento no tiene número de serie extraído o empresa para crear la válvula')
+        
+        with transaction.atomic():
+            valvula = Valvula.objects.filter(
+                numero_serie_normalizado=normalizar_serie(numero_serie), empresa_id=empresa_id,
+            ).order_by('pk').first()
+            creada = False
+            if valvula is None:
+                self._marca_extraida = datos.get('marca')
+                self._tamaño_extraido = datos.get('tamaño')
+                valvula, creada = self._crear_valvula(numero_serie, datos.get('modelo'), empresa_id)
+            self.valvula = valvula
+            self.similitud_valvula, self.revisar_valvula = None, False
+            self.save(update_fields=['valvula', 'similitud_valvula', 'revisar_valvula', 'fecha_actualizacion'])
+            PruebaPresion.objects.filter(documento=self).update(valvula=valvula)
+            self.actualizar_fechas_hoja_vida()
+        return valvula, creada
     
     def actualizar_fechas_hoja_vida(self):
         """
         Actualiza las fechas de calibración/mantenimiento en la Hoja de Vida de la válvula
+        (no con un enlace aproximado pendiente de revisión).
+
+        Es un solo ``UPDATE ... WHERE fecha < nueva``: no lee la válvula y un
+        documento más antiguo (re-extracción, carga fuera de orden) no
+        reemplaza una fecha más reciente.
+
+        Returns:
+            True si la fecha de la válvula cambió
+        """
+        if not self.valvula_id or not self.extraido_exitosamente or self.revisar_valvula or not self.fecha_documento:
+            return False
+        
+        if self.tipo_documento == 'calibracion':
+            campo = 'fecha_ultima_calibracion'
+        elif self.tipo_documento in ['mantenimiento', 'reparacion']:
+            campo = 'fecha_ultimo_servicio'
+        else:
+            return False
+        
+        # update() no aplica auto_now
+        actualizada = Valvula.objects.filter(
+            Q(**{f'{campo}__isnull': True}) | Q(**{f'{campo}__lt': self.fecha_documento}),
+            pk=self.valvula_id,
+        ).update(**{campo: self.fecha_documento, 'fecha_actualizacion': timezone.now()})
+        if actualizada and Documento.valvula.is_cached(self):
+            setattr(self.valvula, campo, self.fecha_documento)
+        return bool(actualizada)
+
+
+class CapaTexto(models.Model):
+    """
+    Texto por página de la primera lectura del archivo, comprimido (ver
+    ``servicios.capa_texto``). Permite volver a ejecutar los extractores sobre
+    el texto guardado sin descargar ni parsear el PDF.
+    """
+    documento = models.OneToOneField(Documento, on_delete=models.CASCADE, related_name='capa_texto')
+    texto_comprimido = models.BinaryField(help_text="Páginas en JSON comprimido con zlib")
+    paginas = models.PositiveIntegerField(help_text="Páginas leídas")
+    paginas_totales = models.PositiveIntegerField(help_text="Páginas del archivo")
+    backend = models.CharField(max_length=20, blank=True, help_text="Backend de texto del PDF")
+    version_extractor = models.PositiveIntegerField(help_text="Versión de los extractores que leyó el texto")
+    tamano_texto = models.PositiveIntegerField(default=0, help_text="Caracteres sin comprimir")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Capa de Texto"
+        verbose_name_plural = "Capas de Texto"
+    
+    def __str__(self):
+        return f"Texto documento {self.documento_id} ({self.paginas}/{self.paginas_totales} páginas)"
+    
+    @property
+    def completo(self):
+        """False si la lectura por páginas se detuvo antes de la última página"""
+        return self.paginas >= self.paginas_totales
+    
+    def paginas_texto(self):
+        """Texto de cada página leída"""
+        return descomprimir_paginas(self.texto_comprimido)
+
+
+class PruebaPresion(models.Model):
+    """
+    Un punto de prueba de una calibración: una fila de la tabla de resultados
+    del certificado (ver ``servicios.tablas_prueba``). La válvula y la fecha se
+    copian del Documento para agrupar por válvula y periodo sin unir tablas.
+    """
+    documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='pruebas_presion')
+    valvula = models.ForeignKey(Valvula, on_delete=models.CASCADE, related_name='pruebas_presion', null=True, blank=True)
+    fecha = models.DateField(null=True, blank=True, help_text="Fecha del documento")
+    numero = models.PositiveSmallIntegerField(help_text="Número de la prueba en la tabla")
+    
+    # Valores como aparecen en el certificado
+    presion_set = models.CharField(max_length=50, blank=True, null=True)
+    presion_apertura = models.CharField(max_length=50, blank=True, null=True, help_text="Apertura / disparo (pop)")
+    presion_cierre = models.CharField(max_length=50, blank=True, null=True, help_text="Cierre / reasiento (reseat)")
+    prueba_fugas = models.CharField(max_length=100, blank=True, null=True, help_text="Resultado de la prueba de fugas")
+    unidad_presion = models.CharField(max_length=20, blank=True, null=True)
+    temperatura = models.CharField(max_length=50, blank=True, null=True)
+    
+    # Normalizados (ver ``valvulas.unidades``)
+    presion_set_kpa = models.FloatField(null=True, blank=True)
+    presion_apertura_kpa = models.FloatField(null=True, blank=True)
+    presion_cierre_kpa = models.FloatField(null=True, blank=True)
+    temperatura_c = models.FloatField(null=True, blank=True)
+    
+    objects = NormalizadosQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = "Prueba de Presión"
+        verbose_name_plural = "Pruebas de Presión"
+        ordering = ['documento', 'numero']
+        indexes = [
+            models.Index(fields=['valvula', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"Prueba {self.numero} documento {self.documento_id}"
+    
+    # Columnas que se calculan en save() a partir de cada campo
+    CAMPOS_NORMALIZADOS = {
+        'presion_set': ('presion_set_kpa',),
+        'presion_apertura': ('presion_apertura_kpa',),
+        'presion_cierre': ('presion_cierre_kpa',),
+        'unidad_presion': ('presion_set_kpa', 'presion_apertura_kpa', 'presion_cierre_kpa'),
+        'temperatura': ('temperatura_c',),
+    }
+    
+    def save(self, *args, **kwargs):
+        self.normalizar_unidades()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = con_normalizados(self, kwargs['update_fields'])
+        super().save(*args, **kwargs)
+    
+    def normalizar_unidades(self):
+        """Llena las columnas en kPa y °C (al guardar y en ``bulk_create``)"""
+        self.presion_set_kpa = presion_a_kpa(self.presion_set, self.unidad_presion)
+        self.presion_apertura_kpa = presion_a_kpa(self.presion_apertura, self.unidad_presion)
+        self.presion_cierre_kpa = presion_a_kpa(self.presion_cierre, self.unidad_presion)
+        self.temperatura_c = temperatura_a_celsius(self.temperatura)
+    
+    @classmethod
+    def repetibilidad(cls, pruebas=None):
         """
-        if not self.valvula or not self.extraido_exitosamente:
-            return
+        Repetibilidad de la presión de apertura por válvula, en una sola
+        consulta agrupada (usa el índice válvula + fecha)
         
-        if self.tipo_documento == 'calibracion' and self.fecha_documento:
-            self.valvula.fecha_ultima_calibracion = self.fecha_documento
-            self.valvula.save(update_fields=['fecha_ultima_calibracion', 'fecha_actualizacion'])
+        Args:
+            pruebas: queryset a agrupar (p. ej. filtrado por fecha o empresa);
+                por defecto todas las pruebas
         
-        elif self.tipo_documento in ['mantenimiento', 'reparacion'] and self.fecha_documento:
-            self.valvula.fecha_ultimo_servicio = self.fecha_documento
-            self.valvula.save(update_fields=['fecha_ultimo_servicio', 'fecha_actualizacion'])
+        Returns:
+            queryset de diccionarios: valvula, pruebas, apertura_promedio_kpa,
+            apertura_desviacion_kpa, apertura_min_kpa, apertura_max_kpa, desde, hasta
+        """
+        pruebas = cls.objects.all() if pruebas is None else pruebas
+        return (
+            pruebas.filter(valvula__isnull=False, presion_apertura_kpa__isnull=False)
+            .values('valvula')
+            .annotate(
+                pruebas=Count('id'),
+                apertura_promedio_kpa=Avg('presion_apertura_kpa'),
+                apertura_desviacion_kpa=StdDev('presion_apertura_kpa', sample=True),
+                apertura_min_kpa=Min('presion_apertura_kpa'),
+                apertura_max_kpa=Max('presion_apertura_kpa'),
+                desde=Min('fecha'),
+                hasta=Max('fecha'),
+            )
+            .order_by('valvula')
+        )
+
+
+class TrabajoExtraccion(models.Model):
+    """
+    Trabajo de la cola de extracción (respaldada por la base de datos).
+    Un worker (``manage.py procesar_extracciones``) lo reclama, ejecuta la
+    extracción del Documento y lo reintenta con backoff si falla.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido (dead-letter)'),
+    ]
+    
+    documento = models.OneToOneField(Documento, on_delete=models.CASCADE, related_name='trabajo_extraccion')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    disponible_desde = models.DateTimeField(default=timezone.now, help_text="No se procesa antes de esta fecha (backoff)")
+    bloqueado_por = models.CharField(max_length=255, blank=True, help_text="Worker que está procesando el trabajo")
+    bloqueado_en = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    timeouts = models.PositiveIntegerField(default=0, help_text="Veces que la extracción superó el tiempo máximo")
+    ultimo_timeout = models.DateTimeField(null=True, blank=True)
+    
+    # Auditoría
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Trabajo de Extracción"
+        verbose_name_plural = "Trabajos de Extracción"
+        ordering = ['disponible_desde', 'id']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde']),
+        ]
+    
+    def __str__(self):
+        return f"Extracción documento {self.documento_id} ({self.get_estado_display()})"
+
+
+class MetricaExtraccion(models.Model):
+    """
+    Duración de cada etapa de la extracción de un Documento (ver
+    ``servicios.medicion``). Se guarda una por extracción para poder comparar
+    percentiles por etapa entre periodos (``manage.py metricas_etapas``).
+    """
+    ORIGEN_CHOICES = [
+        ('carga', 'Carga individual'),
+        ('cola', 'Cola de extracción'),
+        ('lote', 'Carga por lotes'),
+    ]
+    
+    documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='metricas_extraccion')
+    origen = models.CharField(max_length=20, choices=ORIGEN_CHOICES)
+    etapas = models.JSONField(default=dict, help_text="Milisegundos por etapa")
+    duracion_ms = models.FloatField(help_text="Duración total medida (ms)")
+    paginas = models.PositiveIntegerField(null=True, blank=True)
+    tamano_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    tipo_documento = models.CharField(max_length=20, blank=True)
+    backend = models.CharField(max_length=20, blank=True, help_text="Backend de texto del PDF")
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Métrica de Extracción"
+        verbose_name_plural = "Métricas de Extracción"
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"Extracción documento {self.documento_id}: {self.duracion_ms:.0f} ms"
 
 
 class Certificado(models.Model):
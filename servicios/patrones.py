@@ -0,0 +1,257 @@
+"""
+Registro de patrones regex de los extractores
+
+Cada patrón se compila una sola vez por proceso (``compilar``). Además se
+deriva de su inicio un conjunto de anclas literales (p. ej. ``Modelo`` o
+``Model`` en ``(?:Modelo|Model)[\\s:]*...``). ``IndiceAnclas`` ubica la primera
+aparición de cada ancla con ``str.find`` sobre el texto en minúsculas
+(calculado una vez por documento) y cada patrón se busca sólo desde esa
+posición, o se descarta sin recorrer el texto si ninguna de sus anclas aparece.
+
+Nota: una alternancia con todas las anclas en una sola regex sería "una
+pasada", pero el motor ``re`` prueba cada alternativa en cada posición y
+resulta varias veces más lento que las búsquedas del texto original.
+"""
+
+from functools import lru_cache
+import re
+from typing import Dict, FrozenSet, Optional, Tuple
+
+FLAGS_POR_DEFECTO = re.IGNORECASE | re.MULTILINE
+
+# Anclas más cortas aparecen en casi cualquier texto y no descartan nada
+LONGITUD_MINIMA_ANCLA = 2
+
+_METACARACTERES = set('.^$*+?{}[]()|\\')
+
+# Caracteres no ASCII del plano básico, para calcular equivalencias de mayúsculas
+_PLANO_BASICO = None
+
+
+class Patron:
+    """Patrón compilado con sus anclas literales"""
+
+    __slots__ = ('texto', 'regex', 'anclas')
+
+    def __init__(self, texto: str, flags: int = FLAGS_POR_DEFECTO):
+        self.texto = texto
+        self.regex = re.compile(texto, flags)
+        # Las anclas se buscan sin distinguir mayúsculas: sólo valen para patrones IGNORECASE
+        self.anclas = anclas_literales(texto) if flags & re.IGNORECASE else ()
+
+    def valor(self, match) -> str:
+        """Primer grupo capturado (o la coincidencia completa si no hay grupos)"""
+        return match.group(1) if self.regex.groups else match.group(0)
+
+    def __repr__(self):
+        return f'Patron({self.texto!r})'
+
+
+def _dividir_alternativas(expresion: str):
+    """Divide una expresión en sus alternativas de primer nivel (``|``)"""
+    alternativas, actual = [], []
+    profundidad, en_clase, i = 0, False, 0
+    while i < len(expresion):
+        c = expresion[i]
+        if c == '\\':
+            actual.append(expresion[i:i + 2])
+            i += 2
+            continue
+        if en_clase:
+            en_clase = c != ']'
+        elif c == '[':
+            en_clase = True
+        elif c == '(':
+            profundidad += 1
+        elif c == ')':
+            profundidad -= 1
+        elif c == '|' and profundidad == 0:
+            alternativas.append(''.join(actual))
+            actual = []
+            i += 1
+            continue
+        actual.append(c)
+        i += 1
+    alternativas.append(''.join(actual))
+    return alternativas
+
+
+def _cierre_grupo(expresion: str) -> int:
+    """Índice del paréntesis que cierra el grupo que abre en la posición 0"""
+    profundidad, en_clase, i = 0, False, 0
+    while i < len(expresion):
+        c = expresion[i]
+        if c == '\\':
+            i += 2
+            continue
+        if en_clase:
+            en_clase = c != ']'
+        elif c == '[':
+            en_clase = True
+        elif c == '(':
+            profundidad += 1
+        elif c == ')':
+            profundidad -= 1
+            if profundidad == 0:
+                return i
+        i += 1
+    return -1
+
+
+def _prefijo_literal(alternativa: str) -> str:
+    """Texto literal obligatorio con el que empieza una alternativa"""
+    literal = []
+    i = 0
+    while i < len(alternativa):
+        c = alternativa[i]
+        if c == '\\':
+            if i + 1 >= len(alternativa) or alternativa[i + 1].isalnum():
+                break  # \s, \d, \b... no son literales
+            caracter = alternativa[i + 1]
+            i += 2
+        elif c in _METACARACTERES:
+            break
+        else:
+            caracter = c
+            i += 1
+        siguiente = alternativa[i] if i < len(alternativa) else ''
+        if siguiente in ('*', '?', '{'):
+            break  # El carácter es opcional
+        literal.append(caracter)
+        if siguiente == '+':
+            break
+    return ''.join(literal)
+
+
+def _anclas_expresion(expresion: str) -> Optional[Tuple[str, ...]]:
+    anclas = []
+    for alternativa in _dividir_alternativas(expresion):
+        if alternativa.startswith('(?:') or (alternativa.startswith('(') and not alternativa.startswith('(?')):
+            cierre = _cierre_grupo(alternativa)
+            if cierre < 0 or alternativa[cierre + 1:cierre + 2] in ('*', '?', '{'):
+                return None
+            interior = alternativa[3 if alternativa.startswith('(?:') else 1:cierre]
+            sub = _anclas_expresion(interior)
+            if sub is None:
+                return None
+            anclas.extend(sub)
+        else:
+            prefijo = _prefijo_literal(alternativa)
+            if len(prefijo) < LONGITUD_MINIMA_ANCLA:
+                return None
+            anclas.append(prefijo)
+    return tuple(anclas)
+
+
+def anclas_literales(texto: str) -> Tuple[str, ...]:
+    """
+    Literales con los que necesariamente empieza cualquier coincidencia del patrón
+
+    Returns:
+        Tupla de anclas, o tupla vacía si el patrón no tiene un inicio literal
+        (p. ej. ``(\\d{1,2}...)``) y debe buscarse en todo el texto
+    """
+    return _anclas_expresion(texto) or ()
+
+
+@lru_cache(maxsize=None)
+def compilar(texto: str, flags: int = FLAGS_POR_DEFECTO) -> Patron:
+    """Compila un patrón una sola vez por proceso"""
+    return Patron(texto, flags)
+
+
+def compilar_todos(patrones, flags: int = FLAGS_POR_DEFECTO) -> Tuple[Patron, ...]:
+    return tuple(compilar(texto, flags) for texto in patrones)
+
+
+@lru_cache(maxsize=None)
+def _equivalentes_especiales(caracter: str) -> FrozenSet[str]:
+    """
+    Caracteres que ``re.IGNORECASE`` considera iguales a ``caracter`` pero que
+    ``str.lower`` no convierte en él (p. ej. 'ſ' para 's', 'ı' e 'İ' para 'i')
+    """
+    global _PLANO_BASICO
+    if _PLANO_BASICO is None:
+        _PLANO_BASICO = ''.join(map(chr, range(0x80, 0x10000)))
+    return frozenset(
+        x for x in re.findall(re.escape(caracter), _PLANO_BASICO, re.IGNORECASE)
+        if x.lower() != caracter.lower()
+    )
+
+
+def precalcular_equivalencias(lista_patrones):
+    """
+    Calcula de antemano las equivalencias de los caracteres de las anclas
+    (la primera búsqueda de cada carácter recorre el plano básico completo).
+    Lo usa el forkserver de la extracción aislada para que los procesos hijos
+    no repitan el cálculo en cada documento.
+    """
+    for patron in lista_patrones:
+        for ancla in patron.anclas:
+            for caracter in set(ancla.lower()):
+                _equivalentes_especiales(caracter)
+
+
+class IndiceAnclas:
+    """
+    Primera posición de cada ancla en un texto. Cada ancla se busca una sola
+    vez (al primer patrón que la usa) y el resultado se reutiliza.
+    """
+
+    def __init__(self, texto: str, minusculas: Optional[str] = None):
+        self.texto = texto
+        self.minusculas = texto.lower() if minusculas is None else minusculas
+        # Algunos caracteres cambian de longitud al pasar a minúsculas ('İ');
+        # en ese caso las posiciones no coinciden y no se usa el índice
+        self.valido = len(self.minusculas) == len(texto)
+        self._caracteres = None
+        self.posiciones: Dict[str, Optional[int]] = {}
+
+    def _posicion(self, ancla: str) -> Optional[int]:
+        clave = ancla.lower()
+        if clave not in self.posiciones:
+            if self._tiene_equivalentes(clave):
+                posicion = 0  # Puede aparecer escrita de otra forma: buscar en todo el texto
+            else:
+                posicion = self.minusculas.find(clave)
+                posicion = posicion if posicion >= 0 else None
+            self.posiciones[clave] = posicion
+        return self.posiciones[clave]
+
+    def _tiene_equivalentes(self, clave: str) -> bool:
+        especiales = set().union(*(_equivalentes_especiales(c) for c in set(clave)))
+        if not especiales:
+            return False
+        if self._caracteres is None:
+            self._caracteres = frozenset(self.texto)
+        return not especiales.isdisjoint(self._caracteres)
+
+    def inicio(self, patron: Patron) -> Optional[int]:
+        """
+        Posición desde la que tiene sentido buscar el patrón
+
+        Returns:
+            0 si el patrón no tiene anclas, la primera aparición de cualquiera
+            de sus anclas, o None si ninguna aparece en el texto
+        """
+        if not patron.anclas or not self.valido:
+            return 0
+        posiciones = [p for p in map(self._posicion, patron.anclas) if p is not None]
+        return min(posiciones) if posiciones else None
+
+
+def buscar(patrones, texto: str, indice: Optional[IndiceAnclas] = None):
+    """
+    Primera coincidencia del primer patrón que coincide (en orden de preferencia)
+
+    Returns:
+        (patron, match) o (None, None)
+    """
+    for patron in patrones:
+        inicio = indice.inicio(patron) if indice is not None else 0
+        if inicio is None:
+            continue
+        match = patron.regex.search(texto, inicio)
+        if match:
+            return patron, match
+    return None, None
@@ -0,0 +1,186 @@
+"""
+Revisión previa (pre-flight) de los archivos antes de extraer su texto
+
+Un archivo que no se puede extraer (otro tipo de archivo, PDF protegido con
+contraseña, sin páginas o escaneado sin capa de texto) se rechaza aquí en
+pocos milisegundos, en lugar de fallar dentro del parseo con un error
+genérico. La revisión va de lo más barato a lo más caro:
+
+1. Firma del encabezado: %PDF, zip (libro .xlsx) u otro tipo de archivo
+   (imagen, documento de Office antiguo...). Sólo se leen unos KB del
+   principio y del final del archivo (el trailer dice si está cifrado).
+2. Apertura con PDFium: sólo lee la tabla xref, no el contenido de las
+   páginas. Da la cantidad de páginas y los metadatos, y falla si el PDF
+   pide contraseña (un PDF con sólo contraseña de propietario se abre).
+3. Capa de texto: si las primeras páginas leídas por la detección no tienen
+   texto, el PDF es escaneado y se rechaza sin leer el resto
+   (``revisar_capa_texto``).
+
+``DocumentoRechazado`` es un ``ValueError`` con un ``codigo`` para que la
+cola y la carga por lotes no reintenten un archivo que siempre fallará.
+No depende de Django.
+"""
+
+import logging
+import os
+from typing import Dict, NamedTuple, Optional
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover - pypdfium2 está en requirements.txt
+    pdfium = None
+
+from servicios.backends_texto import fuente_en_disco
+from servicios.extractores_xlsx import FIRMA_ZIP
+from servicios.medicion import medir
+
+logger = logging.getLogger(__name__)
+
+FORMATO_PDF = 'pdf'
+FORMATO_XLSX = 'xlsx'
+
+# Bytes que se leen del principio y del final del archivo. La firma %PDF
+# puede venir después de basura inicial (se aceptan hasta 1KB, como los
+# lectores de PDF) y el diccionario del trailer está en los últimos KB.
+TAMANO_ENCABEZADO = 4096
+TAMANO_COLA = 4096
+MAXIMO_DESPLAZAMIENTO_FIRMA = 1024
+
+# Páginas en que se busca texto antes de declarar el PDF escaneado
+PAGINAS_MUESTRA_TEXTO = 3
+
+# Motivos de rechazo (``DocumentoRechazado.codigo``)
+RECHAZO_VACIO = 'vacio'
+RECHAZO_FORMATO = 'formato'
+RECHAZO_CIFRADO = 'cifrado'
+RECHAZO_SIN_PAGINAS = 'sin_paginas'
+RECHAZO_SIN_TEXTO = 'sin_texto'
+
+# Firmas de archivos que se suben por error en lugar del PDF
+FIRMAS_CONOCIDAS = (
+    (b'\xff\xd8\xff', 'una imagen JPEG'),
+    (b'\x89PNG', 'una imagen PNG'),
+    (b'II*\x00', 'una imagen TIFF'),
+    (b'MM\x00*', 'una imagen TIFF'),
+    (b'GIF8', 'una imagen GIF'),
+    (b'\xd0\xcf\x11\xe0', 'un documento de Office antiguo (.doc/.xls)'),
+    (b'{\\rtf', 'un documento RTF'),
+    (b'<', 'un documento HTML o XML'),
+)
+
+
+class DocumentoRechazado(ValueError):
+    """El archivo no se puede extraer; reintentar la extracción daría el mismo resultado"""
+
+    def __init__(self, codigo: str, mensaje: str):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+class Preflight(NamedTuple):
+    """Resultado de la revisión previa"""
+    formato: str                 # 'pdf' o 'xlsx'
+    paginas: Optional[int]       # None si PDFium no pudo abrir el archivo
+    cifrado: bool                # Trailer con /Encrypt (abierto sin contraseña)
+    metadata: Dict               # Sólo si se pidieron (``revisar(metadatos=True)``)
+
+
+def _leer_extremos(archivo):
+    """Primeros y últimos bytes del archivo (ruta o archivo abierto, que queda en su posición)"""
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as contenido:
+            return _leer_extremos(contenido)
+    posicion = archivo.tell()
+    try:
+        archivo.seek(0)
+        encabezado = archivo.read(TAMANO_ENCABEZADO)
+        tamano = archivo.seek(0, os.SEEK_END)
+        archivo.seek(max(tamano - TAMANO_COLA, len(encabezado)))
+        cola = archivo.read(TAMANO_COLA)
+    finally:
+        archivo.seek(posicion)
+    return encabezado, cola
+
+
+def _tipo_archivo(encabezado: bytes) -> str:
+    for firma, descripcion in FIRMAS_CONOCIDAS:
+        if encabezado.lstrip().startswith(firma):
+            return descripcion
+    return 'un archivo de otro tipo'
+
+
+def revisar(archivo, nombre: Optional[str] = None, metadatos: bool = False) -> Preflight:
+    """
+    Revisa el archivo antes de extraerlo
+
+    Args:
+        archivo: ruta o archivo abierto (queda en la posición en que estaba)
+        nombre: nombre para los mensajes de error
+        metadatos: leer también los metadatos del PDF (título, asunto...)
+
+    Returns:
+        ``Preflight``; un .xlsx sólo se reconoce por su firma
+
+    Raises:
+        DocumentoRechazado: archivo vacío, que no es PDF ni .xlsx, protegido
+            con contraseña, sin páginas o sin capa de texto
+    """
+    if nombre is None:
+        nombre = archivo if isinstance(archivo, (str, os.PathLike)) else getattr(archivo, 'name', None)
+    nombre = os.path.basename(os.fspath(nombre)) if isinstance(nombre, (str, os.PathLike)) else 'recibido'
+    with medir('preflight'):
+        encabezado, cola = _leer_extremos(archivo)
+        if not encabezado.strip():
+            raise DocumentoRechazado(RECHAZO_VACIO, f'El archivo {nombre} está vacío')
+        if encabezado.startswith(FIRMA_ZIP):
+            return Preflight(FORMATO_XLSX, None, False, {})
+        if b'%PDF-' not in encabezado[:MAXIMO_DESPLAZAMIENTO_FIRMA + 5]:
+            raise DocumentoRechazado(
+                RECHAZO_FORMATO,
+                f'El archivo {nombre} no es un PDF ni un libro .xlsx: '
+                f'parece {_tipo_archivo(encabezado)}',
+            )
+        # Los PDF linealizados repiten el trailer al principio
+        cifrado = b'/Encrypt' in cola or b'/Encrypt' in encabezado
+        if pdfium is None:
+            return Preflight(FORMATO_PDF, None, cifrado, {})
+
+        posicion = None if isinstance(archivo, (str, os.PathLike)) else archivo.tell()
+        try:
+            with fuente_en_disco(archivo) as fuente:
+                try:
+                    pdf = pdfium.PdfDocument(fuente)
+                except pdfium.PdfiumError as e:
+                    if getattr(e, 'err_code', None) == pdfium.raw.FPDF_ERR_PASSWORD:
+                        raise DocumentoRechazado(
+                            RECHAZO_CIFRADO, f'El PDF {nombre} está protegido con contraseña'
+                        )
+                    # PDF dañado: el backend de respaldo (pdfplumber) puede repararlo
+                    logger.info(f'PDFium no pudo abrir el archivo {nombre} en la revisión previa: {str(e)}')
+                    return Preflight(FORMATO_PDF, None, cifrado, {})
+                try:
+                    paginas = len(pdf)
+                    metadata = pdf.get_metadata_dict(skip_empty=True) if metadatos else {}
+                finally:
+                    pdf.close()
+        finally:
+            if posicion is not None:
+                archivo.seek(posicion)
+
+    if paginas == 0:
+        raise DocumentoRechazado(RECHAZO_SIN_PAGINAS, f'El PDF {nombre} no tiene páginas')
+    return Preflight(FORMATO_PDF, paginas, cifrado, metadata)
+
+
+def revisar_capa_texto(paginas, paginas_totales: int, nombre: Optional[str] = None):
+    """
+    Rechaza el PDF si las primeras páginas ya leídas no tienen texto
+    (documento escaneado). Con menos páginas leídas que la muestra no decide.
+    """
+    muestra = min(paginas_totales, PAGINAS_MUESTRA_TEXTO)
+    if muestra and len(paginas) >= muestra and not any(texto.strip() for texto in paginas[:muestra]):
+        nombre = os.path.basename(os.fspath(nombre)) if nombre else 'recibido'
+        raise DocumentoRechazado(
+            RECHAZO_SIN_TEXTO,
+            f'El PDF {nombre} no tiene capa de texto (documento escaneado): se necesita OCR para extraerlo',
+        )
@@ -0,0 +1,397 @@
+"""
+Pipeline de procesamiento de documentos subidos
+
+Detección de tipo, extracción de datos, llenado del Documento, enlace con la
+válvula y actualización de la hoja de vida. Se ejecuta fuera de la petición
+web desde la cola de extracción (ver ``servicios.cola``).
+
+El texto leído se guarda en ``CapaTexto``; ``reextraer_documento`` aplica los
+extractores actuales sobre ese texto sin volver a abrir el PDF.
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from servicios.aislamiento import aislamiento_activo, extraer_aislado, ruta_local
+from servicios.deduplicacion import buscar_original, payload_en_cache
+from servicios.extractors import (
+    VERSION_EXTRACTORES, detect_document_type, extraer_ruta, extraer_texto, resultado_extraccion,
+)
+from servicios.fechas import normalizar_fechas
+from servicios.medicion import medicion_extraccion, medir
+from servicios.models import CapaTexto, MetricaExtraccion, PruebaPresion
+from servicios.preflight import DocumentoRechazado
+
+logger = logging.getLogger(__name__)
+
+
+def aplicar_datos_extraidos(documento, doc_type, extracted_data, version=VERSION_EXTRACTORES):
+    """
+    Copia los datos extraídos al Documento (sin guardarlo)
+
+    Args:
+        documento: instancia de Documento
+        doc_type: tipo detectado ('calibracion', 'mantenimiento', ...)
+        extracted_data: diccionario retornado por ``extractor.extract()``
+        version: versión de los extractores que produjo los datos
+    """
+    documento.tipo_documento = doc_type
+    documento.version_extractor = version
+    documento.numero_documento = extracted_data.get('numero_documento', '')
+    documento.tecnico_responsable = extracted_data.get('tecnico_responsable', '')
+    documento.extraido_exitosamente = True
+    documento.error_extraccion = None
+    documento.fecha_extraccion_datos = timezone.now()
+
+    # guardar valores transitorios para creación de válvula
+    documento._modelo_extraido = extracted_data.get('modelo', '')
+    documento._marca_extraida = extracted_data.get('marca', '')
+    documento._tamaño_extraido = extracted_data.get('tamaño', '')
+
+    # Llenar campos según tipo de documento
+    if doc_type == 'calibracion':
+        documento.laboratorio = extracted_data.get('laboratorio') or None
+        # El laboratorio resuelve las fechas ambiguas (DD/MM o MM/DD)
+        with medir('fechas'):
+            fecha_emision, fecha_vencimiento = normalizar_fechas(
+                (extracted_data.get('fecha_emision'), extracted_data.get('fecha_vencimiento')),
+                documento.laboratorio,
+            )
+        documento.fecha_documento = fecha_emision or timezone.now().date()
+        documento.fecha_vencimiento = fecha_vencimiento
+        documento.presion_inicial = extracted_data.get('presion_inicial') or None
+        documento.presion_final = extracted_data.get('presion_final') or None
+        documento.temperatura = extracted_data.get('temperatura') or None
+        documento.resultado_calibracion = extracted_data.get('resultado') or None
+        documento.unidad_presion = extracted_data.get('unidad_presion') or None
+
+    elif doc_type in ('mantenimiento', 'reparacion'):
+        # Los extractores de informes entregan 'fecha_mantenimiento'
+        with medir('fechas'):
+            fecha_mantenimiento, proximo_mantenimiento = normalizar_fechas((
+                extracted_data.get('fecha_mantenimiento') or extracted_data.get('fecha_emision'),
+                extracted_data.get('proximo_mantenimiento'),
+            ))
+        documento.fecha_documento = fecha_mantenimiento or timezone.now().date()
+        documento.tipo_mantenimiento = extracted_data.get('tipo_mantenimiento') or None
+        documento.descripcion_trabajos = extracted_data.get('descripcion_trabajos') or None
+        documento.estado_valvula = extracted_data.get('estado_valvula') or None
+        documento.materiales_utilizados = extracted_data.get('materiales_utilizados') or None
+        documento.proximo_mantenimiento = proximo_mantenimiento
+        documento.duracion_horas = extracted_data.get('duracion_horas') or None
+
+
+def numero_serie_extraido(extracted_data):
+    """Número de serie de los datos extraídos (los extractores en inglés usan 'serial_number')"""
+    return extracted_data.get('numero_serie') or extracted_data.get('serial_number')
+
+
+# Campos del Documento que escribe el enlace con la válvula
+CAMPOS_ENLACE_VALVULA = ['valvula', 'similitud_valvula', 'revisar_valvula', 'fecha_actualizacion']
+
+
+def resolver_valvula(documento, extracted_data, mapa=None):
+    """
+    Auto-identifica (o crea) la válvula por número de serie o modelo y la
+    asigna a ``documento.valvula`` sin guardar el Documento: quien llama lo
+    escribe una sola vez, ya con su válvula, y después actualiza la hoja de
+    vida (``actualizar_fechas_hoja_vida``).
+    Los errores se registran pero no interrumpen el procesamiento.
+
+    Args:
+        mapa: ``MapaIdentidad`` de la carga por lotes (opcional)
+
+    Returns:
+        tuple(valvula|None, creada:bool)
+    """
+    numero_serie = numero_serie_extraido(extracted_data)
+    modelo = extracted_data.get('modelo')
+    if not (numero_serie or modelo):
+        return None, False
+
+    try:
+        # Savepoint: un error aquí no debe invalidar la transacción del guardado
+        with medir('valvula'), transaction.atomic():
+            valvula, fue_creada = documento.enlazar_valvula_por_numero_serie(
+                numero_serie=numero_serie,
+                modelo=modelo,
+                mapa=mapa,
+            )
+    except Exception as e:
+        logger.warning(f'Error al enlazar válvula: {str(e)}', exc_info=True)
+        # No interrumpir el flujo si hay error en auto-identificación
+        documento.valvula = None
+        documento.similitud_valvula, documento.revisar_valvula = None, False
+        if mapa is not None:
+            # El savepoint se revirtió: una válvula registrada ya no existe
+            mapa.limpiar()
+        return None, False
+
+    ident = numero_serie or modelo
+    if valvula is None:
+        logger.warning(f'No se creó la válvula "{ident}": el documento no tiene empresa')
+        return None, False
+    if fue_creada:
+        logger.info(f'Nueva válvula creada automáticamente: {ident}')
+    else:
+        logger.info(
+            f'Válvula identificada usando "{ident}": {valvula.marca} {valvula.modelo} '
+            f'(S/N {valvula.numero_serie})'
+        )
+    return valvula, fue_creada
+
+
+def enlazar_valvula(documento, extracted_data, mapa=None):
+    """
+    Enlaza la válvula de un Documento ya guardado (re-extracción): la
+    resuelve con ``resolver_valvula``, guarda sólo los campos del enlace y
+    actualiza la hoja de vida, todo en un savepoint.
+    Los errores se registran pero no interrumpen el procesamiento.
+
+    Args:
+        mapa: ``MapaIdentidad`` de la re-extracción por lotes (opcional)
+
+    Returns:
+        tuple(valvula|None, creada:bool)
+    """
+    try:
+        with transaction.atomic():
+            valvula, fue_creada = resolver_valvula(documento, extracted_data, mapa=mapa)
+            if valvula is None:
+                return None, False
+            with medir('guardado'):
+                documento.save(update_fields=CAMPOS_ENLACE_VALVULA)
+                documento.actualizar_fechas_hoja_vida()
+        return valvula, fue_creada
+    except Exception as e:
+        logger.warning(f'Error al guardar el enlace de la válvula: {str(e)}', exc_info=True)
+        documento.valvula = None
+        documento.similitud_valvula, documento.revisar_valvula = None, False
+        if mapa is not None:
+            mapa.limpiar()
+        return None, False
+
+
+def guardar_capa_texto(documento, capa):
+    """
+    Guarda (o reemplaza) la capa de texto del Documento
+
+    Args:
+        capa: diccionario de ``capa_texto.capa_de_parseado`` (None: no hay
+            texto que guardar, p. ej. un libro .xlsx)
+    """
+    if capa is None:
+        return
+    with medir('guardado'):
+        CapaTexto.objects.update_or_create(documento=documento, defaults=capa)
+
+
+def pruebas_de_documento(documento, extracted_data):
+    """
+    Pruebas de presión (sin guardar) de las filas de ``extracted_data['pruebas']``
+
+    Returns:
+        Lista de ``PruebaPresion``, o None si los datos no traen la tabla
+        (libros .xlsx, re-extracción desde la capa de texto sin tabla anterior)
+    """
+    filas = extracted_data.get('pruebas')
+    if filas is None:
+        return None
+    pruebas = []
+    for indice, fila in enumerate(filas, start=1):
+        numero = fila.get('prueba') or ''
+        pruebas.append(PruebaPresion(
+            documento=documento,
+            valvula_id=documento.valvula_id,
+            fecha=documento.fecha_documento,
+            numero=int(numero) if numero.isdigit() and int(numero) < 32768 else indice,
+            presion_set=fila.get('presion_set'),
+            presion_apertura=fila.get('presion_apertura'),
+            presion_cierre=fila.get('presion_cierre'),
+            prueba_fugas=fila.get('prueba_fugas'),
+            unidad_presion=fila.get('unidad') or documento.unidad_presion,
+            temperatura=fila.get('temperatura'),
+        ))
+    return pruebas
+
+
+def guardar_pruebas(documento, extracted_data):
+    """
+    Reemplaza las pruebas de presión del Documento (``bulk_create``). Se llama
+    después de enlazar la válvula, que se copia en cada prueba.
+    """
+    pruebas = pruebas_de_documento(documento, extracted_data)
+    if pruebas is None:
+        return
+    with medir('guardado'), transaction.atomic():
+        PruebaPresion.objects.filter(documento=documento).delete()
+        PruebaPresion.objects.bulk_create(pruebas)
+
+
+def capa_de_documento(documento):
+    """Capa de texto guardada de un Documento como diccionario (o None)"""
+    capa = CapaTexto.objects.filter(documento=documento).first()
+    if capa is None:
+        return None
+    return {
+        campo: getattr(capa, campo)
+        for campo in ('texto_comprimido', 'paginas', 'paginas_totales', 'backend', 'version_extractor', 'tamano_texto')
+    }
+
+
+def guardar_metricas(medicion):
+    """
+    Guarda la medición por etapas de un Documento (``al_terminar`` de
+    ``medicion_extraccion``). Un error aquí no interrumpe el procesamiento.
+    """
+    documento = medicion.documento
+    if documento is None or documento.pk is None:
+        return
+    try:
+        with transaction.atomic():
+            MetricaExtraccion.objects.create(
+                documento=documento,
+                origen=medicion.origen or 'cola',
+                etapas=medicion.como_dict()['etapas'],
+                duracion_ms=round(medicion.duracion * 1000, 3),
+                paginas=medicion.paginas,
+                tamano_bytes=medicion.tamano_bytes,
+                tipo_documento=medicion.tipo_documento or documento.tipo_documento or '',
+                backend=medicion.backend or '',
+            )
+    except Exception as e:
+        logger.warning(f'No se pudieron guardar las métricas del documento {documento.pk}: {str(e)}')
+
+
+def procesar_documento(documento):
+    """
+    Ejecuta la extracción completa sobre el archivo ya almacenado del Documento.
+    Lanza excepción si el archivo no se puede leer o procesar
+    (``ExtraccionExcedida`` si supera el tiempo o la memoria máximos,
+    ``DocumentoRechazado`` si la revisión previa lo descarta).
+    La duración de cada etapa se guarda en ``MetricaExtraccion``.
+    """
+    with medicion_extraccion('cola', al_terminar=guardar_metricas) as medicion:
+        medicion.documento = documento
+        return _procesar_documento(documento, medicion)
+
+
+def _procesar_documento(documento, medicion):
+    if medicion.tamano_bytes is None:
+        try:
+            medicion.anotar(tamano_bytes=documento.archivo_pdf.size)
+        except (OSError, ValueError):
+            pass
+
+    # Un archivo idéntico ya extraído evita volver a parsear el PDF
+    original = buscar_original(documento.hash_contenido, excluir=documento)
+    cache = payload_en_cache(original)
+    if cache is not None:
+        doc_type, extracted_data = cache
+        confianza = original.datos_extraidos.get('confianza')
+        version = original.version_extractor
+        capa = capa_de_documento(original)
+        logger.info(f'Reutilizando extracción de un documento idéntico (sha256={documento.hash_contenido})')
+    else:
+        if aislamiento_activo():
+            # En un proceso hijo con tiempo y memoria máximos (ver servicios.aislamiento)
+            with ruta_local(documento.archivo_pdf) as ruta, medir('aislamiento'):
+                resultado = extraer_aislado(ruta)
+                # Las etapas del hijo se descuentan: 'aislamiento' es el costo del proceso
+                medicion.agregar(resultado.get('metricas'))
+            if resultado.get('rechazo'):
+                raise DocumentoRechazado(resultado['rechazo'], resultado['error'])
+            if resultado['error']:
+                raise ValueError(resultado['error'])
+        else:
+            with documento.archivo_pdf.open('rb') as pdf_file:
+                doc_type, extractor = detect_document_type(pdf_file)
+                resultado = resultado_extraccion(doc_type, extractor, extractor.extract())
+        doc_type, confianza, extracted_data = resultado['tipo'], resultado['confianza'], resultado['datos']
+        version, capa = resultado['version'], resultado['capa_texto']
+        logger.info(f'Tipo detectado: {doc_type} (confianza {confianza})')
+
+    logger.info(
+        f"Datos extraídos: numero_documento={extracted_data.get('numero_documento')}, "
+        f"serie={extracted_data.get('numero_serie')}, modelo={extracted_data.get('modelo')}"
+    )
+
+    aplicar_datos_extraidos(documento, doc_type, extracted_data, version)
+    documento.datos_extraidos = {'tipo': doc_type, 'confianza': confianza, 'datos': extracted_data}
+    documento.estado_procesamiento = 'completado'
+    # Una transacción: la válvula se resuelve primero y el Documento se
+    # escribe una sola vez, ya con su válvula
+    with transaction.atomic():
+        resolver_valvula(documento, extracted_data)
+        with medir('guardado'):
+            documento.save()
+            documento.actualizar_fechas_hoja_vida()
+        guardar_capa_texto(documento, capa)
+        guardar_pruebas(documento, extracted_data)
+    logger.info(f'Documento procesado exitosamente: ID={documento.id}, Tipo={doc_type}')
+    return documento
+
+
+def reextraer(documento, releer_incompletas=False, releer_archivo=False):
+    """
+    Resultado de los extractores actuales para un Documento ya procesado.
+    Con capa de texto sólo se ejecutan la clasificación y los patrones sobre el
+    texto guardado; sin ella (libros .xlsx, documentos anteriores a la capa) se
+    vuelve a leer el archivo y el resultado trae la capa para guardarla.
+
+    Args:
+        releer_incompletas: volver a leer el archivo si la lectura por páginas
+            se detuvo antes del final (un patrón nuevo puede necesitar las
+            páginas que no se guardaron)
+        releer_archivo: leer el archivo aunque haya capa de texto (las tablas
+            de pruebas se leen de la disposición del PDF, no del texto)
+
+    Returns:
+        El mismo diccionario que ``extractors.extraer_ruta``
+    """
+    capa = None if releer_archivo else CapaTexto.objects.filter(documento=documento).first()
+    if capa is not None and (capa.completo or not releer_incompletas):
+        return extraer_texto(capa.paginas_texto(), capa.paginas_totales, capa.backend)
+    # Al volver a leer se lee el archivo completo para que la nueva capa lo tenga entero
+    with ruta_local(documento.archivo_pdf) as ruta:
+        if aislamiento_activo():
+            return extraer_aislado(ruta, por_paginas=False)
+        return extraer_ruta(ruta, por_paginas=False)
+
+
+def aplicar_reextraccion(documento, resultado):
+    """
+    Copia al Documento el resultado de ``reextraer`` (sin guardarlo).
+    Lanza ValueError si la extracción falló: el documento conserva sus datos.
+    Un resultado desde la capa de texto no trae las tablas de pruebas: se
+    conservan las que ya tenía el documento (también en ``resultado['datos']``).
+    """
+    if resultado['error']:
+        raise ValueError(resultado['error'])
+    anteriores = (documento.datos_extraidos or {}).get('datos') or {}
+    if 'pruebas' not in resultado['datos'] and 'pruebas' in anteriores:
+        resultado['datos'] = dict(resultado['datos'], pruebas=anteriores['pruebas'])
+    aplicar_datos_extraidos(documento, resultado['tipo'], resultado['datos'], resultado['version'])
+    documento.datos_extraidos = {
+        'tipo': resultado['tipo'], 'confianza': resultado['confianza'], 'datos': resultado['datos'],
+    }
+    documento.estado_procesamiento = 'completado'
+
+
+def reextraer_documento(documento, releer_incompletas=False, releer_archivo=False):
+    """
+    Vuelve a extraer un Documento con la versión actual de los extractores y
+    guarda el resultado. La válvula sólo se enlaza si el documento no tenía una.
+    """
+    resultado = reextraer(documento, releer_incompletas, releer_archivo)
+    aplicar_reextraccion(documento, resultado)
+    with transaction.atomic():
+        if documento.valvula_id is None:
+            resolver_valvula(documento, resultado['datos'])
+        documento.save()
+        documento.actualizar_fechas_hoja_vida()
+        guardar_capa_texto(documento, resultado.get('capa_texto'))
+        guardar_pruebas(documento, resultado['datos'])
+    return documento
@@ -0,0 +1,289 @@
+"""
+Re-extracción masiva de documentos ya procesados
+
+Vuelve a ejecutar los extractores actuales sobre documentos antiguos (con
+error o extraídos con una versión anterior de los patrones). Los documentos
+se recorren por id (paginación por clave, sin OFFSET) en lotes: cada lote se
+extrae en un pool de procesos, se guarda con ``bulk_update`` en una
+transacción y deja un punto de control para reanudar una ejecución
+interrumpida (``manage.py reextract``).
+
+Con capa de texto (``CapaTexto``) sólo se ejecutan la clasificación y los
+patrones sobre el texto guardado; los documentos sin capa (libros .xlsx,
+anteriores a la capa) vuelven a leer su archivo completo y guardan su capa.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time as reloj
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from servicios.aislamiento import (
+    ExtraccionExcedida, aislamiento_activo, contexto_procesos, extraer_aislado, ignorar_interrupcion,
+)
+from servicios.backends_texto import TAMANO_BLOQUE_SPOOL
+from servicios.extractors import extraer_capa, extraer_ruta
+from servicios.models import CapaTexto, Documento, PruebaPresion
+from servicios.procesamiento import (
+    aplicar_reextraccion, enlazar_valvula, numero_serie_extraido, pruebas_de_documento,
+)
+from valvulas.identidad import MapaIdentidad
+
+logger = logging.getLogger(__name__)
+
+# Campos del Documento que escribe ``aplicar_reextraccion`` (``bulk_update`` agrega las columnas en kPa y °C)
+CAMPOS_REEXTRACCION = [
+    'tipo_documento', 'version_extractor', 'numero_documento', 'tecnico_responsable',
+    'extraido_exitosamente', 'error_extraccion', 'fecha_extraccion_datos', 'fecha_documento',
+    'fecha_vencimiento', 'presion_inicial', 'presion_final', 'temperatura', 'resultado_calibracion',
+    'laboratorio', 'unidad_presion', 'tipo_mantenimiento', 'descripcion_trabajos', 'estado_valvula',
+    'materiales_utilizados', 'proximo_mantenimiento', 'duracion_horas', 'datos_extraidos', 'estado_procesamiento',
+    'fecha_actualizacion',
+]
+
+
+def seleccionar_documentos(tipo=None, desde=None, hasta=None, empresa=None, version_menor_que=None,
+                           solo_fallidos=False, campos_vacios=False):
+    """
+    Documentos a re-extraer. Los que están en la cola ('pendiente' o
+    'procesando') se excluyen: los procesa el worker.
+
+    Args:
+        tipo: tipo de documento
+        desde, hasta: rango de fechas de carga (``date``, inclusive)
+        empresa: id de la empresa de la válvula
+        version_menor_que: sólo extraídos con una versión anterior (o sin versión)
+        solo_fallidos: sólo los que no se extrajeron
+        campos_vacios: sólo los que no tienen número de documento o válvula
+            (con ``solo_fallidos`` se toman los que cumplan cualquiera de los dos)
+    """
+    documentos = Documento.objects.exclude(estado_procesamiento__in=['pendiente', 'procesando'])
+    documentos = documentos.exclude(archivo_pdf='')
+    if tipo:
+        documentos = documentos.filter(tipo_documento=tipo)
+    if desde:
+        documentos = documentos.filter(fecha_creacion__gte=timezone.make_aware(datetime.combine(desde, time.min)))
+    if hasta:
+        fin = datetime.combine(hasta + timedelta(days=1), time.min)
+        documentos = documentos.filter(fecha_creacion__lt=timezone.make_aware(fin))
+    if empresa:
+        documentos = documentos.filter(Q(valvula__empresa_id=empresa) | Q(servicio__valvula__empresa_id=empresa))
+    if version_menor_que is not None:
+        documentos = documentos.filter(
+            Q(version_extractor__isnull=True) | Q(version_extractor__lt=version_menor_que)
+        )
+    pendientes = Q()
+    if solo_fallidos:
+        pendientes |= Q(extraido_exitosamente=False)
+    if campos_vacios:
+        pendientes |= Q(numero_documento__isnull=True) | Q(numero_documento='') | Q(valvula__isnull=True)
+    if pendientes:
+        documentos = documentos.filter(pendientes)
+    return documentos
+
+
+def _reextraer_aislado(ruta):
+    """Lectura completa del archivo en un proceso hijo con límites (desde un hilo)"""
+    try:
+        return extraer_aislado(ruta, por_paginas=False)
+    except ExtraccionExcedida as e:
+        return {'tipo': None, 'confianza': None, 'datos': {}, 'error': str(e), 'capa_texto': None}
+
+
+def _ruta_archivo(documento, directorio):
+    """Ruta en disco del archivo; si el almacenamiento no es local se copia al directorio"""
+    try:
+        ruta = documento.archivo_pdf.path
+    except NotImplementedError:
+        ruta = None
+    if ruta and os.path.isfile(ruta):
+        return ruta
+    ruta = os.path.join(directorio, f'{documento.pk}{os.path.splitext(documento.archivo_pdf.name)[1]}')
+    with open(ruta, 'wb') as destino, documento.archivo_pdf.open('rb') as origen:
+        shutil.copyfileobj(origen, destino, TAMANO_BLOQUE_SPOOL)
+    return ruta
+
+
+class _Lote:
+    """Documentos de un lote enviados a extraer y sus resultados pendientes"""
+
+    def __init__(self, documentos, procesos, hilos, releer_incompletas, releer_archivos):
+        self.documentos = documentos
+        self.directorio = tempfile.TemporaryDirectory(prefix='reextraccion_')
+        self.futuros = []
+        # Documentos cuyo archivo no se pudo leer: {id: error}
+        self.sin_archivo = {}
+        for documento in documentos:
+            capa = None if releer_archivos else getattr(documento, 'capa_texto', None)
+            if capa is not None and (capa.completo or not releer_incompletas):
+                # bytes(): el BinaryField puede llegar como memoryview (no serializable)
+                self.futuros.append(procesos.submit(
+                    extraer_capa, bytes(capa.texto_comprimido), capa.paginas_totales, capa.backend,
+                ))
+                continue
+            try:
+                ruta = _ruta_archivo(documento, self.directorio.name)
+            except (OSError, ValueError) as e:
+                self.futuros.append(None)
+                self.sin_archivo[documento.pk] = str(e)
+                continue
+            # Documentos sin capa de texto: lectura completa del archivo
+            if aislamiento_activo():
+                self.futuros.append(hilos.submit(_reextraer_aislado, ruta))
+            else:
+                self.futuros.append(procesos.submit(extraer_ruta, ruta, por_paginas=False))
+
+    def resultados(self):
+        try:
+            for documento, futuro in zip(self.documentos, self.futuros):
+                if futuro is None:
+                    error = f'Archivo no disponible: {self.sin_archivo[documento.pk]}'
+                    yield documento, {'tipo': None, 'confianza': None, 'datos': {}, 'error': error}
+                    continue
+                try:
+                    yield documento, futuro.result()
+                except Exception as e:
+                    yield documento, {'tipo': None, 'confianza': None, 'datos': {}, 'error': str(e)}
+        finally:
+            self.directorio.cleanup()
+
+
+def _lotes(documentos, desde_id, tamano_lote):
+    """Páginas del queryset por id ascendente a partir de ``desde_id`` (sin OFFSET)"""
+    ultimo = desde_id
+    while True:
+        lote = list(documentos.filter(pk__gt=ultimo).select_related('capa_texto').order_by('pk')[:tamano_lote])
+        if not lote:
+            return
+        yield lote
+        ultimo = lote[-1].pk
+
+
+def _guardar_lote(lote, mapa):
+    """
+    Aplica los resultados de un lote: ``bulk_update`` de los documentos y
+    ``bulk_create`` de las capas nuevas en una transacción; después enlaza las
+    válvulas que faltan (las del lote se traen en una consulta, ver
+    ``MapaIdentidad``), actualiza la hoja de vida de las válvulas de todos los
+    documentos y reemplaza las pruebas de presión (``bulk_create``).
+
+    Returns:
+        dict con 'ultimo_id', 'procesados', 'actualizados', 'cambiados', 'errores'
+    """
+    actualizados, capas, errores, cambiados = [], [], [], 0
+    ahora = timezone.now()
+    for documento, resultado in lote.resultados():
+        anteriores = (documento.datos_extraidos or {}).get('datos')
+        try:
+            aplicar_reextraccion(documento, resultado)
+        except ValueError as e:
+            logger.warning(f'Re-extracción del documento {documento.pk} fallida: {str(e)}')
+            errores.append({'documento_id': documento.pk, 'error': str(e)})
+            continue
+        if resultado['datos'] != anteriores:
+            cambiados += 1
+        # bulk_update no aplica auto_now
+        documento.fecha_actualizacion = ahora
+        actualizados.append(documento)
+        if resultado.get('capa_texto'):
+            capas.append(CapaTexto(documento=documento, **resultado['capa_texto']))
+
+    with transaction.atomic():
+        Documento.objects.bulk_update(actualizados, CAMPOS_REEXTRACCION)
+        if capas:
+            # Las capas releídas reemplazan a las incompletas
+            CapaTexto.objects.filter(documento__in=[capa.documento for capa in capas]).delete()
+            CapaTexto.objects.bulk_create(capas)
+
+    mapa.precargar(
+        numero_serie_extraido(documento.datos_extraidos['datos'])
+        for documento in actualizados if documento.valvula_id is None
+    )
+    pruebas, con_tabla = [], []
+    for documento in actualizados:
+        if documento.valvula_id is None:
+            # Enlaza y actualiza la hoja de vida de la válvula
+            enlazar_valvula(documento, documento.datos_extraidos['datos'], mapa=mapa)
+        else:
+            # La fecha re-extraída puede ser más reciente que la de la válvula
+            documento.actualizar_fechas_hoja_vida()
+        filas = pruebas_de_documento(documento, documento.datos_extraidos['datos'])
+        if filas is not None:
+            con_tabla.append(documento.pk)
+            pruebas.extend(filas)
+    if con_tabla:
+        with transaction.atomic():
+            PruebaPresion.objects.filter(documento_id__in=con_tabla).delete()
+            PruebaPresion.objects.bulk_create(pruebas)
+
+    return {
+        'ultimo_id': lote.documentos[-1].pk,
+        'procesados': len(lote.documentos),
+        'actualizados': len(actualizados),
+        'cambiados': cambiados,
+        'errores': errores,
+    }
+
+
+def reextraer_documentos(documentos, desde_id=0, tamano_lote=200, max_workers=None, releer_incompletas=False,
+                         releer_archivos=False):
+    """
+    Re-extrae los documentos del queryset en orden de id. Mientras un lote se
+    guarda, el siguiente ya se está extrayendo en el pool.
+
+    Args:
+        documentos: queryset (ver ``seleccionar_documentos``)
+        desde_id: id del último documento procesado (para reanudar)
+        tamano_lote: documentos por ``bulk_update`` y por punto de control
+        max_workers: procesos de extracción (por defecto, núcleos)
+        releer_incompletas: volver a leer los archivos cuya capa de texto se
+            cortó en la lectura por páginas
+        releer_archivos: volver a leer todos los archivos aunque tengan capa
+            de texto (p. ej. para leer las tablas de pruebas)
+
+    Yields:
+        Resumen de cada lote guardado (ver ``_guardar_lote``), con 'duracion'
+        en segundos desde el inicio
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    mapa = MapaIdentidad()
+    inicio = reloj.monotonic()
+    # Los procesos sólo ejecutan funciones sin Django (``extractors``), con el
+    # mismo contexto que la extracción aislada (forkserver)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto_procesos(),
+                             initializer=ignorar_interrupcion) as procesos, \
+            ThreadPoolExecutor(max_workers=max_workers) as hilos:
+        anterior = None
+        for documentos_lote in _lotes(documentos, desde_id, tamano_lote):
+            lote = _Lote(documentos_lote, procesos, hilos, releer_incompletas, releer_archivos)
+            if anterior is not None:
+                yield dict(_guardar_lote(anterior, mapa), duracion=reloj.monotonic() - inicio)
+            anterior = lote
+        if anterior is not None:
+            yield dict(_guardar_lote(anterior, mapa), duracion=reloj.monotonic() - inicio)
+
+
+def leer_punto_control(ruta):
+    """Punto de control guardado (o None si no existe)"""
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return None
+
+
+def guardar_punto_control(ruta, datos):
+    """Escribe el punto de control de forma atómica (archivo temporal + rename)"""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
@@ -0,0 +1,214 @@
+"""
+Tablas de resultados de prueba de los certificados de calibración
+
+Los certificados en banco y con equipo VST (OYS-FO-43/44) traen las
+presiones de cada prueba (SET, apertura, cierre) en una tabla. Los patrones
+de texto sólo toman el primer número; aquí se lee la disposición de la tabla:
+
+1. Las páginas se eligen por el texto ya leído: sólo se leen las que
+   contienen un título del bloque de resultados, con el mismo PDF abierto
+   con que se leyó el texto (``leer_pruebas``).
+2. En esas páginas se ubican el título y la siguiente sección y sólo se
+   extraen las palabras del recuadro entre ambos, con su posición
+   (``palabras_recuadro`` del backend de texto).
+3. Las palabras se agrupan en filas por su posición vertical; las columnas
+   se toman de los encabezados y cada valor va a la columna bajo la que está.
+
+Con pypdfium2 la lectura de posiciones cuesta unos pocos milisegundos por
+página; el análisis completo de la página con pdfplumber (caracteres y
+objetos de disposición de pdfminer) es un orden de magnitud más lento y sólo
+se usa si ese es el backend del documento.
+
+Cada fila con un número es una prueba: {'prueba': '1', 'presion_set': '150',
+'presion_apertura': '151.5', 'presion_cierre': '139.5', 'unidad': 'psi'}
+(sólo con las columnas que tiene la tabla). No depende de Django.
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from servicios.backends_texto import LectorPDF, fuente_en_disco, obtener_backend
+from servicios.medicion import medir
+
+logger = logging.getLogger(__name__)
+
+# Títulos que abren el bloque de resultados (en minúsculas)
+ANCLAS_INICIO = (
+    'resultados de calibración', 'resultados de calibracion', 'resultados de prueba',
+    'resultados de las pruebas', 'calibration results', 'test results',
+)
+PATRON_INICIO = re.compile('|'.join(re.escape(ancla) for ancla in ANCLAS_INICIO), re.IGNORECASE)
+# Textos que cierran el bloque (la siguiente sección o las notas al pie)
+ANCLAS_FIN = re.compile(
+    r'secci[oó]n\s+\d|section\s+\d|observaciones|remarks|la incertidumbre|the expanded uncertainty'
+    r'|t[eé]cnico\s*:|technician\s*:|los resultados de conformidad',
+    re.IGNORECASE,
+)
+
+# Columna de la tabla según las palabras de su encabezado, en el orden de las filas
+COLUMNAS = (
+    ('prueba', ('prueba', 'ensayo', 'run', 'n°', 'nº', '#')),
+    ('presion_set', ('set', 'ajuste', 'calibración', 'calibracion')),
+    ('presion_apertura', ('apertura', 'escape', 'disparo', 'popping', 'pop', 'simmer')),
+    ('presion_cierre', ('cierre', 'reasiento', 'reasentamiento', 'reseat', 'closing')),
+    ('prueba_fugas', ('fugas', 'fuga', 'hermeticidad', 'estanqueidad', 'leak', 'leakage', 'seat')),
+    ('temperatura', ('temperatura', 'temperature', 'temp')),
+    ('incertidumbre', ('incertidumbre', 'uncertainty')),
+    ('unidad', ('unidad', 'unidades', 'unit', 'units')),
+    ('resultado', ('conformidad', 'resultado', 'result', 'conformity')),
+)
+
+# Palabras a menos de esta distancia vertical (pt) están en la misma fila
+TOLERANCIA_FILA = 3
+# Palabras del encabezado más cercanas que esto (pt) son de la misma celda
+SEPARACION_CELDA = 12
+
+_NUMERO = re.compile(r'^[-+]?\d+(?:[.,]\d+)?$')
+_UNIDAD_ENCABEZADO = re.compile(r'\(\s*(psi[ga]?|bar[ga]?|kpa|mpa|kg/cm2|kg/cm²|atm)\s*\)', re.IGNORECASE)
+
+
+def paginas_con_resultados(paginas_texto: Iterable[str]) -> List[int]:
+    """Índices de las páginas cuyo texto contiene un título del bloque de resultados"""
+    return [
+        indice for indice, texto in enumerate(paginas_texto)
+        if any(ancla in texto.lower() for ancla in ANCLAS_INICIO)
+    ]
+
+
+def _columna(texto: str) -> Optional[str]:
+    palabras = re.findall(r'[^\s()]+', texto.lower())
+    for campo, claves in COLUMNAS:
+        if any(clave in palabras for clave in claves):
+            return campo
+    return None
+
+
+def _filas(palabras: List[Dict]) -> List[List[Dict]]:
+    """Agrupa las palabras en filas (por ``top``) ordenadas de izquierda a derecha"""
+    filas = []
+    for palabra in sorted(palabras, key=lambda p: (p['top'], p['x0'])):
+        if filas and abs(palabra['top'] - filas[-1][0]['top']) <= TOLERANCIA_FILA:
+            filas[-1].append(palabra)
+        else:
+            filas.append([palabra])
+    return [sorted(fila, key=lambda p: p['x0']) for fila in filas]
+
+
+def _celdas_encabezado(filas: List[List[Dict]]) -> List[Tuple[float, float, str]]:
+    """Celdas del encabezado (x0, x1, texto); un encabezado puede ocupar varias filas"""
+    celdas = []
+    for palabra in sorted((p for fila in filas for p in fila), key=lambda p: p['x0']):
+        if celdas and palabra['x0'] - celdas[-1][1] <= SEPARACION_CELDA:
+            x0, x1, texto = celdas[-1]
+            celdas[-1] = (x0, max(x1, palabra['x1']), f'{texto} {palabra["text"]}')
+        else:
+            celdas.append((palabra['x0'], palabra['x1'], palabra['text']))
+    return celdas
+
+
+def _es_fila_datos(fila: List[Dict]) -> bool:
+    return any(_NUMERO.match(palabra['text']) for palabra in fila)
+
+
+def leer_tabla(palabras: List[Dict]) -> List[Dict]:
+    """
+    Filas de prueba de las palabras de la región recortada
+
+    Args:
+        palabras: resultado de ``extract_words`` (x0, x1, top, text)
+    """
+    filas = _filas(palabras)
+    # Encabezado: desde la primera fila con nombres de columna hasta la primera fila con números
+    inicio = next((i for i, fila in enumerate(filas)
+                   if sum(1 for celda in _celdas_encabezado([fila]) if _columna(celda[2])) >= 2), None)
+    if inicio is None:
+        return []
+    fin = next((i for i in range(inicio + 1, len(filas)) if _es_fila_datos(filas[i])), len(filas))
+
+    columnas, unidad_encabezado = [], None
+    for x0, x1, texto in _celdas_encabezado(filas[inicio:fin]):
+        campo = _columna(texto)
+        if campo is not None and all(campo != c for _, _, c in columnas):
+            columnas.append((x0, x1, campo))
+        unidad = _UNIDAD_ENCABEZADO.search(texto)
+        if unidad:
+            unidad_encabezado = unidad.group(1)
+    if not columnas:
+        return []
+
+    pruebas = []
+    for fila in filas[fin:]:
+        if not _es_fila_datos(fila):
+            break
+        valores = {}
+        for palabra in fila:
+            centro = (palabra['x0'] + palabra['x1']) / 2
+            # La columna que contiene el centro de la palabra, o la más cercana
+            _, _, campo = min(
+                columnas,
+                key=lambda c: 0 if c[0] <= centro <= c[1] else min(abs(centro - c[0]), abs(centro - c[1])),
+            )
+            valores[campo] = f'{valores[campo]} {palabra["text"]}' if campo in valores else palabra['text']
+        # Sin columna de número de prueba se numeran en orden; la unidad puede
+        # venir en el encabezado ("Presión SET (psi)")
+        valores.setdefault('prueba', str(len(pruebas) + 1))
+        if unidad_encabezado:
+            valores.setdefault('unidad', unidad_encabezado)
+        presentes = {c for _, _, c in columnas} | set(valores)
+        pruebas.append({campo: valores.get(campo) for campo, _ in COLUMNAS if campo in presentes})
+    return pruebas
+
+
+def leer_pruebas(lector: LectorPDF, paginas_texto: Iterable[str]) -> List[Dict]:
+    """
+    Filas de las tablas de resultados de prueba de un PDF ya abierto
+
+    Args:
+        lector: PDF abierto por el backend con que se leyó el texto
+        paginas_texto: texto ya leído de cada página, para leer sólo las que
+            tienen el bloque de resultados
+
+    Returns:
+        Lista de pruebas (ver el módulo); vacía si no hay tabla o no se pudo leer
+    """
+    indices = paginas_con_resultados(paginas_texto)
+    pruebas = []
+    if not indices:
+        return pruebas
+    with medir('tablas'):
+        try:
+            for indice in indices:
+                if indice < lector.num_paginas:
+                    pruebas.extend(leer_tabla(lector.palabras_recuadro(indice, PATRON_INICIO, ANCLAS_FIN)))
+        except Exception as e:
+            logger.warning(f'No se pudo leer la tabla de resultados: {str(e)}')
+    return pruebas
+
+
+def extraer_pruebas(pdf_file, paginas_texto: Iterable[str], backend: Optional[str] = None) -> List[Dict]:
+    """
+    Filas de las tablas de resultados de prueba del PDF, abriéndolo de nuevo
+    (ver ``leer_pruebas`` para el PDF que ya está abierto)
+
+    Args:
+        pdf_file: PDF abierto (se deja en la posición 0)
+        paginas_texto: texto ya leído de cada página, para abrir sólo las que
+            tienen el bloque de resultados
+        backend: backend de texto con que se leyó el documento
+
+    Returns:
+        Lista de pruebas (ver el módulo); vacía si no hay tabla
+    """
+    paginas_texto = list(paginas_texto)
+    if not paginas_con_resultados(paginas_texto):
+        return []
+    try:
+        pdf_file.seek(0)
+        with fuente_en_disco(pdf_file) as fuente, obtener_backend(backend).abrir(fuente) as lector:
+            return leer_pruebas(lector, paginas_texto)
+    except Exception as e:
+        logger.warning(f'No se pudo leer la tabla de resultados: {str(e)}')
+        return []
+    finally:
+        pdf_file.seek(0)
@@ -0,0 +1,37 @@
+"""
+Manejadores de carga que calculan el SHA-256 del archivo mientras se recibe
+
+Cada bloque que llega del cliente se pasa por el hash antes de escribirse en
+memoria o en disco, así no hay que volver a leer el archivo para deduplicarlo.
+El resultado queda en el atributo ``sha256`` del archivo subido.
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashSHA256Mixin:
+    """Calcula el SHA-256 de los bloques recibidos y lo adjunta al archivo"""
+
+    def new_file(self, *args, **kwargs):
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        archivo = super().file_complete(file_size)
+        if archivo is not None:
+            archivo.sha256 = self._sha256.hexdigest()
+        return archivo
+
+
+class HashMemoryFileUploadHandler(HashSHA256Mixin, MemoryFileUploadHandler):
+    """Archivos pequeños (en memoria) con SHA-256"""
+
+
+class HashTemporaryFileUploadHandler(HashSHA256Mixin, TemporaryFileUploadHandler):
+    """Archivos grandes (en disco) con SHA-256"""
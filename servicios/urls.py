@@ -11,8 +11,11 @@ urlpatterns = [
     path('valvulas/', views.certificado_list, name='valvulas_list'),
     path('certificados/', views.certificado_list, name='certificado_list'),
     path('certificados/<int:pk>/', views.certificado_detail, name='certificado_detail'),
+    path('certificados/<int:pk>/estado/', views.estado_documento, name='estado_documento'),
     path('certificados/subir/', views.upload_certificado, name='upload_certificado'),
+    path('certificados/subir-lote/', views.upload_lote, name='upload_lote'),
     path('certificados/<int:pk>/eliminar/', views.eliminar_certificado, name='eliminar_certificado'),
+    path('extraccion/metricas/', views.metricas_extraccion, name='metricas_extraccion'),
 
     # Eliminar válvula (se utilizará desde el listado de válvulas)
     path('valvulas/<int:pk>/eliminar/', views.eliminar_valvula, name='eliminar_valvula'),
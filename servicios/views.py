@@ -1,59 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
+from django.http import JsonResponse
+from django.db.models import Count, Sum
 from django.utils import timezone
-from datetime import datetime
+from datetime import timedelta
 import logging
 
-from usuarios.decorators import requiere_comercial
-from servicios.models import Certificado, Documento, Servicio
+from usuarios.decorators import requiere_admin, requiere_comercial
+from servicios.models import Certificado, Documento, Servicio, TrabajoExtraccion
 from servicios.forms import CertificadoForm, DocumentoForm
-from servicios.extractors import extract_data, detect_document_type
+from servicios.extractors import extract_data
+from servicios.procesamiento import guardar_metricas
+from servicios.medicion import medicion_extraccion, medir
+from servicios.cola import encolar_documento, ejecutar_en_linea
+from servicios.ingesta import encolar_lote, ingestar_lote
+from servicios.deduplicacion import buscar_original, calcular_sha256, payload_en_cache
+from servicios.preflight import DocumentoRechazado, revisar
 
 logger = logging.getLogger(__name__)
 
 
-def _parse_date(date_str):
-    """
-    Intenta parsear una cadena de fecha a objeto date.
-    Soporta formatos comunes: DD/MM/YYYY, DD-MM-YYYY, YYYY-MM-DD, etc.
-    
-    Args:
-        date_str: String con la fecha a parsear
-        
-    Returns:
-        datetime.date object o None si no se puede parsear
-    """
-    if not date_str or not isinstance(date_str, str):
-        return None
-    
-    # Limpiar espacios
-    date_str = date_str.strip()
-    
-    # Formatos comunes a intentar (en orden de probabilidad)
-    formats = [
-        '%d/%m/%Y',      # 03/06/2025
-        '%d-%m-%Y',      # 03-06-2025
-        '%d.%m.%Y',      # 03.06.2025
-        '%Y-%m-%d',      # 2025-06-03
-        '%d/%m/%y',      # 03/06/25
-        '%d-%m-%y',      # 03-06-25
-        '%d %m %Y',      # 03 06 2025
-        '%m/%d/%Y',      # 06/03/2025 (formato US)
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).date()
-        except (ValueError, TypeError):
-            continue
-    
-    # Si no se puede parsear, registrar advertencia
-    logger.warning(f'No se pudo parsear fecha: "{date_str}". Se ignorará.')
-    return None
-
-
 def extract_pdf_data(pdf_file):
     """
     DEPRECATED: Usar extractors.extract_data() en su lugar
@@ -85,112 +55,74 @@ def upload_certificado(request):
                 messages.error(request, 'Servicio no encontrado o no tienes permisos.')
                 return redirect('servicios:certificado_list')
         
+        # Revisión previa (milisegundos): un archivo que no se puede extraer
+        # no se guarda ni se encola
         try:
-            # Detectar tipo de documento y extraer datos
-            doc_type, extractor = detect_document_type(pdf_file)
-            logger.info(f'Tipo detectado: {doc_type}')
-            
-            extracted_data = extractor.extract()
-            logger.info(
-                f"Datos extraídos: numero_documento={extracted_data.get('numero_documento')}, "
-                f"serie={extracted_data.get('numero_serie')}, modelo={extracted_data.get('modelo')}"
-            )
-            
-            # Crear documento con los datos extraídos
-            documento = Documento(
-                servicio=servicio,
-                usuario_comercial=request.user,
-                tipo_documento=doc_type,
-                archivo_pdf=pdf_file,
-                nombre_original=pdf_file.name,
-                numero_documento=extracted_data.get('numero_documento', ''),
-                tecnico_responsable=extracted_data.get('tecnico_responsable', ''),
-                extraido_exitosamente=True,
-                fecha_extraccion_datos=timezone.now(),
-            )
-            # guardar valores transitorios para creación de válvula
-            documento._modelo_extraido = extracted_data.get('modelo', '')
-            documento._marca_extraida = extracted_data.get('marca', '')
-            documento._tamaño_extraido = extracted_data.get('tamaño', '')
-            
-            # Llenar campos según tipo de documento
-            if doc_type == 'calibracion':
-                documento.fecha_documento = _parse_date(extracted_data.get('fecha_emision')) or timezone.now().date()
-                documento.fecha_vencimiento = _parse_date(extracted_data.get('fecha_vencimiento'))
-                documento.presion_inicial = extracted_data.get('presion_inicial') or None
-                documento.presion_final = extracted_data.get('presion_final') or None
-                documento.temperatura = extracted_data.get('temperatura') or None
-                documento.resultado_calibracion = extracted_data.get('resultado') or None
-                documento.laboratorio = extracted_data.get('laboratorio') or None
-                documento.unidad_presion = extracted_data.get('unidad_presion') or None
-            
-            elif doc_type == 'mantenimiento':
-                documento.fecha_documento = _parse_date(extracted_data.get('fecha_emision')) or timezone.now().date()
-                documento.tipo_mantenimiento = extracted_data.get('tipo_mantenimiento') or None
-                documento.descripcion_trabajos = extracted_data.get('descripcion_trabajos') or None
-                documento.estado_valvula = extracted_data.get('estado_valvula') or None
-                documento.materiales_utilizados = extracted_data.get('materiales_utilizados') or None
-                documento.proximo_mantenimiento = _parse_date(extracted_data.get('proximo_mantenimiento'))
-                documento.duracion_horas = extracted_data.get('duracion_horas') or None
+            revisar(pdf_file)
+        except DocumentoRechazado as e:
+            logger.warning(f'upload_certificado: archivo rechazado ({e.codigo}): {str(e)}')
+            messages.error(request, str(e))
+            return redirect('servicios:upload_certificado')
+        
+        try:
+            # Duración de cada etapa de la carga (ver servicios/medicion.py)
+            with medicion_extraccion('carga', al_terminar=guardar_metricas) as medicion:
+                # Guardar el archivo y dejar la extracción en cola: la petición
+                # retorna de inmediato y un worker procesa el documento
+                medicion.anotar(tamano_bytes=pdf_file.size)
+                with medir('hash'):
+                    hash_contenido = calcular_sha256(pdf_file)
+                original = buscar_original(hash_contenido)
+                documento = Documento(
+                    servicio=servicio,
+                    usuario_comercial=request.user,
+                    tipo_documento='otro',
+                    nombre_original=pdf_file.name,
+                    hash_contenido=hash_contenido,
+                )
+                if original is not None:
+                    # Archivo ya almacenado: se reutiliza en lugar de guardar otra copia
+                    documento.archivo_pdf.name = original.archivo_pdf.name
+                    logger.info(f'Archivo duplicado de documento ID={original.id} (sha256={hash_contenido})')
+                else:
+                    documento.archivo_pdf = pdf_file
+                with medir('guardado'):
+                    documento.save()
+                medicion.documento = documento
+                logger.info(f'Documento guardado: ID={documento.id}, archivo={pdf_file.name}')
             
-            # Guardar el documento inicial
-            documento.save()
-            documento_id = documento.id
-            logger.info(f'Documento guardado exitosamente: ID={documento_id}, Tipo={doc_type}')
+                # Con la extracción en caché no hay nada costoso que encolar
+                en_cache = payload_en_cache(original) is not None
             
-            # Auto-identificar válvula por número de serie o modelo y actualizar hoja de vida
-            numero_serie = extracted_data.get('numero_serie') or extracted_data.get('serial_number')
-            modelo = extracted_data.get('modelo')
-            if numero_serie or modelo:
-                try:
-                    valvula, fue_creada = documento.enlazar_valvula_por_numero_serie(
-                        numero_serie=numero_serie,
-                        modelo=modelo
+                if getattr(settings, 'EXTRACCION_ASINCRONA', True) and not en_cache:
+                    encolar_documento(documento)
+                    messages.success(
+                        request,
+                        f'Documento "{pdf_file.name}" recibido. La extracción de datos '
+                        f'se está procesando en segundo plano.'
                     )
-                    documento.save()  # Guardar la relación valvula
-
-                    ident = numero_serie or modelo
-                    logger.info(f'Válvula enlazada usando "{ident}": Creada={fue_creada}')
-
-                    # Actualizar fechas en la hoja de vida de la válvula
-                    documento.actualizar_fechas_hoja_vida()
-                    logger.info(f'Hoja de vida actualizada para válvula {ident}')
-
-                    if fue_creada:
-                        logger.info(f'Nueva válvula creada automáticamente: {ident}')
-                    else:
-                        logger.info(
-                            f'Válvula identificada: {valvula.marca} {valvula.modelo} ' \
-                            f'(S/N {valvula.numero_serie})'
-                        )
-                except Exception as e:
-                    logger.warning(f'Error al enlazar válvula: {str(e)}', exc_info=True)
-                    # No interrumpir el flujo si hay error en auto-identificación
+                    return redirect('servicios:certificado_detail', pk=documento.pk)
             
-            tipo_display = documento.get_tipo_documento_display()
-            numero_doc = documento.numero_documento or '(sin número)'
-            messages.success(
-                request,
-                f'{tipo_display} "{numero_doc}" subido y procesado exitosamente'
-            )
-            return redirect('servicios:certificado_list')
+                if ejecutar_en_linea(documento):
+                    documento.refresh_from_db()
+                    tipo_display = documento.get_tipo_documento_display()
+                    numero_doc = documento.numero_documento or '(sin número)'
+                    messages.success(
+                        request,
+                        f'{tipo_display} "{numero_doc}" subido y procesado exitosamente'
+                    )
+                else:
+                    documento.refresh_from_db()
+                    messages.error(
+                        request,
+                        f'Error al procesar el documento: {documento.error_extraccion}'
+                    )
+                return redirect('servicios:certificado_list')
         
         except Exception as e:
-            # Mejorar mensaje de error para problemas de extracción/validación
             error_msg = str(e)
-            
-            # Detectar errores de validación de fecha
-            if 'formato de fecha' in error_msg.lower() or 'dateformat' in error_msg.lower():
-                mensaje_error = (
-                    'Error al procesar fechas en el documento. '
-                    'Asegúrate de que el PDF contenga fechas válidas en formato DD-MM-YYYY. '
-                    'Puedes editar manualmente las fechas después de la carga.'
-                )
-            else:
-                mensaje_error = f'Error al procesar el documento: {error_msg}'
-            
             logger.error(f'Error en upload_certificado: {error_msg}', exc_info=True)
-            messages.error(request, mensaje_error)
+            messages.error(request, f'Error al guardar el documento: {error_msg}')
     
     # GET request - mostrar formulario
     servicios = Servicio.objects.none()
@@ -209,6 +141,65 @@ def upload_certificado(request):
     return render(request, 'servicios/upload_certificado.html', context)
 
 
+@requiere_comercial
+def upload_lote(request):
+    """
+    Carga por lotes: varios PDF o un ZIP con PDF en una sola petición.
+    Como la carga individual, sólo se guardan los documentos y cada uno queda
+    en la cola de extracción; la respuesta trae el id de cada documento para
+    consultar su estado (``estado_documento``). Sin EXTRACCION_ASINCRONA la
+    extracción se reparte en un pool de procesos dentro de la petición.
+    Se muestra un resumen por archivo (documento, tipo, válvula, errores).
+    """
+    resumenes = None
+    if request.method == 'POST':
+        archivos = request.FILES.getlist('archivos')
+        if not archivos:
+            messages.error(request, 'Por favor selecciona al menos un archivo PDF, XLSX o ZIP')
+            return redirect('servicios:upload_lote')
+        
+        servicio = None
+        servicio_id = request.POST.get('servicio_id')
+        if servicio_id:
+            try:
+                servicio = Servicio.objects.get(id=servicio_id, usuario_comercial=request.user)
+            except Servicio.DoesNotExist:
+                messages.error(request, 'Servicio no encontrado o no tienes permisos.')
+                return redirect('servicios:upload_lote')
+        
+        asincrona = getattr(settings, 'EXTRACCION_ASINCRONA', True)
+        if asincrona:
+            resumenes = encolar_lote(archivos, usuario=request.user, servicio=servicio)
+        else:
+            resumenes = ingestar_lote(archivos, usuario=request.user, servicio=servicio)
+        for resumen in resumenes:
+            if resumen['documento_id']:
+                resumen['estado_url'] = reverse('servicios:estado_documento', args=[resumen['documento_id']])
+        errores = sum(1 for resumen in resumenes if resumen['error'])
+        logger.info(f'upload_lote: {len(resumenes)} archivos, {errores} con error')
+        
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'resultados': resumenes,
+                'total': len(resumenes),
+                'errores': errores,
+                'documentos': [resumen['documento_id'] for resumen in resumenes if resumen['documento_id']],
+            })
+        
+        accion = 'recibidos; la extracción se procesa en segundo plano' if asincrona else 'procesados'
+        if errores:
+            messages.warning(request, f'{len(resumenes)} archivos {accion}, {errores} con error')
+        else:
+            messages.success(request, f'{len(resumenes)} archivos {accion}')
+    
+    context = {
+        'titulo': 'Carga por Lotes',
+        'descripcion': 'Sube varios certificados o informes (PDF, XLSX o ZIP) para extracción automática de datos',
+        'resumenes': resumenes,
+    }
+    return render(request, 'servicios/upload_lote.html', context)
+
+
 @login_required
 @login_required(login_url='usuarios:login')
 def certificado_list(request):
@@ -277,6 +268,71 @@ def certificado_detail(request, pk):
     return render(request, 'servicios/detalle_certificado.html', context)
 
 
+@login_required
+def estado_documento(request, pk):
+    """
+    Estado de procesamiento de un documento (JSON) para que la interfaz
+    consulte periódicamente mientras la extracción está en cola
+    """
+    documento = get_object_or_404(Documento.objects.select_related('trabajo_extraccion', 'valvula'), pk=pk)
+    
+    # Verificar permisos
+    if hasattr(request.user, 'perfil') and request.user.perfil.rol == 'comercial':
+        if documento.usuario_comercial != request.user:
+            return JsonResponse({'error': 'No tienes permiso para ver este documento'}, status=403)
+    
+    datos = {
+        'id': documento.id,
+        'estado': documento.estado_procesamiento,
+        'estado_display': documento.get_estado_procesamiento_display(),
+        'terminado': documento.estado_procesamiento in ('completado', 'error'),
+        'extraido_exitosamente': documento.extraido_exitosamente,
+        'tipo_documento': documento.tipo_documento,
+        'confianza_tipo': (documento.datos_extraidos or {}).get('confianza'),
+        'numero_documento': documento.numero_documento,
+        'valvula': documento.valvula.numero_serie if documento.valvula else None,
+        'error': documento.error_extraccion,
+    }
+    trabajo = getattr(documento, 'trabajo_extraccion', None)
+    if trabajo is not None:
+        datos['trabajo'] = {
+            'estado': trabajo.estado,
+            'intentos': trabajo.intentos,
+            'max_intentos': trabajo.max_intentos,
+            'proximo_intento': trabajo.disponible_desde.isoformat() if trabajo.estado == 'pendiente' else None,
+        }
+    return JsonResponse(datos)
+
+
+@requiere_admin
+def metricas_extraccion(request):
+    """
+    Métricas de la cola de extracción (JSON) para monitoreo: trabajos por
+    estado y extracciones que superaron el tiempo máximo
+    """
+    trabajos = TrabajoExtraccion.objects.all()
+    por_estado = dict(trabajos.values_list('estado').annotate(total=Count('id')).order_by())
+    hace_un_dia = timezone.now() - timedelta(hours=24)
+    datos = {
+        'trabajos': {estado: por_estado.get(estado, 0) for estado, _ in TrabajoExtraccion.ESTADO_CHOICES},
+        'timeouts': {
+            'total': trabajos.aggregate(total=Sum('timeouts'))['total'] or 0,
+            'documentos': trabajos.filter(timeouts__gt=0).count(),
+            'ultimas_24h': trabajos.filter(ultimo_timeout__gte=hace_un_dia).count(),
+        },
+        'limites': {
+            'aislada': settings.EXTRACCION_AISLADA,
+            'timeout_segundos': settings.EXTRACCION_TIMEOUT_SEGUNDOS,
+            'memoria_mb': settings.EXTRACCION_MEMORIA_MB,
+            'por_tipo': {
+                tipo: {'timeout_segundos': timeout, 'memoria_mb': memoria}
+                for tipo, (timeout, memoria) in settings.EXTRACCION_LIMITES_POR_TIPO.items()
+            },
+        },
+    }
+    return JsonResponse(datos)
+
+
 @requiere_comercial
 @require_http_methods(["POST"])
 def eliminar_certificado(request, pk):
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Script de prueba de la lectura por páginas de los certificados
+
+Genera con reportlab certificados de calibración con anexos y los lee página
+a página con cada backend. La lectura se detiene en cuanto el certificado
+tiene todos sus campos requeridos, incluidos los que suelen ir en la segunda
+página (vencimiento, presiones y resultado), y no antes: una fecha cualquiera
+de la primera página no cuenta como fecha de vencimiento.
+"""
+import io
+import os
+import sys
+import django
+from pathlib import Path
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.path.insert(0, str(Path(__file__).parent))
+
+django.setup()
+
+from reportlab.pdfgen import canvas
+from servicios.backends_texto import BACKENDS
+from servicios.extractors import detectar_por_paginas
+
+ANEXOS = 8
+PRIMERA = [
+    'CERTIFICADO DE CALIBRACIÓN',
+    'Certificado: CAL-2026-0415',
+    'Número de Serie: SV-77812',
+    'Modelo: JOS-E 461',
+    'Fecha: 14/03/2026',
+]
+SEGUNDA = [
+    'Resultados de la prueba en banco',
+    'Presión inicial: 150.0 PSI',
+    'Presión final: 152.5 PSI',
+    'Vencimiento: 14/03/2027',
+    'Resultado: Aprobado',
+]
+ESPERADO = {
+    'numero_serie': 'SV-77812',
+    'fecha_emision': '14/03/2026',
+    'fecha_vencimiento': '14/03/2027',
+    'presion_inicial': '150.0',
+    'presion_final': '152.5',
+    'resultado': 'APROBADO',
+}
+
+
+def generar_pdf(paginas):
+    """PDF con una página por lista de líneas, seguido de ``ANEXOS`` páginas de registros"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    anexos = [[f'Anexo {n + 1}: registro de lectura {i:02d} sin observaciones' for i in range(30)]
+              for n in range(ANEXOS)]
+    for lineas in paginas + anexos:
+        y = 800
+        for linea in lineas:
+            c.drawString(50, y, linea)
+            y -= 16
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def caso(backend, nombre, paginas, leidas_esperadas):
+    """Lee el PDF por páginas y compara tipo, páginas leídas y campos"""
+    tipo, extractor = detectar_por_paginas(io.BytesIO(generar_pdf(paginas)), backend=backend)
+    datos = extractor.extract()
+    leidas = extractor.parseado.num_paginas
+    errores = [f'{campo}={datos.get(campo)!r}' for campo, valor in ESPERADO.items() if datos.get(campo) != valor]
+    ok = tipo == 'calibracion' and leidas == leidas_esperadas and not errores
+    print(f"  {'OK' if ok else 'ERROR'}: {backend:<10} {nombre}: {leidas} de {extractor.parseado.paginas_totales} "
+          f"páginas (se esperaban {leidas_esperadas}){'; ' + ', '.join(errores) if errores else ''}")
+    return ok
+
+
+def test_lectura_por_paginas():
+    """Los campos de la segunda página se extraen y los anexos no se leen"""
+
+    print("\n" + "="*60)
+    print("PRUEBA: Lectura por páginas de certificados")
+    print("="*60 + "\n")
+
+    exito = True
+    for backend in BACKENDS:
+        if not BACKENDS[backend].disponible():
+            print(f"  SKIP: {backend} no está instalado")
+            continue
+        exito &= caso(backend, 'campos en la página 2', [PRIMERA, SEGUNDA], 2)
+        exito &= caso(backend, 'todo en la página 1', [PRIMERA + SEGUNDA], 1)
+
+    print("\n" + ("PRUEBA EXITOSA" if exito else "PRUEBA FALLIDA"))
+    return exito
+
+
+if __name__ == '__main__':
+    success = test_lectura_por_paginas()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Script de prueba de memoria de la extracción de texto de PDF
+
+Genera un PDF sintético de 100 páginas con reportlab y mide con tracemalloc
+el pico de memoria de Python al extraer su texto con cada backend. La
+extracción libera la caché de cada página al tomar su texto, así que el pico
+no debe crecer con el número de páginas.
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+import django
+from pathlib import Path
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.path.insert(0, str(Path(__file__).parent))
+
+django.setup()
+
+from django.test import override_settings
+from reportlab.pdfgen import canvas
+from servicios.backends_texto import BACKENDS
+from servicios.extractors import parsear_pdf
+
+PAGINAS = 100
+# Presupuesto de memoria (pico de tracemalloc) por backend, en MB
+PRESUPUESTO_MB = {
+    'pypdfium2': 16,
+    'pdfplumber': 32,
+}
+
+
+def generar_pdf(paginas=PAGINAS):
+    """PDF sintético: encabezado de certificado y una tabla de texto por página"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for pagina in range(paginas):
+        y = 800
+        lineas = [
+            'CERTIFICADO DE CALIBRACIÓN DE VÁLVULA DE SEGURIDAD',
+            f'Certificado: CAL-{pagina:04d}   Página {pagina + 1} de {paginas}',
+        ] + [f'Lectura {i:02d}: presión 150.{i} psi  temperatura 2{i % 10} °C  estado conforme' for i in range(12)]
+        for linea in lineas:
+            c.drawString(50, y, linea)
+            y -= 16
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def medir(backend, fuente):
+    """Pico de memoria (MB), segundos y páginas leídas al extraer el texto"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        parseado = parsear_pdf(fuente, backend=backend)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico / (1024 * 1024), time.perf_counter() - inicio, parseado.num_paginas
+
+
+def test_memoria_extraccion():
+    """El pico de memoria de cada backend queda por debajo de su presupuesto"""
+
+    print("\n" + "="*60)
+    print(f"PRUEBA: Memoria de extracción ({PAGINAS} páginas)")
+    print("="*60 + "\n")
+
+    contenido = generar_pdf()
+    print(f"PDF sintético: {len(contenido) / 1024:.0f} KB, {PAGINAS} páginas\n")
+
+    exito = True
+    for nombre, presupuesto in PRESUPUESTO_MB.items():
+        if not BACKENDS[nombre].disponible():
+            print(f"  SKIP: {nombre} no está instalado")
+            continue
+
+        # En memoria (por debajo del umbral) y copiado a disco (umbral 0 -> mmap)
+        for modo, umbral in (('memoria', None), ('disco', 0)):
+            ajustes = {} if umbral is None else {'EXTRACCION_UMBRAL_SPOOL_BYTES': umbral}
+            with override_settings(**ajustes):
+                pico, segundos, paginas = medir(nombre, io.BytesIO(contenido))
+
+            ok = pico <= presupuesto and paginas == PAGINAS
+            exito = exito and ok
+            estado = "OK" if ok else "ERROR"
+            print(f"  {estado}: {nombre:<10} ({modo:<7}) pico {pico:6.1f} MB "
+                  f"(presupuesto {presupuesto} MB), {paginas} páginas en {segundos:.1f}s")
+
+    print("\n" + ("PRUEBA EXITOSA" if exito else "PRUEBA FALLIDA"))
+    return exito
+
+
+if __name__ == '__main__':
+    success = test_memoria_extraccion()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Script de prueba de la re-extracción con procesos ``forkserver``
+
+Con ``forkserver`` (el método por defecto desde Python 3.14) los procesos del
+pool no heredan Django ya configurado: sólo pueden ejecutar funciones de
+módulos que no lo importan. Se ejecuta ``manage.py reextract`` sobre dos
+documentos de una empresa de prueba, uno con capa de texto guardada y otro
+que se vuelve a leer desde su archivo, y ambos deben re-extraerse sin error
+y aplicar su fecha a la hoja de vida de la válvula que ya tenían.
+
+El comando corre en otro proceso, como ``manage.py``: si el módulo principal
+configurara Django, los procesos ``forkserver`` lo heredarían al importarlo.
+"""
+import datetime
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+import django
+from pathlib import Path
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.path.insert(0, str(Path(__file__).parent))
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from reportlab.pdfgen import canvas
+from clientes.models import Empresa
+from servicios.capa_texto import capa_de_parseado
+from servicios.extractors import VERSION_EXTRACTORES, parsear_pdf
+from servicios.models import CapaTexto, Documento
+from valvulas.models import Valvula
+
+BASE_DIR = Path(__file__).parent
+# manage.py con forkserver como método de inicio de los procesos
+MANAGE_FORKSERVER = (
+    "import multiprocessing, sys; multiprocessing.set_start_method('forkserver'); "
+    "from django.core.management import execute_from_command_line; "
+    "execute_from_command_line(['manage.py'] + sys.argv[1:])"
+)
+
+
+def generar_pdf(numero):
+    """Certificado de calibración de una página"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    y = 800
+    for linea in ('CERTIFICADO DE CALIBRACIÓN', f'Certificado: CAL-{numero}', 'Número de Serie: FS-100',
+                  'Modelo: M-1', 'Fecha: 10/01/2026', 'Presión inicial: 150 PSI', 'Resultado: Aprobado'):
+        c.drawString(50, y, linea)
+        y -= 16
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def crear_documento(usuario, valvula, sufijo, numero, con_capa):
+    """Documento ya procesado con una versión anterior de los extractores"""
+    contenido = generar_pdf(numero)
+    documento = Documento(
+        usuario_comercial=usuario, valvula=valvula, tipo_documento='otro',
+        nombre_original=f'forkserver_{sufijo}_{numero}.pdf', extraido_exitosamente=False,
+        estado_procesamiento='completado', version_extractor=VERSION_EXTRACTORES - 1,
+    )
+    documento.archivo_pdf.save(documento.nombre_original, ContentFile(contenido), save=False)
+    documento.save()
+    if con_capa:
+        capa = capa_de_parseado(parsear_pdf(io.BytesIO(contenido)), VERSION_EXTRACTORES - 1)
+        CapaTexto.objects.create(documento=documento, **capa)
+    return documento
+
+
+def test_reextraccion_forkserver():
+    """Los documentos con y sin capa de texto se re-extraen en procesos forkserver"""
+
+    print("\n" + "=" * 60)
+    print("PRUEBA: Re-extracción con procesos forkserver")
+    print("=" * 60 + "\n")
+
+    sufijo = uuid.uuid4().hex[:8]
+    empresa = Empresa.objects.create(
+        nombre=f'Prueba forkserver {sufijo}', nit=f'FS-{sufijo}', email='prueba@example.com',
+        direccion='N/A', ciudad='N/A', departamento='N/A', contacto_principal='N/A',
+    )
+    usuario = User.objects.create(username=f'prueba_forkserver_{sufijo}')
+    valvula = Valvula.objects.create(empresa=empresa, numero_serie=f'FS-{sufijo}', marca='Marca',
+                                     modelo='M-1', tamaño='1"', tipo='alivio')
+    documentos = []
+    try:
+        documentos = [crear_documento(usuario, valvula, sufijo, numero, numero == 1) for numero in (1, 2)]
+        with tempfile.TemporaryDirectory() as directorio:
+            comando = subprocess.run(
+                [sys.executable, '-c', MANAGE_FORKSERVER, 'reextract', '--empresa', str(empresa.pk),
+                 '--workers', '2', '--reiniciar', '--checkpoint', os.path.join(directorio, 'checkpoint.json')],
+                cwd=BASE_DIR, capture_output=True, text=True, timeout=300,
+            )
+        print(comando.stdout.strip())
+
+        ok = comando.returncode == 0
+        if not ok:
+            print(comando.stderr.strip()[-2000:])
+        for documento, origen in zip(documentos, ('capa de texto', 'archivo')):
+            documento.refresh_from_db()
+            exito = (documento.extraido_exitosamente and documento.version_extractor == VERSION_EXTRACTORES
+                     and documento.tipo_documento == 'calibracion')
+            ok &= exito
+            print(f"  {'OK' if exito else 'ERROR'}: desde {origen}: tipo {documento.tipo_documento}, "
+                  f"versión {documento.version_extractor}, error {documento.error_extraccion!r}")
+        valvula.refresh_from_db()
+        fecha = valvula.fecha_ultima_calibracion == datetime.date(2026, 1, 10)
+        ok &= fecha
+        print(f"  {'OK' if fecha else 'ERROR'}: fecha de calibración de la válvula {valvula.fecha_ultima_calibracion}")
+
+        print("\n" + ("PRUEBA EXITOSA" if ok else "PRUEBA FALLIDA"))
+        return ok
+    finally:
+        for documento in documentos:
+            documento.archivo_pdf.delete(save=False)
+        Documento.objects.filter(usuario_comercial=usuario).delete()
+        valvula.delete()
+        usuario.delete()
+        empresa.delete()
+
+
+if __name__ == '__main__':
+    success = test_reextraccion_forkserver()
+    sys.exit(0 if success else 1)
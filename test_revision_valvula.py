@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Script de prueba de la revisión de enlaces aproximados con válvulas
+
+Un documento cuyo número de serie sólo difiere por un error de lectura
+("RV-...-1O" por "RV-...-10") se enlaza con la válvula existente, marcado para
+revisión y sin tocar las fechas de la hoja de vida. Se prueban las dos
+acciones del admin de Documento:
+
+- "confirmar enlace": quita la marca y aplica la fecha a la válvula enlazada.
+- "rechazar enlace": enlaza el documento (y sus pruebas de presión) con la
+  válvula de su propio número de serie, creada si no existe, y le aplica la
+  fecha; la válvula del enlace rechazado queda como estaba.
+"""
+import datetime
+import os
+import sys
+import uuid
+import django
+from pathlib import Path
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.path.insert(0, str(Path(__file__).parent))
+
+django.setup()
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.test import RequestFactory
+from clientes.models import Empresa
+from servicios.admin import DocumentoAdmin
+from servicios.models import Documento, PruebaPresion
+from servicios.procesamiento import enlazar_valvula
+from valvulas.models import Valvula
+
+FECHA = datetime.date(2024, 5, 20)
+
+
+def crear_contexto(sufijo):
+    """Empresa, usuario comercial y válvula existente propios de la prueba"""
+    empresa = Empresa.objects.create(
+        nombre=f'Prueba revisión {sufijo}', nit=f'PR-{sufijo}', email='prueba@example.com',
+        direccion='N/A', ciudad='N/A', departamento='N/A', contacto_principal='N/A',
+    )
+    usuario = User.objects.create(username=f'prueba_revision_{sufijo}', is_staff=True, is_superuser=True)
+    usuario.perfil.empresa = empresa
+    usuario.perfil.save()
+    valvula = Valvula.objects.create(
+        empresa=empresa, numero_serie=f'RV-{sufijo}-10', marca='Marca', modelo=f'MOD-{sufijo}',
+        tamaño='1"', tipo='alivio',
+    )
+    return empresa, usuario, valvula
+
+
+def documento_leido_mal(usuario, sufijo, indice):
+    """Certificado de la válvula con la serie mal leída, ya enlazado"""
+    datos = {'numero_serie': f'RV-{sufijo}-1O', 'modelo': f'OTRO-{sufijo}', 'marca': 'Marca', 'tamaño': '2"'}
+    documento = Documento.objects.create(
+        usuario_comercial=usuario,
+        tipo_documento='calibracion',
+        archivo_pdf=f'documentos/prueba_revision_{indice}.pdf',
+        nombre_original=f'prueba_revision_{indice}.pdf',
+        extraido_exitosamente=True,
+        fecha_documento=FECHA,
+        datos_extraidos={'tipo': 'calibracion', 'confianza': 1.0, 'datos': datos},
+    )
+    enlazar_valvula(documento, datos)
+    PruebaPresion.objects.create(documento=documento, valvula=documento.valvula, fecha=FECHA, numero=1)
+    return documento
+
+
+def ejecutar_accion(accion, usuario, documento):
+    """Ejecuta una acción del admin de Documento sobre un documento"""
+    request = RequestFactory().post('/admin/servicios/documento/')
+    request.user = usuario
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    modelo_admin = DocumentoAdmin(Documento, admin.site)
+    getattr(modelo_admin, accion)(request, Documento.objects.filter(pk=documento.pk))
+    return [str(mensaje) for mensaje in request._messages]
+
+
+def verificar(condicion, mensaje):
+    print(f"  {'✓' if condicion else '❌'} {mensaje}")
+    return condicion
+
+
+def test_revision_valvula():
+    """Confirmar aplica las fechas; rechazar enlaza (o crea) la válvula correcta"""
+
+    print("\n" + "=" * 60)
+    print("PRUEBA: Confirmar y rechazar enlaces aproximados con válvulas")
+    print("=" * 60 + "\n")
+
+    sufijo = uuid.uuid4().hex[:8]
+    empresa, usuario, existente = crear_contexto(sufijo)
+    try:
+        ok = True
+
+        print("[1/2] Confirmar enlace")
+        documento = documento_leido_mal(usuario, sufijo, 1)
+        existente.refresh_from_db()
+        ok &= verificar(documento.valvula_id == existente.pk and documento.revisar_valvula,
+                        'enlazado con la válvula existente y marcado para revisión')
+        ok &= verificar(existente.fecha_ultima_calibracion is None, 'sin fecha aplicada antes de confirmar')
+        print(f"    {ejecutar_accion('confirmar_enlace', usuario, documento)}")
+        documento.refresh_from_db()
+        existente.refresh_from_db()
+        ok &= verificar(not documento.revisar_valvula, 'marca de revisión quitada')
+        ok &= verificar(existente.fecha_ultima_calibracion == FECHA, 'fecha de calibración aplicada a la válvula')
+        Valvula.objects.filter(pk=existente.pk).update(fecha_ultima_calibracion=None)
+
+        print("\n[2/2] Rechazar enlace")
+        documento = documento_leido_mal(usuario, sufijo, 2)
+        ok &= verificar(documento.valvula_id == existente.pk and documento.revisar_valvula,
+                        'enlazado con la válvula existente y marcado para revisión')
+        print(f"    {ejecutar_accion('rechazar_enlace', usuario, documento)}")
+        documento.refresh_from_db()
+        existente.refresh_from_db()
+        nueva = documento.valvula
+        ok &= verificar(nueva is not None and nueva.pk != existente.pk and nueva.numero_serie == f'RV-{sufijo}-1O',
+                        'enlazado con una válvula nueva de su número de serie')
+        ok &= verificar(nueva is not None and nueva.empresa_id == empresa.pk and nueva.tamaño == '2"',
+                        'válvula nueva en la empresa con los datos extraídos')
+        ok &= verificar(not documento.revisar_valvula and documento.similitud_valvula is None,
+                        'marca de revisión y similitud quitadas')
+        ok &= verificar(nueva is not None and nueva.fecha_ultima_calibracion == FECHA,
+                        'fecha de calibración aplicada a la válvula nueva')
+        ok &= verificar(existente.fecha_ultima_calibracion is None, 'la válvula rechazada no cambió')
+        ok &= verificar(not PruebaPresion.objects.filter(documento=documento).exclude(valvula=nueva).exists(),
+                        'pruebas de presión movidas a la válvula nueva')
+
+        # Un segundo rechazo de la misma serie enlaza la válvula ya creada
+        otro = documento_leido_mal(usuario, sufijo, 3)
+        ok &= verificar(otro.valvula_id == nueva.pk and not otro.revisar_valvula,
+                        'un documento posterior enlaza directamente la válvula nueva')
+
+        print("\n" + "=" * 60)
+        print("✅ PRUEBA EXITOSA" if ok else "❌ PRUEBA FALLIDA")
+        print("=" * 60)
+        return ok
+    finally:
+        Documento.objects.filter(usuario_comercial=usuario).delete()
+        Valvula.objects.filter(empresa=empresa).delete()
+        usuario.delete()
+        empresa.delete()
+
+
+if __name__ == '__main__':
+    success = test_revision_valvula()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Script de prueba de concurrencia del enlace de válvulas
+
+Varios hilos (cada uno con su conexión a la base de datos) enlazan al mismo
+tiempo documentos de válvulas que todavía no existen, como lo harían varios
+workers de ingesta con certificados de la misma válvula nueva. Al terminar
+debe haber exactamente una válvula por número de serie, cada documento
+enlazado con ella y una sola creación reportada por válvula.
+
+La mitad de los hilos enlaza con ``enlazar_valvula`` (el pipeline, dentro de
+una transacción) y la otra mitad con ``enlazar_valvula_por_numero_serie``
+directamente (búsqueda y creación en transacciones separadas), para que
+también se ejerza el conflicto de la creación. Cada serie se escribe de dos
+formas ("SN-x-1" y "sn x 1"): son la misma válvula.
+"""
+import os
+import sys
+import threading
+import uuid
+import django
+from pathlib import Path
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.path.insert(0, str(Path(__file__).parent))
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from clientes.models import Empresa
+from servicios.models import Documento
+from servicios.procesamiento import enlazar_valvula
+from valvulas.models import Valvula
+
+HILOS = 12
+SERIES = 10
+
+
+def crear_contexto(sufijo):
+    """Empresa y usuario comercial propios de la prueba"""
+    empresa = Empresa.objects.create(
+        nombre=f'Prueba concurrencia {sufijo}', nit=f'PC-{sufijo}', email='prueba@example.com',
+        direccion='N/A', ciudad='N/A', departamento='N/A', contacto_principal='N/A',
+    )
+    usuario = User.objects.create(username=f'prueba_concurrencia_{sufijo}')
+    usuario.perfil.empresa = empresa
+    usuario.perfil.save()
+    return empresa, usuario
+
+
+def enlazar_en_hilo(indice, serie, modelo, usuario, barrera, resultados, errores):
+    """Crea un documento de la serie y lo enlaza en cuanto todos los hilos están listos"""
+    try:
+        documento = Documento.objects.create(
+            usuario_comercial=usuario,
+            tipo_documento='calibracion',
+            archivo_pdf=f'documentos/prueba_concurrencia_{indice}.pdf',
+            nombre_original=f'prueba_concurrencia_{indice}.pdf',
+        )
+        # Modelo propio de la serie (sin coincidencia de serie se enlaza por
+        # modelo). Sin marca ni tamaño: la válvula se crea con esos campos vacíos
+        datos = {'numero_serie': serie, 'modelo': modelo, 'marca': None, 'tamaño': None}
+        barrera.wait()
+        if indice % 2:
+            valvula, creada = enlazar_valvula(documento, datos)
+        else:
+            documento._marca_extraida = datos['marca']
+            documento._tamaño_extraido = datos['tamaño']
+            valvula, creada = documento.enlazar_valvula_por_numero_serie(serie, datos['modelo'])
+            documento.save()
+        resultados.append((serie, documento.pk, valvula.pk if valvula else None, creada))
+    except Exception as e:
+        errores.append(f'hilo {indice}: {type(e).__name__}: {e}')
+    finally:
+        connection.close()
+
+
+def test_valvulas_concurrencia():
+    """Ningún número de serie queda con dos válvulas ni ningún documento sin enlazar"""
+
+    print("\n" + "=" * 60)
+    print(f"PRUEBA: Enlace concurrente de válvulas ({HILOS} hilos, {SERIES} series)")
+    print("=" * 60 + "\n")
+
+    sufijo = uuid.uuid4().hex[:8]
+    empresa, usuario = crear_contexto(sufijo)
+    connection.close()
+    try:
+        resultados, errores = [], []
+        for numero in range(SERIES):
+            escrituras = (f'SN-{sufijo}-{numero}', f'sn {sufijo} {numero}')
+            barrera = threading.Barrier(HILOS)
+            hilos = [
+                threading.Thread(
+                    target=enlazar_en_hilo,
+                    args=(numero * HILOS + i, escrituras[i // 2 % 2], f'JOS-E {sufijo}-{numero}', usuario, barrera,
+                          resultados, errores),
+                )
+                for i in range(HILOS)
+            ]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        ok = True
+        if errores:
+            ok = False
+            print(f"  ❌ {len(errores)} hilos fallaron:")
+            for error in errores[:10]:
+                print(f"    - {error}")
+
+        for numero in range(SERIES):
+            serie = f'SN-{sufijo}-{numero}'
+            valvulas = list(Valvula.objects.filter(numero_serie_normalizado=f'SN{sufijo.upper()}{numero}'))
+            propios = [r for r in resultados if r[0] in (serie, f'sn {sufijo} {numero}')]
+            creadas = sum(1 for r in propios if r[3])
+            documentos = Documento.objects.filter(pk__in=[r[1] for r in propios])
+            sin_enlace = documentos.filter(valvula__isnull=True).count()
+            if len(valvulas) != 1:
+                ok = False
+                print(f"  ❌ {serie}: {len(valvulas)} válvulas")
+                continue
+            ajenos = documentos.exclude(valvula=valvulas[0]).count()
+            if creadas != 1 or sin_enlace or ajenos or len(propios) != HILOS:
+                ok = False
+                print(f"  ❌ {serie}: creadas={creadas}, sin enlace={sin_enlace}, "
+                      f"con otra válvula={ajenos}, documentos={len(propios)}")
+            else:
+                print(f"  ✓ {serie}: 1 válvula, {len(propios)} documentos enlazados")
+
+        print("\n" + "=" * 60)
+        print("✅ PRUEBA EXITOSA" if ok else "❌ PRUEBA FALLIDA")
+        print("=" * 60)
+        return ok
+    finally:
+        Documento.objects.filter(usuario_comercial=usuario).delete()
+        Valvula.objects.filter(empresa=empresa).delete()
+        usuario.delete()
+        empresa.delete()
+
+
+if __name__ == '__main__':
+    success = test_valvulas_concurrencia()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,288 @@
+"""
+Detección y fusión de válvulas duplicadas
+
+Antes del enlace normalizado y aproximado (``valvulas.identidad``,
+``valvulas.similitud``) un documento sin número de serie reconocible creaba
+una válvula con el modelo como número de serie ("serie provisional"), y una
+serie mal leída creaba otra válvula. Aquí se buscan esos duplicados sin
+comparar todas las válvulas entre sí:
+
+1. Bloques: sólo se comparan válvulas de la misma empresa y el mismo modelo
+   normalizado, y dentro del bloque las de marca y tamaño compatibles (iguales
+   normalizados, o vacíos en una de las dos: las válvulas creadas por el
+   enlace no siempre tienen marca ni tamaño).
+2. Puntaje de cada par: la similitud de trigramas de los números de serie
+   plegados (1 si sólo difieren en caracteres que el OCR confunde); una serie
+   provisional es casi seguro un duplicado. El mismo código interno o TAG
+   suma, y un tipo distinto resta. Series consecutivas ("ZZ-000997" y
+   "ZZ-009997") pueden llegar a 0.8: el umbral por defecto (0.9) sólo
+   propone lecturas equivalentes, series provisionales o series parecidas
+   con el mismo código interno o TAG.
+3. Propuestas: los pares sobre el umbral se agrupan (una válvula puede tener
+   varios duplicados) y en cada grupo se conserva la válvula con serie real,
+   más documentos y más antigua. Una serie provisional compatible con varias
+   válvulas distintas del modelo es ambigua y no se propone.
+
+``fusionar_valvulas`` aplica una propuesta en una sola transacción.
+"""
+
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Dict, Iterator, List, Tuple
+
+from django.db import transaction
+from django.db.models import Count
+
+from servicios.models import AlertaServicio, Documento, PruebaPresion, Servicio
+from valvulas.identidad import normalizar_modelo
+from valvulas.models import EspecificacionTecnica, Valvula
+from valvulas.similitud import serie_plegada, similitud
+
+# Puntaje de un par en que una de las válvulas tiene serie provisional
+PUNTAJE_SERIE_PROVISIONAL = 0.9
+BONO_COINCIDENCIA = 0.1
+PENALIDAD_TIPO = 0.2
+
+# Campos de texto que la válvula conservada toma de un duplicado si los tiene vacíos
+CAMPOS_COMPLETABLES = (
+    'codigo_interno', 'marca', 'tamaño', 'tag_localizacion', 'presion_nominal', 'presion_set',
+    'temperatura_nominal', 'material', 'ubicacion', 'norma_aplicable',
+)
+
+_CAMPOS_COMPARACION = (
+    'pk', 'empresa_id', 'numero_serie', 'numero_serie_normalizado', 'modelo_normalizado',
+    'marca', 'tamaño', 'tipo', 'codigo_interno', 'tag_localizacion',
+)
+
+
+@dataclass
+class Propuesta:
+    """Válvulas de un mismo grupo: se conserva una y las demás se fusionan en ella"""
+    conservar: Valvula
+    duplicadas: List[Valvula]
+    puntaje: float                        # El menor de los pares que unen el grupo
+    motivos: List[str] = field(default_factory=list)
+
+    def como_dict(self) -> Dict:
+        return {
+            'empresa': self.conservar.empresa_id,
+            'modelo': self.conservar.modelo_normalizado,
+            'conservar': self.conservar.pk,
+            'duplicadas': [valvula.pk for valvula in self.duplicadas],
+            'series': [self.conservar.numero_serie] + [valvula.numero_serie for valvula in self.duplicadas],
+            'puntaje': round(self.puntaje, 3),
+            'motivos': self.motivos,
+        }
+
+
+def serie_provisional(valvula) -> bool:
+    """La válvula se creó con el modelo como número de serie"""
+    return bool(valvula.modelo_normalizado) and valvula.numero_serie_normalizado == valvula.modelo_normalizado
+
+
+def _compatibles(a: str, b: str) -> bool:
+    return not a or not b or a == b
+
+
+def bloques(empresa_id=None, maximo=500) -> Iterator[Tuple[Tuple, List[Valvula]]]:
+    """
+    Bloques de válvulas de la misma empresa y modelo normalizado (con al menos
+    dos válvulas), leídos en una sola consulta ordenada
+
+    Yields:
+        ((empresa_id, modelo_normalizado), válvulas); un bloque con más de
+        ``maximo`` válvulas se entrega vacío para que quien llama lo informe
+    """
+    valvulas = Valvula.objects.exclude(modelo_normalizado='').only(*_CAMPOS_COMPARACION)
+    if empresa_id is not None:
+        valvulas = valvulas.filter(empresa_id=empresa_id)
+    valvulas = valvulas.order_by('empresa_id', 'modelo_normalizado', 'pk').iterator(chunk_size=2000)
+    for clave, grupo in groupby(valvulas, key=lambda v: (v.empresa_id, v.modelo_normalizado)):
+        grupo = list(grupo)
+        if len(grupo) < 2:
+            continue
+        yield clave, (grupo if len(grupo) <= maximo else [])
+
+
+def puntuar(a, b) -> Tuple[float, List[str]]:
+    """
+    Puntaje (0 a 1) de que dos válvulas del mismo bloque sean la misma, con los
+    motivos. Pares de marca o tamaño incompatibles puntúan 0.
+    """
+    if not (_compatibles(normalizar_modelo(a.marca), normalizar_modelo(b.marca))
+            and _compatibles(normalizar_modelo(a.tamaño), normalizar_modelo(b.tamaño))):
+        return 0.0, []
+    motivos = []
+    if serie_provisional(a) or serie_provisional(b):
+        puntaje = PUNTAJE_SERIE_PROVISIONAL
+        motivos.append('serie provisional (modelo)')
+    else:
+        puntaje = similitud(serie_plegada(a.numero_serie), serie_plegada(b.numero_serie))
+        motivos.append(f'series parecidas ({puntaje:.2f})')
+    for campo, nombre in (('codigo_interno', 'código interno'), ('tag_localizacion', 'TAG')):
+        valor_a, valor_b = normalizar_modelo(getattr(a, campo)), normalizar_modelo(getattr(b, campo))
+        if valor_a and valor_a == valor_b:
+            puntaje += BONO_COINCIDENCIA
+            motivos.append(f'mismo {nombre}')
+    if a.tipo and b.tipo and a.tipo != b.tipo:
+        puntaje -= PENALIDAD_TIPO
+        motivos.append('tipo distinto')
+    return max(0.0, min(1.0, puntaje)), motivos
+
+
+class _Conjuntos:
+    """Unión de conjuntos (union-find) de válvulas por pk"""
+
+    def __init__(self, pks):
+        self.padre = {pk: pk for pk in pks}
+
+    def raiz(self, pk):
+        while self.padre[pk] != pk:
+            self.padre[pk] = self.padre[self.padre[pk]]
+            pk = self.padre[pk]
+        return pk
+
+    def unir(self, a, b):
+        self.padre[self.raiz(a)] = self.raiz(b)
+
+
+def _pares(valvulas, otras, umbral):
+    """Pares (a, b, puntaje, motivos) sobre el umbral entre dos listas (la misma lista: sin repetir)"""
+    for i, a in enumerate(valvulas):
+        for b in (otras[i + 1:] if otras is valvulas else otras):
+            puntaje, motivos = puntuar(a, b)
+            if puntaje >= umbral:
+                yield a, b, puntaje, motivos
+
+
+def _grupos_bloque(valvulas: List[Valvula], umbral: float, ambiguas: List[Valvula]):
+    """
+    Grupos de duplicados de un bloque: (miembros, menor puntaje, motivos)
+
+    Las válvulas con serie real se agrupan por sus pares. Una válvula con serie
+    provisional se une al único grupo (o válvula) real compatible; si hay
+    varios no se sabe de cuál es y se agrega a ``ambiguas``. Las provisionales
+    sin válvula real compatible se agrupan entre sí.
+    """
+    reales = [valvula for valvula in valvulas if not serie_provisional(valvula)]
+    provisionales = [valvula for valvula in valvulas if serie_provisional(valvula)]
+    conjuntos = _Conjuntos(valvula.pk for valvula in valvulas)
+    pares = list(_pares(reales, reales, umbral))
+    for a, b, _, _ in pares:
+        conjuntos.unir(a.pk, b.pk)
+
+    sueltas = []
+    for provisional in provisionales:
+        compatibles = list(_pares([provisional], reales, umbral))
+        raices = {conjuntos.raiz(b.pk) for _, b, _, _ in compatibles}
+        if len(raices) == 1:
+            conjuntos.unir(provisional.pk, compatibles[0][1].pk)
+            pares.extend(compatibles)
+        elif raices:
+            ambiguas.append(provisional)
+        else:
+            sueltas.append(provisional)
+    for a, b, puntaje, motivos in _pares(sueltas, sueltas, umbral):
+        conjuntos.unir(a.pk, b.pk)
+        pares.append((a, b, puntaje, motivos))
+
+    grupos = {}
+    for a, _, puntaje, motivos in pares:
+        grupo = grupos.setdefault(conjuntos.raiz(a.pk), {'puntaje': 1.0, 'motivos': []})
+        grupo['puntaje'] = min(grupo['puntaje'], puntaje)
+        grupo['motivos'].extend(motivo for motivo in motivos if motivo not in grupo['motivos'])
+    for raiz, datos in grupos.items():
+        miembros = [valvula for valvula in valvulas if conjuntos.raiz(valvula.pk) == raiz]
+        yield miembros, datos['puntaje'], datos['motivos']
+
+
+def proponer_fusiones(umbral=0.9, empresa_id=None, maximo_bloque=500, omitidos=None, ambiguas=None) -> List[Propuesta]:
+    """
+    Propuestas de fusión de válvulas duplicadas
+
+    Args:
+        umbral: puntaje mínimo de un par para proponerlo
+        empresa_id: sólo las válvulas de esta empresa
+        maximo_bloque: bloques más grandes se omiten (su comparación es cuadrática)
+        omitidos: lista a la que se agregan las claves de los bloques omitidos
+        ambiguas: lista a la que se agregan las válvulas con serie provisional
+            que pueden ser de más de una válvula
+    """
+    propuestas = []
+    ambiguas = ambiguas if ambiguas is not None else []
+    for clave, valvulas in bloques(empresa_id, maximo_bloque):
+        if not valvulas:
+            if omitidos is not None:
+                omitidos.append(clave)
+            continue
+        grupos = list(_grupos_bloque(valvulas, umbral, ambiguas))
+        if not grupos:
+            continue
+        documentos = dict(
+            Documento.objects.filter(valvula_id__in=[v.pk for miembros, _, _ in grupos for v in miembros])
+            .values_list('valvula_id').annotate(total=Count('id')).order_by()
+        )
+        for miembros, puntaje, motivos in grupos:
+            # Se conserva la de serie real, con más documentos y más antigua
+            miembros.sort(key=lambda v: (serie_provisional(v), -documentos.get(v.pk, 0), v.pk))
+            propuestas.append(Propuesta(miembros[0], miembros[1:], puntaje, motivos))
+    propuestas.sort(key=lambda propuesta: (-propuesta.puntaje, propuesta.conservar.pk))
+    return propuestas
+
+
+def fusionar_valvulas(conservar_id: int, duplicadas_ids: List[int]) -> Dict[str, int]:
+    """
+    Fusiona las válvulas duplicadas en la conservada, en una sola transacción:
+    documentos, servicios, alertas y pruebas de presión pasan a la conservada
+    con un UPDATE por tabla; las especificaciones técnicas se mueven si la
+    conservada no tiene; la conservada completa sus campos vacíos y sus fechas
+    de hoja de vida con las de los duplicados, que después se eliminan.
+
+    Returns:
+        Filas movidas por tabla
+
+    Raises:
+        ValueError: las válvulas no existen o no son de la misma empresa
+    """
+    duplicadas_ids = [pk for pk in duplicadas_ids if pk != conservar_id]
+    with transaction.atomic():
+        valvulas = {
+            valvula.pk: valvula
+            for valvula in Valvula.objects.select_for_update().filter(pk__in=[conservar_id, *duplicadas_ids])
+        }
+        faltantes = {conservar_id, *duplicadas_ids} - set(valvulas)
+        if faltantes:
+            raise ValueError(f'No existen las válvulas {sorted(faltantes)}')
+        conservar = valvulas[conservar_id]
+        duplicadas = [valvulas[pk] for pk in duplicadas_ids]
+        if any(valvula.empresa_id != conservar.empresa_id for valvula in duplicadas):
+            raise ValueError('Sólo se fusionan válvulas de la misma empresa')
+
+        movidas = {
+            'documentos': Documento.objects.filter(valvula_id__in=duplicadas_ids).update(valvula=conservar),
+            'servicios': Servicio.objects.filter(valvula_id__in=duplicadas_ids).update(valvula=conservar),
+            'alertas_servicio': AlertaServicio.objects.filter(valvula_id__in=duplicadas_ids).update(valvula=conservar),
+            'pruebas_presion': PruebaPresion.objects.filter(valvula_id__in=duplicadas_ids).update(valvula=conservar),
+            'especificaciones': 0,
+        }
+        if not EspecificacionTecnica.objects.filter(valvula=conservar).exists():
+            especificacion = (
+                EspecificacionTecnica.objects.filter(valvula_id__in=duplicadas_ids).order_by('-fecha_actualizacion').first()
+            )
+            if especificacion is not None:
+                movidas['especificaciones'] = (
+                    EspecificacionTecnica.objects.filter(pk=especificacion.pk).update(valvula=conservar)
+                )
+
+        for valvula in sorted(duplicadas, key=lambda v: v.pk):
+            for campo in CAMPOS_COMPLETABLES:
+                if not getattr(conservar, campo) and getattr(valvula, campo):
+                    setattr(conservar, campo, getattr(valvula, campo))
+            for campo in ('fecha_ultimo_servicio', 'fecha_ultima_calibracion'):
+                if getattr(valvula, campo) and (not getattr(conservar, campo) or getattr(valvula, campo) > getattr(conservar, campo)):
+                    setattr(conservar, campo, getattr(valvula, campo))
+            if valvula.fecha_instalacion and (not conservar.fecha_instalacion or valvula.fecha_instalacion < conservar.fecha_instalacion):
+                conservar.fecha_instalacion = valvula.fecha_instalacion
+        Valvula.objects.filter(pk__in=duplicadas_ids).delete()
+        conservar.save()
+    return movidas
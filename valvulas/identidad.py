@@ -0,0 +1,176 @@
+"""
+Identidad normalizada de las válvulas
+
+El número de serie extraído de un documento no siempre se escribe igual que
+el registrado: "S/N: sn-12345-a", "SN 12345 A" y "SN12345A" son la misma
+válvula. ``Valvula`` guarda el número de serie y el modelo normalizados
+(mayúsculas, sin guiones, espacios ni prefijos "S/N") en columnas indexadas
+junto con la empresa, y el enlace de un documento con su válvula es una sola
+consulta indexada (``buscar_valvula``).
+
+En la carga por lotes, ``MapaIdentidad`` precarga en una consulta las
+válvulas de los números de serie de cada lote y recuerda las que se crean, así
+que miles de documentos no cuestan miles de consultas.
+
+Varios procesos pueden cargar a la vez certificados de la misma válvula nueva:
+``crear_valvula`` inserta en un savepoint y, si otro proceso ganó la carrera
+(el número de serie normalizado es único en cada empresa), toma la válvula
+que ese proceso creó.
+"""
+
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+
+# Etiquetas que preceden al número de serie: "S/N:", "N/S", "S.N.", "Serial No.",
+# "Nº de serie", "Serie:"
+_PREFIJO_SERIE = re.compile(
+    r'^\s*(?:s\s*/\s*n|n\s*/\s*s|s\.\s*n\.|serial(?:\s+(?:no\.?|number|n[°º]))?'
+    r'|(?:n[°º]?o?\.?|n[uú]m(?:ero)?\.?)\s*(?:de\s+)?serie|serie)\s*[:#.\-]?\s*',
+    re.IGNORECASE,
+)
+_NO_ALFANUMERICO = re.compile(r'[^0-9A-Z]')
+
+
+def normalizar_modelo(texto) -> str:
+    """Mayúsculas y sólo letras y dígitos: "jos-e 26" -> "JOSE26" ('' si no hay texto)"""
+    if not texto:
+        return ''
+    return _NO_ALFANUMERICO.sub('', str(texto).upper())
+
+
+def normalizar_serie(texto) -> str:
+    """Número de serie sin la etiqueta "S/N" ni separadores: "S/N: sn-12345-a" -> "SN12345A" """
+    if not texto:
+        return ''
+    return normalizar_modelo(_PREFIJO_SERIE.sub('', str(texto), count=1))
+
+
+def buscar_valvula(numero_serie=None, modelo=None, empresa_id=None):
+    """
+    Válvula de un documento en una sola consulta indexada
+
+    Gana la del mismo número de serie normalizado (primero la de la misma
+    empresa); sin ella, la del mismo modelo normalizado de la empresa (de
+    cualquier empresa si no se conoce). En empate, la más antigua.
+
+    Returns:
+        ``Valvula`` o None
+    """
+    from valvulas.models import Valvula
+
+    serie, modelo = normalizar_serie(numero_serie), normalizar_modelo(modelo)
+    condiciones = Q()
+    if serie:
+        condiciones |= Q(numero_serie_normalizado=serie)
+    if modelo:
+        condiciones |= Q(modelo_normalizado=modelo, **({'empresa_id': empresa_id} if empresa_id else {}))
+    if not condiciones:
+        return None
+    return Valvula.objects.filter(condiciones).order_by(
+        Case(When(numero_serie_normalizado=serie, then=Value(0)), default=Value(1), output_field=IntegerField()),
+        Case(When(empresa_id=empresa_id, then=Value(0)), default=Value(1), output_field=IntegerField()),
+        'pk',
+    ).first()
+
+
+def crear_valvula(valvula):
+    """
+    Inserta una válvula nueva o, si otro proceso ya insertó el mismo número
+    de serie normalizado en la empresa ("SN-123" y "SN 123"), retorna esa
+    válvula. Es el get-or-create de Django: el INSERT va en un savepoint para
+    que el conflicto no invalide la transacción externa, y la válvula del otro
+    proceso se lee después del conflicto por la misma clave única (empresa,
+    serie normalizada); en PostgreSQL el INSERT espera a que la otra
+    transacción confirme.
+
+    Returns:
+        tuple(valvula, creada:bool)
+
+    Raises:
+        IntegrityError: el INSERT falló por otro motivo (p. ej. sin empresa, o
+            el mismo número de serie en otra empresa)
+    """
+    from valvulas.models import Valvula
+
+    try:
+        with transaction.atomic():
+            valvula.save(force_insert=True)
+        return valvula, True
+    except IntegrityError:
+        existente = None
+        if valvula.numero_serie_normalizado:
+            existente = Valvula.objects.filter(
+                empresa_id=valvula.empresa_id, numero_serie_normalizado=valvula.numero_serie_normalizado,
+            ).order_by('pk').first()
+        if existente is None:
+            raise
+        return existente, False
+
+
+class MapaIdentidad:
+    """
+    Válvulas ya resueltas durante una carga: por número de serie normalizado
+    (precargadas por lote) y por (empresa, modelo) normalizado (a medida que
+    se consultan). Las válvulas creadas en la carga se registran para que los
+    documentos siguientes las encuentren sin consultar la base de datos.
+
+    Es de una sola ejecución: no ve las válvulas que otros procesos creen
+    después de precargar.
+    """
+
+    def __init__(self):
+        # {serie normalizada: [válvulas]} de los números de serie precargados
+        self._por_serie: Dict[str, list] = {}
+        # {(empresa_id, modelo normalizado): válvula o None}
+        self._por_modelo: Dict[Tuple[Optional[int], str], object] = {}
+        self.consultas = 0
+
+    def precargar(self, numeros_serie: Iterable):
+        """Trae en una consulta las válvulas de los números de serie que aún no están en el mapa"""
+        from valvulas.models import Valvula
+
+        series = {normalizar_serie(numero) for numero in numeros_serie} - set(self._por_serie) - {''}
+        if not series:
+            return
+        for serie in series:
+            self._por_serie[serie] = []
+        self.consultas += 1
+        for valvula in Valvula.objects.filter(numero_serie_normalizado__in=series).order_by('pk'):
+            self._por_serie[valvula.numero_serie_normalizado].append(valvula)
+
+    def buscar(self, numero_serie=None, modelo=None, empresa_id=None):
+        """Igual que ``buscar_valvula``, resolviendo desde el mapa cuando se puede"""
+        serie, modelo_normalizado = normalizar_serie(numero_serie), normalizar_modelo(modelo)
+        if serie and serie not in self._por_serie:
+            # Número de serie no precargado: la consulta completa lo resuelve
+            self.consultas += 1
+            return buscar_valvula(numero_serie, modelo, empresa_id)
+        candidatas = self._por_serie.get(serie) if serie else None
+        if candidatas:
+            return min(candidatas, key=lambda v: (v.empresa_id != empresa_id, v.pk))
+        if not modelo_normalizado:
+            return None
+        clave = (empresa_id, modelo_normalizado)
+        if clave not in self._por_modelo:
+            self.consultas += 1
+            self._por_modelo[clave] = buscar_valvula(None, modelo, empresa_id)
+        return self._por_modelo[clave]
+
+    def registrar(self, valvula):
+        """Agrega una válvula creada durante la carga"""
+        if valvula.numero_serie_normalizado:
+            self._por_serie.setdefault(valvula.numero_serie_normalizado, []).append(valvula)
+        if valvula.modelo_normalizado:
+            # Sólo las búsquedas ya hechas sin resultado: en las demás puede
+            # haber una válvula más antigua en la base de datos
+            for clave in ((valvula.empresa_id, valvula.modelo_normalizado), (None, valvula.modelo_normalizado)):
+                if clave in self._por_modelo and self._por_modelo[clave] is None:
+                    self._por_modelo[clave] = valvula
+
+    def limpiar(self):
+        """Olvida todo (p. ej. tras revertir un savepoint que pudo crear válvulas)"""
+        self._por_serie.clear()
+        self._por_modelo.clear()
@@ -0,0 +1,106 @@
+"""
+Busca válvulas duplicadas y propone (o aplica) su fusión
+
+Uso:
+    python manage.py find_duplicate_valves
+    python manage.py find_duplicate_valves --empresa 3 --umbral 0.8 --salida logs/duplicados.json
+    python manage.py find_duplicate_valves --aplicar logs/duplicados.json
+    python manage.py find_duplicate_valves --umbral 0.9 --fusionar
+
+Sin --fusionar ni --aplicar sólo lista las propuestas (ver
+``valvulas.duplicados``). El archivo de --salida se puede revisar y editar
+(quitar propuestas, cambiar la válvula que se conserva) antes de aplicarlo
+con --aplicar. Cada fusión es una transacción: si una falla, las demás siguen.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from valvulas.duplicados import fusionar_valvulas, proponer_fusiones
+
+
+class Command(BaseCommand):
+    help = 'Detecta válvulas duplicadas (por bloques de empresa y modelo) y propone o aplica su fusión'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='ID de la empresa')
+        parser.add_argument('--umbral', type=float, default=0.9, help='Puntaje mínimo de un par (default: 0.9)')
+        parser.add_argument('--max-bloque', type=int, default=500,
+                            help='Válvulas máximas por bloque de empresa y modelo (default: 500)')
+        parser.add_argument('--salida', help='Escribe las propuestas en este archivo JSON')
+        parser.add_argument('--fusionar', action='store_true', help='Aplica las propuestas encontradas')
+        parser.add_argument('--aplicar', help='Aplica las propuestas de un archivo JSON de --salida (revisado)')
+
+    def handle(self, *args, **options):
+        if options['aplicar']:
+            if options['fusionar']:
+                raise CommandError('Use --fusionar o --aplicar, no ambos')
+            self._aplicar(self._leer(options['aplicar']))
+            return
+        if not 0 < options['umbral'] <= 1:
+            raise CommandError('--umbral debe estar entre 0 y 1')
+        if options['max_bloque'] < 2:
+            raise CommandError('--max-bloque debe ser al menos 2')
+
+        inicio = time.monotonic()
+        omitidos, ambiguas = [], []
+        propuestas = proponer_fusiones(
+            options['umbral'], options['empresa'], options['max_bloque'], omitidos, ambiguas,
+        )
+        duracion = time.monotonic() - inicio
+        for propuesta in propuestas:
+            duplicadas = ', '.join(f'#{v.pk} ({v.numero_serie})' for v in propuesta.duplicadas)
+            self.stdout.write(
+                f'[{propuesta.puntaje:.2f}] empresa {propuesta.conservar.empresa_id}, '
+                f'modelo {propuesta.conservar.modelo_normalizado}: conservar #{propuesta.conservar.pk} '
+                f'({propuesta.conservar.numero_serie}) <- {duplicadas} ({"; ".join(propuesta.motivos)})'
+            )
+        for empresa, modelo in omitidos:
+            self.stdout.write(self.style.WARNING(
+                f'Bloque omitido por tamaño (más de {options["max_bloque"]} válvulas): empresa {empresa}, modelo {modelo}'
+            ))
+        for valvula in ambiguas:
+            self.stdout.write(self.style.WARNING(
+                f'Serie provisional ambigua (compatible con varias válvulas del modelo): #{valvula.pk} '
+                f'({valvula.numero_serie}), empresa {valvula.empresa_id}'
+            ))
+        total = sum(len(propuesta.duplicadas) for propuesta in propuestas)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(propuestas)} propuestas ({total} válvulas duplicadas) en {duracion:.1f}s'
+        ))
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump([propuesta.como_dict() for propuesta in propuestas], archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Propuestas escritas en {options["salida"]}')
+        if options['fusionar']:
+            self._aplicar([propuesta.como_dict() for propuesta in propuestas])
+
+    def _leer(self, ruta):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                propuestas = json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {ruta}: {str(e)}')
+        if not isinstance(propuestas, list) or not all(
+            isinstance(p, dict) and isinstance(p.get('conservar'), int) and isinstance(p.get('duplicadas'), list)
+            for p in propuestas
+        ):
+            raise CommandError(f'{ruta} no tiene el formato de --salida')
+        return propuestas
+
+    def _aplicar(self, propuestas):
+        fusionadas, fallidas, movidas = 0, 0, {}
+        for propuesta in propuestas:
+            try:
+                for tabla, filas in fusionar_valvulas(propuesta['conservar'], propuesta['duplicadas']).items():
+                    movidas[tabla] = movidas.get(tabla, 0) + filas
+                fusionadas += len(propuesta['duplicadas'])
+            except ValueError as e:
+                fallidas += 1
+                self.stdout.write(self.style.ERROR(f'#{propuesta["conservar"]}: {str(e)}'))
+        resumen = ', '.join(f'{filas} {tabla}' for tabla, filas in movidas.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'{fusionadas} válvulas fusionadas ({resumen or "sin registros relacionados"}); {fallidas} propuestas fallidas'
+        ))
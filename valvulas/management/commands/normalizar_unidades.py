@@ -0,0 +1,85 @@
+"""
+Llena las columnas numéricas de presión (kPa) y temperatura (°C) de las
+válvulas y documentos existentes a partir de sus valores de texto
+
+Uso:
+    python manage.py normalizar_unidades
+    python manage.py normalizar_unidades --solo documentos --lote 2000
+
+Los registros nuevos las llenan al guardarse (``normalizar_unidades`` en
+Valvula y Documento); este comando es para los anteriores o tras ampliar las
+unidades reconocidas en ``valvulas.unidades``. Se puede ejecutar varias veces.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from servicios.models import Documento
+from valvulas.models import Valvula
+
+# modelo: ({campo de texto: columna numérica}, otros campos que se leen)
+MODELOS = {
+    'valvulas': (
+        Valvula,
+        {'presion_nominal': 'presion_nominal_kpa', 'presion_set': 'presion_set_kpa',
+         'temperatura_nominal': 'temperatura_nominal_c'},
+        (),
+    ),
+    'documentos': (
+        Documento,
+        {'presion_inicial': 'presion_inicial_kpa', 'presion_final': 'presion_final_kpa',
+         'temperatura': 'temperatura_c'},
+        ('unidad_presion',),
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Convierte presiones y temperaturas de texto a columnas numéricas (kPa y °C)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo', choices=list(MODELOS), help='Sólo válvulas o sólo documentos')
+        parser.add_argument('--lote', type=int, default=1000, help='Registros por bulk_update (default: 1000)')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+        nombres = [options['solo']] if options['solo'] else list(MODELOS)
+        for nombre in nombres:
+            self._normalizar(nombre, options['lote'])
+
+    def _normalizar(self, nombre, tamano_lote):
+        modelo, columnas, otros = MODELOS[nombre]
+        numericos = list(columnas.values())
+        inicio = time.monotonic()
+        registros = modelo.objects.only('pk', *columnas, *numericos, *otros).order_by('pk')
+        ultimo, revisados, actualizados, sin_convertir = 0, 0, 0, 0
+        while True:
+            lote = list(registros.filter(pk__gt=ultimo)[:tamano_lote])
+            if not lote:
+                break
+            ultimo = lote[-1].pk
+            cambiados = []
+            for registro in lote:
+                antes = [getattr(registro, campo) for campo in numericos]
+                registro.normalizar_unidades()
+                despues = [getattr(registro, campo) for campo in numericos]
+                # Un texto con valor que no se pudo convertir (p. ej. presión sin unidad)
+                sin_convertir += sum(
+                    1 for texto, columna in columnas.items()
+                    if getattr(registro, texto) and getattr(registro, columna) is None
+                )
+                if despues != antes:
+                    cambiados.append(registro)
+            if cambiados:
+                with transaction.atomic():
+                    modelo.objects.bulk_update(cambiados, numericos)
+            revisados += len(lote)
+            actualizados += len(cambiados)
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{nombre}: {revisados} revisados, {actualizados} actualizados en {duracion:.1f}s '
+            f'({sin_convertir} valores sin unidad reconocible)'
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('valvulas', '0002_valvula_norma_aplicable_valvula_presion_set_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valvula',
+            name='presion_nominal_kpa',
+            field=models.FloatField(blank=True, db_index=True, help_text='Presión nominal en kPa', null=True),
+        ),
+        migrations.AddField(
+            model_name='valvula',
+            name='presion_set_kpa',
+            field=models.FloatField(blank=True, db_index=True, help_text='Presión SET en kPa', null=True),
+        ),
+        migrations.AddField(
+            model_name='valvula',
+            name='temperatura_nominal_c',
+            field=models.FloatField(blank=True, db_index=True, help_text='Temperatura nominal en °C', null=True),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:42
+
+import re
+
+from django.db import migrations, models
+
+# Copia de valvulas.identidad al momento de esta migración (la del código
+# puede cambiar después)
+_PREFIJO_SERIE = re.compile(
+    r'^\s*(?:s\s*/\s*n|n\s*/\s*s|s\.\s*n\.|serial(?:\s+(?:no\.?|number|n[°º]))?'
+    r'|(?:n[°º]?o?\.?|n[uú]m(?:ero)?\.?)\s*(?:de\s+)?serie|serie)\s*[:#.\-]?\s*',
+    re.IGNORECASE,
+)
+_NO_ALFANUMERICO = re.compile(r'[^0-9A-Z]')
+
+
+def normalizar_modelo(texto):
+    if not texto:
+        return ''
+    return _NO_ALFANUMERICO.sub('', str(texto).upper())
+
+
+def normalizar_serie(texto):
+    if not texto:
+        return ''
+    return normalizar_modelo(_PREFIJO_SERIE.sub('', str(texto), count=1))
+
+
+def llenar_identidad(apps, schema_editor):
+    """Normaliza el número de serie y el modelo de las válvulas existentes, por lotes"""
+    Valvula = apps.get_model('valvulas', 'Valvula')
+    ultimo = 0
+    while True:
+        lote = list(Valvula.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'numero_serie', 'modelo')[:1000])
+        if not lote:
+            break
+        for valvula in lote:
+            valvula.numero_serie_normalizado = normalizar_serie(valvula.numero_serie)
+            valvula.modelo_normalizado = normalizar_modelo(valvula.modelo)
+        Valvula.objects.bulk_update(lote, ['numero_serie_normalizado', 'modelo_normalizado'])
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('valvulas', '0003_valvula_presion_nominal_kpa_valvula_presion_set_kpa_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='valvula',
+            name='modelo_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='valvula',
+            name='numero_serie_normalizado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='valvula',
+            index=models.Index(fields=['empresa', 'numero_serie_normalizado'], name='valvula_empresa_serie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='valvula',
+            index=models.Index(fields=['empresa', 'modelo_normalizado'], name='valvula_empresa_modelo_idx'),
+        ),
+        migrations.RunPython(llenar_identidad, migrations.RunPython.noop),
+    ]
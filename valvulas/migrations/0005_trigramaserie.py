@@ -0,0 +1,81 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDICE_PG_TRGM = 'valvula_serie_trgm_idx'
+# Copia de valvulas.similitud al momento de esta migración
+_PLIEGUE = str.maketrans('OQILZSB', '0011258')
+
+
+def usa_pg_trgm(conexion):
+    return conexion.vendor == 'postgresql'
+
+
+def trigramas(serie):
+    if not serie:
+        return set()
+    texto = f'  {serie.lower()} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def indice_pg_trgm(apps, schema_editor):
+    """PostgreSQL: extensión pg_trgm e índice GIN sobre el número de serie plegado"""
+    if not usa_pg_trgm(schema_editor.connection):
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDICE_PG_TRGM} ON valvulas_valvula USING gin '
+        f"(translate(numero_serie_normalizado, 'OQILZSB', '0011258') gin_trgm_ops)"
+    )
+
+
+def quitar_indice_pg_trgm(apps, schema_editor):
+    if usa_pg_trgm(schema_editor.connection):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE_PG_TRGM}')
+
+
+def llenar_trigramas(apps, schema_editor):
+    """Otras bases de datos: trigramas de las válvulas existentes, por lotes"""
+    if usa_pg_trgm(schema_editor.connection):
+        return
+    Valvula = apps.get_model('valvulas', 'Valvula')
+    TrigramaSerie = apps.get_model('valvulas', 'TrigramaSerie')
+    ultimo = 0
+    while True:
+        lote = list(Valvula.objects.filter(pk__gt=ultimo).order_by('pk').only('pk', 'empresa_id', 'numero_serie_normalizado')[:1000])
+        if not lote:
+            break
+        TrigramaSerie.objects.bulk_create([
+            TrigramaSerie(valvula_id=valvula.pk, empresa_id=valvula.empresa_id, trigrama=trigrama)
+            for valvula in lote
+            for trigrama in trigramas(valvula.numero_serie_normalizado.translate(_PLIEGUE))
+        ], batch_size=5000)
+        ultimo = lote[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('valvulas', '0004_identidad_normalizada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaSerie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clientes.empresa')),
+                ('valvula', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='valvulas.valvula')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de Serie',
+                'verbose_name_plural': 'Trigramas de Serie',
+                'indexes': [models.Index(fields=['empresa', 'trigrama', 'valvula'], name='trigrama_empresa_idx')],
+            },
+        ),
+        migrations.RunPython(llenar_trigramas, migrations.RunPython.noop),
+        migrations.RunPython(indice_pg_trgm, quitar_indice_pg_trgm),
+    ]
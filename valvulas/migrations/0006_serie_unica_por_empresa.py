@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:34
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def verificar_duplicadas(apps, schema_editor):
+    """Antes de la restricción única: la misma serie normalizada dos veces en una empresa se fusiona a mano"""
+    Valvula = apps.get_model('valvulas', 'Valvula')
+    duplicadas = list(
+        Valvula.objects.exclude(numero_serie_normalizado='')
+        .values('empresa_id', 'numero_serie_normalizado').annotate(total=Count('pk')).filter(total__gt=1)
+        .values_list('empresa_id', 'numero_serie_normalizado')[:20]
+    )
+    if duplicadas:
+        raise RuntimeError(
+            'Válvulas con el mismo número de serie normalizado en la misma empresa (empresa, serie): '
+            f'{duplicadas}. Fusiónelas antes de migrar.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('valvulas', '0005_trigramaserie'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_duplicadas, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='valvula',
+            name='valvula_empresa_serie_idx',
+        ),
+        migrations.AlterField(
+            model_name='valvula',
+            name='numero_serie_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='valvula',
+            index=models.Index(fields=['numero_serie_normalizado', 'empresa'], name='valvula_serie_empresa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='valvula',
+            constraint=models.UniqueConstraint(condition=models.Q(('numero_serie_normalizado', ''), _negated=True), fields=('empresa', 'numero_serie_normalizado'), name='valvula_empresa_serie_unica', violation_error_message='Ya existe una válvula de esta empresa con el mismo número de serie (sin contar separadores ni el prefijo S/N).'),
+        ),
+    ]
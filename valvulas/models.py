@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils import timezone
 from clientes.models import Empresa
+from valvulas.identidad import normalizar_modelo, normalizar_serie
+from valvulas.similitud import indexar_trigramas
+from valvulas.unidades import presion_a_kpa, temperatura_a_celsius
 
 
 class Valvula(models.Model):
@@ -27,10 +30,18 @@ class Valvula(models.Model):
     marca = models.CharField(max_length=100)
     modelo = models.CharField(max_length=100)
     tamaño = models.CharField(max_length=50)
+    # Serie y modelo en mayúsculas, sin separadores ni prefijo "S/N" para
+    # enlazar documentos (ver valvulas.identidad); únicos por empresa
+    numero_serie_normalizado = models.CharField(max_length=100, blank=True, editable=False)
+    modelo_normalizado = models.CharField(max_length=100, blank=True, editable=False)
     tag_localizacion = models.CharField(max_length=100, blank=True, help_text="TAG o identificador de ubicación")
     presion_nominal = models.CharField(max_length=50, verbose_name="Presión Nominal", blank=True)
     presion_set = models.CharField(max_length=50, blank=True, verbose_name="Presión SET", help_text="Para válvulas de seguridad")
     temperatura_nominal = models.CharField(max_length=50, blank=True, verbose_name="Temperatura Nominal")
+    # Los mismos valores en unidades canónicas para filtrar por rango (ver valvulas.unidades)
+    presion_nominal_kpa = models.FloatField(null=True, blank=True, db_index=True, help_text="Presión nominal en kPa")
+    presion_set_kpa = models.FloatField(null=True, blank=True, db_index=True, help_text="Presión SET en kPa")
+    temperatura_nominal_c = models.FloatField(null=True, blank=True, db_index=True, help_text="Temperatura nominal en °C")
     material = models.CharField(max_length=100, blank=True)
     ubicacion = models.CharField(max_length=255, help_text="Ubicación física de la válvula", blank=True)
     norma_aplicable = models.CharField(max_length=50, blank=True, help_text="ASME I, ASME VIII, etc")
@@ -58,10 +69,70 @@ class Valvula(models.Model):
         verbose_name = "Válvula"
         verbose_name_plural = "Válvulas"
         ordering = ['-fecha_creacion']
+        indexes = [
+            # La serie primero: el enlace también la busca en todas las empresas
+            models.Index(fields=['numero_serie_normalizado', 'empresa'], name='valvula_serie_empresa_idx'),
+            models.Index(fields=['empresa', 'modelo_normalizado'], name='valvula_empresa_modelo_idx'),
+        ]
+        constraints = [
+            # "SN-123" y "SN 123" son la misma válvula: es la clave de conflicto de crear_valvula
+            models.UniqueConstraint(
+                fields=['empresa', 'numero_serie_normalizado'],
+                condition=~models.Q(numero_serie_normalizado=''),
+                name='valvula_empresa_serie_unica',
+                violation_error_message='Ya existe una válvula de esta empresa con el mismo número de serie '
+                                        '(sin contar separadores ni el prefijo S/N).',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.numero_serie} - {self.marca} {self.modelo}"
     
+    # Columnas que se calculan en save() a partir de cada campo
+    CAMPOS_NORMALIZADOS = {
+        'numero_serie': 'numero_serie_normalizado',
+        'modelo': 'modelo_normalizado',
+        'presion_nominal': 'presion_nominal_kpa',
+        'presion_set': 'presion_set_kpa',
+        'temperatura_nominal': 'temperatura_nominal_c',
+    }
+    
+    def save(self, *args, **kwargs):
+        self.normalizar_unidades()
+        self.normalizar_identidad()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Con update_fields también se escriben las columnas normalizadas
+            # de los campos guardados (las búsquedas indexadas las usan)
+            update_fields = set(update_fields)
+            update_fields |= {
+                normalizado for campo, normalizado in self.CAMPOS_NORMALIZADOS.items() if campo in update_fields
+            }
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        # Trigramas del número de serie para la búsqueda aproximada (valvulas.similitud)
+        if update_fields is None or {'numero_serie', 'empresa', 'empresa_id'} & update_fields:
+            indexar_trigramas(self)
+    
+    def validate_constraints(self, exclude=None):
+        # La serie normalizada no está en los formularios (se calcula al
+        # guardar): se calcula aquí para validar la restricción por empresa
+        self.normalizar_identidad()
+        if exclude is not None and 'numero_serie' not in exclude:
+            exclude = set(exclude) - {'numero_serie_normalizado'}
+        super().validate_constraints(exclude=exclude)
+    
+    def normalizar_identidad(self):
+        """Llena el número de serie y el modelo normalizados"""
+        self.numero_serie_normalizado = normalizar_serie(self.numero_serie)
+        self.modelo_normalizado = normalizar_modelo(self.modelo)
+    
+    def normalizar_unidades(self):
+        """Llena las columnas en kPa y °C desde los valores de texto"""
+        self.presion_nominal_kpa = presion_a_kpa(self.presion_nominal)
+        self.presion_set_kpa = presion_a_kpa(self.presion_set)
+        self.temperatura_nominal_c = temperatura_a_celsius(self.temperatura_nominal)
+    
     @property
     def requiere_calibracion(self):
         """Indica si la válvula requiere calibración (intervalo: 365 días)"""
@@ -141,3 +212,25 @@ class EspecificacionTecnica(models.Model):
     
     def __str__(self):
         return f"Especificaciones - {self.valvula.numero_serie}"
+
+
+class TrigramaSerie(models.Model):
+    """
+    Trigramas del número de serie plegado de cada válvula: índice de la
+    búsqueda aproximada en las bases de datos sin pg_trgm (ver
+    valvulas.similitud). En PostgreSQL queda vacía.
+    """
+    valvula = models.ForeignKey(Valvula, on_delete=models.CASCADE, related_name='trigramas')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='+')
+    trigrama = models.CharField(max_length=3)
+    
+    class Meta:
+        verbose_name = "Trigrama de Serie"
+        verbose_name_plural = "Trigramas de Serie"
+        indexes = [
+            # Cubre la consulta de candidatas (empresa, trigrama -> válvula)
+            models.Index(fields=['empresa', 'trigrama', 'valvula'], name='trigrama_empresa_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigrama!r} - {self.valvula_id}"
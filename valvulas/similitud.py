@@ -0,0 +1,208 @@
+"""
+Búsqueda aproximada de válvulas por número de serie (trigramas)
+
+Un error de lectura ("SN1O345A" por "SN10345A") o de digitación hace que el
+número de serie extraído no coincida con el de la válvula ya registrada, y el
+enlace crearía una válvula duplicada. Aquí se buscan las válvulas de la
+empresa con un número de serie parecido, medido como en pg_trgm: la
+similitud es la proporción de trigramas compartidos (0 a 1), acotada por la
+de caracteres en el mismo orden.
+
+Antes de tomar los trigramas, el número de serie normalizado se "pliega":
+los caracteres que el OCR confunde se unifican (O y Q -> 0, I y L -> 1, Z -> 2,
+S -> 5, B -> 8), así que un cambio O/0 tiene similitud 1. El enlace de
+documentos toma la candidata más parecida por encima de
+``VALVULAS_SIMILITUD_MINIMA`` y la deja para revisión por debajo de
+``VALVULAS_SIMILITUD_AUTOMATICA``. Las series que sólo difieren en el número
+("PSV-2023-001" y "PSV-2023-002") se parecen tanto como una mal leída, pero
+son válvulas distintas y no se enlazan (``es_otro_numero``).
+
+- PostgreSQL: índice GIN con ``gin_trgm_ops`` sobre el número de serie
+  plegado; el operador ``%`` de pg_trgm usa el índice para preseleccionar.
+- Otras bases de datos (SQLite): tabla ``TrigramaSerie`` con los trigramas de
+  cada válvula, indexada por (empresa, trigrama). Las candidatas son las que
+  comparten suficientes trigramas.
+
+En los dos casos la similitud final de las candidatas se calcula aquí.
+
+Con 100k válvulas cualquiera de las dos responde en milisegundos.
+"""
+
+from difflib import SequenceMatcher
+import math
+from typing import List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+
+from valvulas.identidad import normalizar_serie
+
+# Caracteres que el OCR confunde y el carácter con que se unifican
+_CONFUSIBLES, _PLEGADOS = 'OQILZSB', '0011258'
+_PLIEGUE = str.maketrans(_CONFUSIBLES, _PLEGADOS)
+
+# Válvulas cuya similitud exacta se calcula por búsqueda
+MAXIMO_CANDIDATAS = 50
+
+
+def _ajuste(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+def serie_plegada(numero_serie) -> str:
+    """Número de serie normalizado con los caracteres confusibles unificados"""
+    return normalizar_serie(numero_serie).translate(_PLIEGUE)
+
+
+def trigramas(serie: str) -> Set[str]:
+    """Trigramas de una serie ya plegada, como los de pg_trgm (dos espacios al inicio y uno al final)"""
+    if not serie:
+        return set()
+    texto = f'  {serie.lower()} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def similitud(serie_a: str, serie_b: str) -> float:
+    """
+    Similitud entre dos series plegadas: la de trigramas (``similarity`` de
+    pg_trgm) acotada por la proporción de caracteres en el mismo orden
+    (difflib). Un conjunto de trigramas no ve el orden ni las repeticiones:
+    "2200500" y "2205000" tienen los mismos.
+    """
+    if serie_a == serie_b:
+        return 1.0 if serie_a else 0.0
+    a, b = trigramas(serie_a), trigramas(serie_b)
+    if not a or not b:
+        return 0.0
+    comunes = len(a & b)
+    return min(comunes / (len(a) + len(b) - comunes), SequenceMatcher(None, serie_a, serie_b, autojunk=False).ratio())
+
+
+def usa_pg_trgm(conexion=connection) -> bool:
+    return conexion.vendor == 'postgresql'
+
+
+def indexar_trigramas(valvula):
+    """
+    Actualiza los trigramas de la válvula en ``TrigramaSerie`` (no se usa en
+    PostgreSQL). Sólo se escriben las diferencias: si la serie y la empresa no
+    cambiaron, basta la consulta de los existentes.
+    """
+    from valvulas.models import TrigramaSerie
+
+    if usa_pg_trgm():
+        return
+    nuevos = trigramas(valvula.numero_serie_normalizado.translate(_PLIEGUE))
+    with transaction.atomic():
+        existentes = dict(
+            TrigramaSerie.objects.filter(valvula=valvula).values_list('trigrama', 'empresa_id')
+        )
+        sobrantes = [
+            trigrama for trigrama, empresa_id in existentes.items()
+            if trigrama not in nuevos or empresa_id != valvula.empresa_id
+        ]
+        if sobrantes:
+            TrigramaSerie.objects.filter(valvula=valvula, trigrama__in=sobrantes).delete()
+        faltantes = nuevos - (existentes.keys() - set(sobrantes))
+        TrigramaSerie.objects.bulk_create([
+            TrigramaSerie(valvula=valvula, empresa_id=valvula.empresa_id, trigrama=trigrama)
+            for trigrama in faltantes
+        ])
+
+
+def _preseleccion_pg_trgm(plegada: str, empresa_id: int):
+    """Válvulas de la empresa que el índice GIN da como parecidas (umbral de pg_trgm, 0.3 por defecto)"""
+    from valvulas.models import Valvula
+
+    return Valvula.objects.filter(
+        RawSQL(
+            'translate(numero_serie_normalizado, %s, %s) %% %s',
+            (_CONFUSIBLES, _PLEGADOS, plegada),
+            output_field=BooleanField(),
+        ),
+        empresa_id=empresa_id,
+    ).annotate(
+        similitud=Func(
+            Func(F('numero_serie_normalizado'), Value(_CONFUSIBLES), Value(_PLEGADOS), function='translate'),
+            Value(plegada),
+            function='similarity',
+            output_field=FloatField(),
+        ),
+    ).order_by('-similitud', 'pk')[:MAXIMO_CANDIDATAS]
+
+
+def _preseleccion_tabla(plegada: str, empresa_id: int, umbral: float):
+    """
+    Válvulas de la empresa que comparten trigramas suficientes para llegar al
+    umbral: si la similitud es >= u, los trigramas comunes son >= u * |A|
+    """
+    from valvulas.models import TrigramaSerie, Valvula
+
+    propios = trigramas(plegada)
+    minimo = max(1, math.ceil(umbral * len(propios)))
+    ids = list(
+        TrigramaSerie.objects.filter(empresa_id=empresa_id, trigrama__in=propios)
+        .values('valvula_id').annotate(comunes=Count('valvula_id')).filter(comunes__gte=minimo)
+        .order_by('-comunes', 'valvula_id').values_list('valvula_id', flat=True)[:MAXIMO_CANDIDATAS]
+    )
+    return Valvula.objects.filter(pk__in=ids) if ids else []
+
+
+def valvulas_similares(numero_serie, empresa_id: Optional[int], umbral: Optional[float] = None,
+                       limite: int = 5) -> List[Tuple[object, float]]:
+    """
+    Válvulas de la empresa con número de serie parecido, de la más a la menos
+    parecida (en empate, la más antigua)
+
+    Args:
+        numero_serie: número de serie extraído (se normaliza y se pliega)
+        empresa_id: sólo se buscan válvulas de esta empresa
+        umbral: similitud mínima (``VALVULAS_SIMILITUD_MINIMA`` por defecto)
+        limite: candidatas que se retornan
+
+    Returns:
+        Lista de (válvula, similitud)
+    """
+    if umbral is None:
+        umbral = _ajuste('VALVULAS_SIMILITUD_MINIMA', 0.5)
+    plegada = serie_plegada(numero_serie)
+    if not plegada or empresa_id is None:
+        return []
+    if usa_pg_trgm():
+        preseleccion = _preseleccion_pg_trgm(plegada, empresa_id)
+    else:
+        preseleccion = _preseleccion_tabla(plegada, empresa_id, umbral)
+    candidatas = [
+        (valvula, similitud(plegada, valvula.numero_serie_normalizado.translate(_PLIEGUE)))
+        for valvula in preseleccion
+    ]
+    candidatas = [(valvula, valor) for valvula, valor in candidatas if valor >= umbral]
+    candidatas.sort(key=lambda candidata: (-candidata[1], candidata[0].pk))
+    return candidatas[:limite]
+
+
+def es_otro_numero(serie_a, serie_b) -> bool:
+    """
+    True si las series (normalizadas, sin plegar) sólo difieren en un tramo
+    de dígitos de cada lado que no son los mismos dígitos reordenados:
+    "SN10001" y "SN10002" o "PSV-9" y "PSV-10" son números distintos. Un
+    carácter de más o de menos, dos dígitos transpuestos o un carácter que el
+    OCR confunde no lo son.
+    """
+    a, b = normalizar_serie(serie_a), normalizar_serie(serie_b)
+    corto = min(len(a), len(b))
+    inicio = 0
+    while inicio < corto and a[inicio] == b[inicio]:
+        inicio += 1
+    fin = 0
+    while fin < corto - inicio and a[-1 - fin] == b[-1 - fin]:
+        fin += 1
+    resto_a, resto_b = a[inicio:len(a) - fin], b[inicio:len(b) - fin]
+    return resto_a.isdigit() and resto_b.isdigit() and sorted(resto_a) != sorted(resto_b)
+
+
+def requiere_revision(valor: float) -> bool:
+    """Una coincidencia por debajo de ``VALVULAS_SIMILITUD_AUTOMATICA`` la debe confirmar una persona"""
+    return valor < _ajuste('VALVULAS_SIMILITUD_AUTOMATICA', 0.95)
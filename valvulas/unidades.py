@@ -0,0 +1,145 @@
+"""
+Conversión de presiones y temperaturas escritas como texto
+
+Los certificados y la hoja de vida guardan valores como "50 PSI",
+"3,5 bar" o "25 °C". Estas funciones los convierten a una unidad canónica
+(kPa para presión y °C para temperatura) para poder guardarlos en columnas
+numéricas indexadas y filtrar por rangos en la base de datos.
+
+Números: con punto y coma a la vez, el último separador es el decimal
+("1.234,5" o "1,234.5"); con sólo comas, una coma seguida de exactamente tres
+dígitos se toma como separador de miles ("1,500 psi") y cualquier otra como
+decimal ("3,5 bar"). Si el texto trae un rango ("50-60 psi") se usa el
+primer valor.
+
+No depende de Django.
+"""
+
+import re
+from typing import Optional, Tuple
+
+UNIDAD_PRESION = 'kPa'
+UNIDAD_TEMPERATURA = '°C'
+
+# kPa por unidad (manométrica y absoluta se tratan igual)
+FACTORES_PRESION = {
+    'kpa': 1.0,
+    'pa': 0.001,
+    'mpa': 1000.0,
+    'bar': 100.0,
+    'barg': 100.0,
+    'bara': 100.0,
+    'mbar': 0.1,
+    'psi': 6.894757293168,
+    'psig': 6.894757293168,
+    'psia': 6.894757293168,
+    'lb/in2': 6.894757293168,
+    'atm': 101.325,
+    'kg/cm2': 98.0665,
+    'kgf/cm2': 98.0665,
+    'mmhg': 0.133322387415,
+    'torr': 0.133322387415,
+    'inhg': 3.386388640341,
+    'mh2o': 9.80665,
+    'mca': 9.80665,
+}
+
+_NUMERO = re.compile(r'[-+]?\d[\d.,]*')
+_MILES = re.compile(r'^[-+]?\d{1,3}(?:,\d{3})+$')
+_CONECTORES = ('', 'a', 'y', 'to', 'hasta')
+
+
+def _unidad(texto: str) -> str:
+    """Unidad normalizada: minúsculas, sin espacios ni puntos, ² -> 2"""
+    return re.sub(r'[\s.]', '', texto.lower()).replace('²', '2')
+
+
+def _numero(texto: str) -> Optional[float]:
+    if ',' in texto and '.' in texto:
+        if texto.rfind(',') > texto.rfind('.'):
+            texto = texto.replace('.', '').replace(',', '.')
+        else:
+            texto = texto.replace(',', '')
+    elif ',' in texto:
+        texto = texto.replace(',', '') if _MILES.match(texto) else texto.replace(',', '.')
+    texto = texto.rstrip('.')
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def separar_valor(texto) -> Tuple[Optional[float], str]:
+    """
+    Primer número del texto y lo que le sigue (la unidad escrita)
+
+    Returns:
+        (valor o None, unidad normalizada o '')
+    """
+    if texto is None:
+        return None, ''
+    texto = str(texto)
+    match = _NUMERO.search(texto)
+    if match is None:
+        return None, ''
+    valor = _numero(match.group())
+    # La unidad es el primer texto tras el número que no sea un conector de
+    # rango: "50 psi - 60 psi", "50-60 psi" o "50 a 60 psi"
+    for parte in _NUMERO.split(texto[match.end():]):
+        unidad = _unidad(parte.strip(' -–/'))
+        if unidad not in _CONECTORES:
+            return valor, unidad
+    return valor, ''
+
+
+def presion_a_kpa(texto, unidad: Optional[str] = None) -> Optional[float]:
+    """
+    Presión en kPa
+
+    Args:
+        texto: valor con o sin unidad ("50 PSI", "3,5", 120)
+        unidad: unidad a usar si el texto no trae una (p. ej. Documento.unidad_presion)
+
+    Returns:
+        kPa, o None si no hay número o la unidad no se reconoce (una presión
+        sin unidad no se convierte: psi y bar difieren en un factor de 14)
+    """
+    valor, escrita = separar_valor(texto)
+    if valor is None:
+        return None
+    factor = FACTORES_PRESION.get(escrita) if escrita else None
+    if factor is None and unidad:
+        factor = FACTORES_PRESION.get(_unidad(unidad))
+    if factor is None:
+        return None
+    return round(valor * factor, 3)
+
+
+def temperatura_a_celsius(texto, unidad: Optional[str] = None) -> Optional[float]:
+    """
+    Temperatura en °C
+
+    Args:
+        texto: valor con o sin unidad ("25 °C", "77F", "298 K")
+        unidad: unidad a usar si el texto no trae una ('C' si tampoco se da)
+
+    Returns:
+        °C, o None si no hay número o la unidad no se reconoce
+    """
+    valor, escrita = separar_valor(texto)
+    if valor is None:
+        return None
+    escala = (escrita or _unidad(unidad or 'C')).lstrip('°º')
+    if escala in ('c', 'celsius'):
+        return round(valor, 3)
+    if escala in ('f', 'fahrenheit'):
+        return round((valor - 32) * 5 / 9, 3)
+    if escala in ('k', 'kelvin'):
+        return round(valor - 273.15, 3)
+    return None
+
+
+def kpa_a(valor: float, unidad: str) -> Optional[float]:
+    """Convierte kPa a otra unidad de ``FACTORES_PRESION`` (None si no se reconoce)"""
+    factor = FACTORES_PRESION.get(_unidad(unidad))
+    return valor / factor if factor else None
@@ -6,11 +6,15 @@ from django.db.models import Q
 import logging
 
 from valvulas.models import Valvula
+from valvulas.unidades import presion_a_kpa
 from servicios.models import Documento
 from .forms import ValvulaEditarHojaVidaForm
 
 logger = logging.getLogger(__name__)
 
+# Unidades que ofrece el filtro de presión SET de la lista (valvulas.unidades)
+UNIDADES_FILTRO_PRESION = ['psi', 'bar', 'kPa', 'MPa', 'kg/cm2']
+
 
 @login_required
 def hoja_vida_valvula(request, valvula_id):
@@ -94,10 +98,21 @@ def listar_valvulas(request):
     estado = request.GET.get('estado')
     requiere = request.GET.get('requiere')  # calibracion o mantenimiento
     busca = request.GET.get('busca')
+    # Rango de presión SET en la unidad elegida (se compara en kPa en la base de datos)
+    presion_min = request.GET.get('presion_min')
+    presion_max = request.GET.get('presion_max')
+    unidad = request.GET.get('unidad') or 'psi'
     
     if estado:
         valvulas = valvulas.filter(estado=estado)
     
+    presion_min_kpa = presion_a_kpa(presion_min, unidad)
+    if presion_min_kpa is not None:
+        valvulas = valvulas.filter(presion_set_kpa__gte=presion_min_kpa)
+    presion_max_kpa = presion_a_kpa(presion_max, unidad)
+    if presion_max_kpa is not None:
+        valvulas = valvulas.filter(presion_set_kpa__lte=presion_max_kpa)
+    
     if busca:
         valvulas = valvulas.filter(
             Q(numero_serie__icontains=busca) |
@@ -119,6 +134,10 @@ def listar_valvulas(request):
         'filtro_estado': estado,
         'filtro_requiere': requiere,
         'filtro_busca': busca,
+        'filtro_presion_min': presion_min,
+        'filtro_presion_max': presion_max,
+        'filtro_unidad': unidad,
+        'unidades_presion': UNIDADES_FILTRO_PRESION,
     }
     
     return render(request, 'valvulas/lista_valvulas.html', context)